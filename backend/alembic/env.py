@@ -12,6 +12,13 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from app.core.database import Base
 from app.models.user import User, QuotaTransaction, AnalysisLog, ScoreFile
+from app.models.analysis_cache import AnalysisCacheEntry
+from app.models.mapping_plan_cache import MappingPlanCacheEntry
+from app.models.analysis_job import AnalysisJob, AnalysisStudentResult
+from app.models.student_record import StudentRecord, ScoreItemRecord
+from app.models.usage_rollup import UsageRollup, UsageRollupState
+from app.models.upload_blob import UploadBlob
+from app.models.parse_result_cache import ParseResultCacheEntry
 
 # Alembic Config对象
 config = context.config
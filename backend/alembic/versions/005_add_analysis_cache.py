@@ -0,0 +1,50 @@
+"""add analysis result cache table
+
+Revision ID: 005_add_analysis_cache
+Revises: 004_fix_vip_expires_at_timestamptz
+Create Date: 2026-10-17
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "005_add_analysis_cache"
+down_revision = "004_fix_vip_expires_at_timestamptz"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "analysis_cache_entries",
+        sa.Column("cache_key", sa.String(length=64), nullable=False),
+        sa.Column("model", sa.String(length=100), nullable=False),
+        sa.Column("response_text", sa.Text(), nullable=False),
+        sa.Column("prompt_tokens", sa.Integer(), nullable=True),
+        sa.Column("completion_tokens", sa.Integer(), nullable=True),
+        sa.Column("hit_count", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("last_accessed_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("cache_key"),
+    )
+    op.create_index(
+        op.f("ix_analysis_cache_entries_last_accessed_at"),
+        "analysis_cache_entries",
+        ["last_accessed_at"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_analysis_cache_entries_expires_at"),
+        "analysis_cache_entries",
+        ["expires_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_analysis_cache_entries_expires_at"), table_name="analysis_cache_entries")
+    op.drop_index(op.f("ix_analysis_cache_entries_last_accessed_at"), table_name="analysis_cache_entries")
+    op.drop_table("analysis_cache_entries")
@@ -0,0 +1,46 @@
+"""add mapping plan cache table
+
+Revision ID: 006_add_mapping_plan_cache
+Revises: 005_add_analysis_cache
+Create Date: 2026-10-17
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "006_add_mapping_plan_cache"
+down_revision = "005_add_analysis_cache"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "mapping_plan_cache",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("fingerprint", sa.String(length=64), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("file_type", sa.String(length=20), nullable=False),
+        sa.Column("mapping_json", sa.Text(), nullable=False),
+        sa.Column("confidence", sa.Float(), nullable=False),
+        sa.Column("source", sa.String(length=20), nullable=False),
+        sa.Column("hit_count", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("last_used_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("invalidated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_mapping_plan_cache_id"), "mapping_plan_cache", ["id"], unique=False)
+    op.create_index(op.f("ix_mapping_plan_cache_fingerprint"), "mapping_plan_cache", ["fingerprint"], unique=False)
+    op.create_index(op.f("ix_mapping_plan_cache_user_id"), "mapping_plan_cache", ["user_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_mapping_plan_cache_user_id"), table_name="mapping_plan_cache")
+    op.drop_index(op.f("ix_mapping_plan_cache_fingerprint"), table_name="mapping_plan_cache")
+    op.drop_index(op.f("ix_mapping_plan_cache_id"), table_name="mapping_plan_cache")
+    op.drop_table("mapping_plan_cache")
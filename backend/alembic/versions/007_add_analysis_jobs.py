@@ -0,0 +1,54 @@
+"""add analysis jobs table
+
+Revision ID: 007_add_analysis_jobs
+Revises: 006_add_mapping_plan_cache
+Create Date: 2026-10-17
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "007_add_analysis_jobs"
+down_revision = "006_add_mapping_plan_cache"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "analysis_jobs",
+        sa.Column("id", sa.String(length=36), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("score_file_id", sa.Integer(), nullable=False),
+        sa.Column("analysis_log_id", sa.Integer(), nullable=True),
+        sa.Column("status", sa.String(length=20), nullable=False),
+        sa.Column("one_shot_text", sa.Text(), nullable=True),
+        sa.Column("total_students", sa.Integer(), nullable=False),
+        sa.Column("completed_students", sa.Integer(), nullable=False),
+        sa.Column("failed_students", sa.Integer(), nullable=False),
+        sa.Column("prompt_tokens", sa.Integer(), nullable=True),
+        sa.Column("completion_tokens", sa.Integer(), nullable=True),
+        sa.Column("error_message", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("heartbeat_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["score_file_id"], ["score_files.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["analysis_log_id"], ["analysis_logs.id"], ondelete="SET NULL"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_analysis_jobs_id"), "analysis_jobs", ["id"], unique=False)
+    op.create_index(op.f("ix_analysis_jobs_user_id"), "analysis_jobs", ["user_id"], unique=False)
+    op.create_index(op.f("ix_analysis_jobs_score_file_id"), "analysis_jobs", ["score_file_id"], unique=False)
+    op.create_index(op.f("ix_analysis_jobs_status"), "analysis_jobs", ["status"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_analysis_jobs_status"), table_name="analysis_jobs")
+    op.drop_index(op.f("ix_analysis_jobs_score_file_id"), table_name="analysis_jobs")
+    op.drop_index(op.f("ix_analysis_jobs_user_id"), table_name="analysis_jobs")
+    op.drop_index(op.f("ix_analysis_jobs_id"), table_name="analysis_jobs")
+    op.drop_table("analysis_jobs")
@@ -0,0 +1,53 @@
+"""add per-student analysis checkpoints
+
+Revision ID: 008_add_analysis_checkpoints
+Revises: 007_add_analysis_jobs
+Create Date: 2026-10-17
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "008_add_analysis_checkpoints"
+down_revision = "007_add_analysis_jobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("analysis_jobs", sa.Column("resumed_students", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("analysis_jobs", sa.Column("quota_cost", sa.Integer(), nullable=False, server_default="0"))
+    # Jobs created before this revision always charged the full student count.
+    op.execute("UPDATE analysis_jobs SET quota_cost = total_students")
+
+    op.create_table(
+        "analysis_student_results",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("score_file_id", sa.Integer(), nullable=False),
+        sa.Column("job_id", sa.String(length=36), nullable=True),
+        sa.Column("student_index", sa.Integer(), nullable=False),
+        sa.Column("student_name", sa.String(length=255), nullable=False),
+        sa.Column("input_hash", sa.String(length=64), nullable=False),
+        sa.Column("status", sa.String(length=20), nullable=False),
+        sa.Column("result_json", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(["score_file_id"], ["score_files.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["job_id"], ["analysis_jobs.id"], ondelete="SET NULL"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("score_file_id", "student_index", name="uq_analysis_student_results_file_index"),
+    )
+    op.create_index(op.f("ix_analysis_student_results_id"), "analysis_student_results", ["id"], unique=False)
+    op.create_index(
+        op.f("ix_analysis_student_results_score_file_id"), "analysis_student_results", ["score_file_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_analysis_student_results_score_file_id"), table_name="analysis_student_results")
+    op.drop_index(op.f("ix_analysis_student_results_id"), table_name="analysis_student_results")
+    op.drop_table("analysis_student_results")
+    op.drop_column("analysis_jobs", "quota_cost")
+    op.drop_column("analysis_jobs", "resumed_students")
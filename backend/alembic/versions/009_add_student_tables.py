@@ -0,0 +1,199 @@
+"""add normalized students / score_items tables and backfill from analysis_result
+
+Revision ID: 009_add_student_tables
+Revises: 008_add_analysis_checkpoints
+Create Date: 2026-10-17
+
+"""
+
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "009_add_student_tables"
+down_revision = "008_add_analysis_checkpoints"
+branch_labels = None
+depends_on = None
+
+
+score_files = sa.table(
+    "score_files",
+    sa.column("id", sa.Integer),
+    sa.column("analysis_result", sa.Text),
+)
+students = sa.table(
+    "students",
+    sa.column("id", sa.Integer),
+    sa.column("score_file_id", sa.Integer),
+    sa.column("position", sa.Integer),
+    sa.column("student_name", sa.String),
+    sa.column("total_score", sa.Float),
+    sa.column("analysis", sa.Text),
+    sa.column("suggestions", sa.Text),
+)
+score_items = sa.table(
+    "score_items",
+    sa.column("student_id", sa.Integer),
+    sa.column("score_file_id", sa.Integer),
+    sa.column("position", sa.Integer),
+    sa.column("question_name", sa.Text),
+    sa.column("deduction", sa.Float),
+    sa.column("category", sa.Text),
+)
+
+
+def _float(value, default=0.0):
+    try:
+        result = float(value)
+    except (TypeError, ValueError):
+        return default
+    return result if result == result and result not in (float("inf"), float("-inf")) else default
+
+
+def _has_blob_column(bind) -> bool:
+    # Older alembic-managed databases never got score_files.analysis_result (it came via create_all).
+    return "analysis_result" in {c["name"] for c in sa.inspect(bind).get_columns("score_files")}
+
+
+def upgrade() -> None:
+    op.create_table(
+        "students",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("score_file_id", sa.Integer(), nullable=False),
+        sa.Column("position", sa.Integer(), nullable=False),
+        sa.Column("student_name", sa.String(length=255), nullable=False),
+        sa.Column("total_score", sa.Float(), nullable=False),
+        sa.Column("analysis", sa.Text(), nullable=True),
+        sa.Column("suggestions", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(["score_file_id"], ["score_files.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("score_file_id", "position", name="uq_students_file_position"),
+    )
+    op.create_index(op.f("ix_students_id"), "students", ["id"], unique=False)
+    op.create_index(op.f("ix_students_score_file_id"), "students", ["score_file_id"], unique=False)
+    op.create_index(op.f("ix_students_student_name"), "students", ["student_name"], unique=False)
+
+    op.create_table(
+        "score_items",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("student_id", sa.Integer(), nullable=False),
+        sa.Column("score_file_id", sa.Integer(), nullable=False),
+        sa.Column("position", sa.Integer(), nullable=False),
+        sa.Column("question_name", sa.Text(), nullable=False),
+        sa.Column("deduction", sa.Float(), nullable=False),
+        sa.Column("category", sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(["student_id"], ["students.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["score_file_id"], ["score_files.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_score_items_id"), "score_items", ["id"], unique=False)
+    op.create_index(op.f("ix_score_items_student_id"), "score_items", ["student_id"], unique=False)
+    op.create_index(op.f("ix_score_items_score_file_id"), "score_items", ["score_file_id"], unique=False)
+    op.create_index(op.f("ix_score_items_category"), "score_items", ["category"], unique=False)
+    op.create_index("ix_score_items_file_category", "score_items", ["score_file_id", "category"], unique=False)
+
+    # Backfill from the JSON blobs, one file at a time, then clear the blob.
+    bind = op.get_bind()
+    if not _has_blob_column(bind):
+        return
+    file_ids = [
+        row[0]
+        for row in bind.execute(
+            sa.select(score_files.c.id).where(score_files.c.analysis_result.isnot(None)).order_by(score_files.c.id)
+        )
+    ]
+    for file_id in file_ids:
+        raw = bind.execute(sa.select(score_files.c.analysis_result).where(score_files.c.id == file_id)).scalar()
+        try:
+            data = json.loads(raw) if raw else []
+        except ValueError:
+            # Unreadable blob: keep it untouched for manual inspection.
+            continue
+
+        for position, student in enumerate(data if isinstance(data, list) else []):
+            if not isinstance(student, dict):
+                continue
+            suggestions = student.get("suggestions")
+            student_id = bind.execute(
+                students.insert()
+                .values(
+                    score_file_id=file_id,
+                    position=position,
+                    student_name=str(student.get("student_name") or "")[:255],
+                    total_score=_float(student.get("total_score")),
+                    analysis=student.get("analysis"),
+                    suggestions=json.dumps(suggestions, ensure_ascii=False) if isinstance(suggestions, list) else None,
+                )
+                .returning(students.c.id)
+            ).scalar()
+
+            items = [
+                {
+                    "student_id": student_id,
+                    "score_file_id": file_id,
+                    "position": item_position,
+                    "question_name": str(item.get("question_name") or ""),
+                    "deduction": _float(item.get("deduction")),
+                    "category": item.get("category"),
+                }
+                for item_position, item in enumerate(student.get("scores") or [])
+                if isinstance(item, dict)
+            ]
+            if items:
+                bind.execute(score_items.insert(), items)
+
+        bind.execute(score_files.update().where(score_files.c.id == file_id).values(analysis_result=None))
+
+
+def downgrade() -> None:
+    # Rebuild the JSON blobs from the rows before dropping the tables.
+    bind = op.get_bind()
+    file_ids = (
+        [row[0] for row in bind.execute(sa.select(students.c.score_file_id).distinct())]
+        if _has_blob_column(bind)
+        else []
+    )
+    for file_id in file_ids:
+        items_by_student = {}
+        for item in bind.execute(
+            sa.select(score_items)
+            .where(score_items.c.score_file_id == file_id)
+            .order_by(score_items.c.student_id, score_items.c.position)
+        ).mappings():
+            items_by_student.setdefault(item["student_id"], []).append(
+                {"question_name": item["question_name"], "deduction": item["deduction"], "category": item["category"] or ""}
+            )
+
+        payload = []
+        for row in bind.execute(
+            sa.select(students).where(students.c.score_file_id == file_id).order_by(students.c.position)
+        ).mappings():
+            payload.append(
+                {
+                    "student_name": row["student_name"],
+                    "scores": items_by_student.get(row["id"], []),
+                    "total_score": row["total_score"],
+                    "analysis": row["analysis"],
+                    "suggestions": json.loads(row["suggestions"]) if row["suggestions"] else None,
+                }
+            )
+        bind.execute(
+            score_files.update()
+            .where(score_files.c.id == file_id)
+            .values(analysis_result=json.dumps(payload, ensure_ascii=False))
+        )
+
+    op.drop_index("ix_score_items_file_category", table_name="score_items")
+    op.drop_index(op.f("ix_score_items_category"), table_name="score_items")
+    op.drop_index(op.f("ix_score_items_score_file_id"), table_name="score_items")
+    op.drop_index(op.f("ix_score_items_student_id"), table_name="score_items")
+    op.drop_index(op.f("ix_score_items_id"), table_name="score_items")
+    op.drop_table("score_items")
+    op.drop_index(op.f("ix_students_student_name"), table_name="students")
+    op.drop_index(op.f("ix_students_score_file_id"), table_name="students")
+    op.drop_index(op.f("ix_students_id"), table_name="students")
+    op.drop_table("students")
@@ -0,0 +1,27 @@
+"""add quota reservation columns to analysis jobs
+
+Revision ID: 010_add_job_quota_reservation
+Revises: 009_add_student_tables
+Create Date: 2026-10-17
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "010_add_job_quota_reservation"
+down_revision = "009_add_student_tables"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # NULL marks jobs created before reservations (debited when they finish).
+    op.add_column("analysis_jobs", sa.Column("quota_reserved", sa.Integer(), nullable=True))
+    op.add_column("analysis_jobs", sa.Column("quota_refunded", sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade() -> None:
+    op.drop_column("analysis_jobs", "quota_refunded")
+    op.drop_column("analysis_jobs", "quota_reserved")
@@ -0,0 +1,55 @@
+"""add usage rollup tables for admin dashboards
+
+Revision ID: 011_add_usage_rollups
+Revises: 010_add_job_quota_reservation
+Create Date: 2026-10-17
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "011_add_usage_rollups"
+down_revision = "010_add_job_quota_reservation"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Filled by the compactor on startup (catches up from the oldest analysis log).
+    op.create_table(
+        "usage_rollups",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("granularity", sa.String(length=8), nullable=False),
+        sa.Column("bucket_start", sa.DateTime(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("task_count", sa.Integer(), nullable=False),
+        sa.Column("success_count", sa.Integer(), nullable=False),
+        sa.Column("failed_count", sa.Integer(), nullable=False),
+        sa.Column("quota_cost", sa.Integer(), nullable=False),
+        sa.Column("prompt_tokens", sa.Integer(), nullable=False),
+        sa.Column("completion_tokens", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("granularity", "bucket_start", "user_id", name="uq_usage_rollups_bucket_user"),
+    )
+    op.create_index(op.f("ix_usage_rollups_id"), "usage_rollups", ["id"], unique=False)
+    op.create_index(
+        "ix_usage_rollups_user_bucket", "usage_rollups", ["user_id", "granularity", "bucket_start"], unique=False
+    )
+
+    op.create_table(
+        "usage_rollup_state",
+        sa.Column("name", sa.String(length=50), nullable=False),
+        sa.Column("closed_until", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("usage_rollup_state")
+    op.drop_index("ix_usage_rollups_user_bucket", table_name="usage_rollups")
+    op.drop_index(op.f("ix_usage_rollups_id"), table_name="usage_rollups")
+    op.drop_table("usage_rollups")
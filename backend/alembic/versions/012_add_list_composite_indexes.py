@@ -0,0 +1,38 @@
+"""add composite indexes for keyset-paginated logs and transactions
+
+Revision ID: 012_add_list_composite_indexes
+Revises: 011_add_usage_rollups
+Create Date: 2026-10-17
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "012_add_list_composite_indexes"
+down_revision = "011_add_usage_rollups"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_analysis_logs_user_created", "analysis_logs", ["user_id", "created_at"], unique=False)
+    op.create_index("ix_analysis_logs_status_created", "analysis_logs", ["status", "created_at"], unique=False)
+    op.create_index("ix_analysis_logs_created_at", "analysis_logs", ["created_at"], unique=False)
+    op.create_index(
+        "ix_quota_transactions_user_created", "quota_transactions", ["user_id", "created_at"], unique=False
+    )
+    op.create_index(
+        "ix_quota_transactions_type_user_created",
+        "quota_transactions",
+        ["transaction_type", "user_id", "created_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_quota_transactions_type_user_created", table_name="quota_transactions")
+    op.drop_index("ix_quota_transactions_user_created", table_name="quota_transactions")
+    op.drop_index("ix_analysis_logs_created_at", table_name="analysis_logs")
+    op.drop_index("ix_analysis_logs_status_created", table_name="analysis_logs")
+    op.drop_index("ix_analysis_logs_user_created", table_name="analysis_logs")
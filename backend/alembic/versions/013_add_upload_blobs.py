@@ -0,0 +1,39 @@
+"""add content-addressed upload store
+
+Revision ID: 013_add_upload_blobs
+Revises: 012_add_list_composite_indexes
+Create Date: 2026-10-17
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "013_add_upload_blobs"
+down_revision = "012_add_list_composite_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "upload_blobs",
+        sa.Column("sha256", sa.String(length=64), nullable=False),
+        sa.Column("size", sa.BigInteger(), nullable=False),
+        sa.Column("storage_key", sa.String(length=500), nullable=False),
+        sa.Column("file_url", sa.String(length=500), nullable=False),
+        sa.Column("ref_count", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("last_referenced_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("sha256"),
+    )
+    # NULL for files uploaded before the store (they keep their own timestamped copy).
+    op.add_column("score_files", sa.Column("content_sha256", sa.String(length=64), nullable=True))
+    op.create_index("ix_score_files_content_sha256", "score_files", ["content_sha256"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_score_files_content_sha256", table_name="score_files")
+    op.drop_column("score_files", "content_sha256")
+    op.drop_table("upload_blobs")
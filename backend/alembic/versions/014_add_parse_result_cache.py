@@ -0,0 +1,50 @@
+"""add parse result cache table
+
+Revision ID: 014_add_parse_result_cache
+Revises: 013_add_upload_blobs
+Create Date: 2026-10-17
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "014_add_parse_result_cache"
+down_revision = "013_add_upload_blobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "parse_result_cache_entries",
+        sa.Column("cache_key", sa.String(length=64), nullable=False),
+        sa.Column("kind", sa.String(length=20), nullable=False),
+        sa.Column("content_sha256", sa.String(length=64), nullable=False),
+        sa.Column("payload", sa.Text(), nullable=False),
+        sa.Column("payload_bytes", sa.Integer(), nullable=True),
+        sa.Column("student_count", sa.Integer(), nullable=True),
+        sa.Column("hit_count", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("last_accessed_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("cache_key"),
+    )
+    op.create_index(
+        op.f("ix_parse_result_cache_entries_content_sha256"),
+        "parse_result_cache_entries",
+        ["content_sha256"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_parse_result_cache_entries_last_accessed_at"),
+        "parse_result_cache_entries",
+        ["last_accessed_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_parse_result_cache_entries_last_accessed_at"), table_name="parse_result_cache_entries")
+    op.drop_index(op.f("ix_parse_result_cache_entries_content_sha256"), table_name="parse_result_cache_entries")
+    op.drop_table("parse_result_cache_entries")
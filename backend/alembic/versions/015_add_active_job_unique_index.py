@@ -0,0 +1,119 @@
+"""allow only one queued/running analysis job per file
+
+Revision ID: 015_add_active_job_unique_index
+Revises: 014_add_parse_result_cache
+Create Date: 2026-10-17
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "015_add_active_job_unique_index"
+down_revision = "014_add_parse_result_cache"
+branch_labels = None
+depends_on = None
+
+
+ACTIVE = "status IN ('queued', 'running')"
+
+analysis_jobs = sa.table(
+    "analysis_jobs",
+    sa.column("id", sa.String),
+    sa.column("user_id", sa.Integer),
+    sa.column("score_file_id", sa.Integer),
+    sa.column("analysis_log_id", sa.Integer),
+    sa.column("status", sa.String),
+    sa.column("quota_cost", sa.Integer),
+    sa.column("quota_reserved", sa.Integer),
+    sa.column("quota_refunded", sa.Integer),
+    sa.column("error_message", sa.Text),
+    sa.column("created_at", sa.DateTime(timezone=True)),
+    sa.column("finished_at", sa.DateTime(timezone=True)),
+)
+analysis_logs = sa.table(
+    "analysis_logs",
+    sa.column("id", sa.Integer),
+    sa.column("status", sa.String),
+    sa.column("error_message", sa.Text),
+)
+users = sa.table(
+    "users",
+    sa.column("id", sa.Integer),
+    sa.column("quota_balance", sa.Integer),
+    sa.column("quota_used", sa.Integer),
+)
+quota_transactions = sa.table(
+    "quota_transactions",
+    sa.column("user_id", sa.Integer),
+    sa.column("transaction_type", sa.String),
+    sa.column("amount", sa.Integer),
+    sa.column("balance_after", sa.Integer),
+    sa.column("description", sa.String),
+)
+
+
+def _fail_duplicate_jobs(bind) -> None:
+    """Keep the newest active job of each file; fail and refund the others."""
+    message = "重复的分析任务，已由同一文件的较新任务取代"
+    kept = set()
+    rows = bind.execute(
+        sa.select(analysis_jobs)
+        .where(analysis_jobs.c.status.in_(("queued", "running")))
+        .order_by(analysis_jobs.c.score_file_id, analysis_jobs.c.created_at.desc())
+    ).mappings().all()
+    for job in rows:
+        if job["score_file_id"] not in kept:
+            kept.add(job["score_file_id"])
+            continue
+
+        # Same refund as a failed job (jobs from before reservations were never debited).
+        refunded = int(job["quota_cost"] or 0) if job["quota_reserved"] is not None else 0
+        bind.execute(
+            analysis_jobs.update()
+            .where(analysis_jobs.c.id == job["id"])
+            .values(status="failed", error_message=message, finished_at=sa.func.now(), quota_refunded=refunded)
+        )
+        if job["analysis_log_id"]:
+            bind.execute(
+                analysis_logs.update()
+                .where(analysis_logs.c.id == job["analysis_log_id"])
+                .values(status="failed", error_message=message)
+            )
+        if refunded:
+            balance = bind.execute(
+                users.update()
+                .where(users.c.id == job["user_id"])
+                .values(
+                    quota_balance=users.c.quota_balance + min(refunded, int(job["quota_reserved"] or 0)),
+                    quota_used=users.c.quota_used - refunded,
+                )
+                .returning(users.c.quota_balance)
+            ).scalar()
+            if balance is not None:
+                bind.execute(
+                    quota_transactions.insert().values(
+                        user_id=job["user_id"],
+                        transaction_type="refund",
+                        amount=refunded,
+                        balance_after=int(balance),
+                        description=f"重复的AI分析任务，退还配额（任务 {job['id']}）",
+                    )
+                )
+
+
+def upgrade() -> None:
+    _fail_duplicate_jobs(op.get_bind())
+    op.create_index(
+        "uq_analysis_jobs_active_file",
+        "analysis_jobs",
+        ["score_file_id"],
+        unique=True,
+        postgresql_where=sa.text(ACTIVE),
+        sqlite_where=sa.text(ACTIVE),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_analysis_jobs_active_file", table_name="analysis_jobs")
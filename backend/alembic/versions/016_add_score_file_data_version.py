@@ -0,0 +1,24 @@
+"""add score_files.data_version (ETag version of the student rows)
+
+Revision ID: 016_add_score_file_data_version
+Revises: 015_add_active_job_unique_index
+Create Date: 2026-10-17
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "016_add_score_file_data_version"
+down_revision = "015_add_active_job_unique_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("score_files", sa.Column("data_version", sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade() -> None:
+    op.drop_column("score_files", "data_version")
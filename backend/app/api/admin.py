@@ -2,18 +2,33 @@
 管理员API端点
 """
 import logging
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
 from typing import List
 from datetime import datetime, timedelta
+from urllib.parse import unquote
 
 from ..core.time import utcnow
 
 from ..core.database import get_db
+from ..core.pagination import keyset_page, next_cursor, set_next_cursor
 from ..core.security import get_current_admin_user
 from ..models.user import User, AnalysisLog, QuotaTransaction
 from ..services.file_storage_service import file_storage
+from ..services.blob_disk_cache import blob_disk_cache
+from ..services.upload_store import upload_store
+from ..services.aoai_http_pool import aoai_http_pool
+from ..services.adaptive_concurrency import concurrency_stats
+from ..services.rate_limiter import rate_limit_stats
+from ..services.analysis_cache_service import analysis_cache
+from ..services.mapping_plan_cache_service import mapping_plan_cache
+from ..services.parse_result_cache_service import parse_result_cache
+from ..services.cpu_executor import cpu_executor
+from ..services.analysis_job_service import analysis_job_runner
+from ..services.usage_rollup_service import UsageTotals, usage_rollups
+from ..core.compression import payload_stats
+from ..core.user_cache import user_cache
 from ..schemas import (
     AdminUserListItem,
     AdminSetVIP,
@@ -68,58 +83,33 @@ async def get_all_users(
             (User.username.contains(search)) | (User.email.contains(search))
         )
     
-    # Aggregations (range-based)
-    analysis_agg = (
-        db.query(
-            AnalysisLog.user_id.label("user_id"),
-            func.coalesce(func.sum(AnalysisLog.quota_cost), 0).label("range_quota_used"),
-            func.coalesce(func.sum(getattr(AnalysisLog, "prompt_tokens", 0)), 0).label("range_prompt_tokens"),
-            func.coalesce(func.sum(getattr(AnalysisLog, "completion_tokens", 0)), 0).label("range_completion_tokens"),
+    users = query.order_by(desc(User.created_at)).limit(limit).offset(offset).all()
+    user_ids = [u.id for u in users]
+
+    # Aggregations (range-based)：分析用量读小时/天汇总表，仅边缘与未汇总时段扫描原始日志
+    usage = usage_rollups.usage_by_user(db, start, now, user_ids=user_ids)
+
+    referral_counts = {}
+    if user_ids:
+        referral_counts = dict(
+            db.query(User.referred_by, func.count(User.id))
+            .filter(User.referred_by.in_(user_ids))
+            .filter(User.created_at >= start)
+            .filter(User.created_at <= now)
+            .group_by(User.referred_by)
+            .all()
         )
-        .filter(AnalysisLog.created_at >= start)
-        .filter(AnalysisLog.created_at <= now)
-        .filter(AnalysisLog.status == "success")
-        .group_by(AnalysisLog.user_id)
-        .subquery()
-    )
-
-    referral_agg = (
-        db.query(
-            User.referred_by.label("user_id"),
-            func.count(User.id).label("range_referral_count"),
-        )
-        .filter(User.referred_by.isnot(None))
-        .filter(User.created_at >= start)
-        .filter(User.created_at <= now)
-        .group_by(User.referred_by)
-        .subquery()
-    )
-
-    rows = (
-        query
-        .outerjoin(analysis_agg, analysis_agg.c.user_id == User.id)
-        .outerjoin(referral_agg, referral_agg.c.user_id == User.id)
-        .add_columns(
-            func.coalesce(analysis_agg.c.range_quota_used, 0),
-            func.coalesce(referral_agg.c.range_referral_count, 0),
-            func.coalesce(analysis_agg.c.range_prompt_tokens, 0),
-            func.coalesce(analysis_agg.c.range_completion_tokens, 0),
-        )
-        .order_by(desc(User.created_at))
-        .limit(limit)
-        .offset(offset)
-        .all()
-    )
 
     items: List[AdminUserListItem] = []
-    for u, rq, rr, rp, rc in rows:
+    for u in users:
+        totals = usage.get(u.id) or UsageTotals()
         base = AdminUserListItem.model_validate(u).model_dump()
         base.update(
             {
-                "range_quota_used": int(rq or 0),
-                "range_referral_count": int(rr or 0),
-                "range_prompt_tokens": int(rp or 0),
-                "range_completion_tokens": int(rc or 0),
+                "range_quota_used": totals.quota_cost,
+                "range_referral_count": int(referral_counts.get(u.id) or 0),
+                "range_prompt_tokens": totals.prompt_tokens,
+                "range_completion_tokens": totals.completion_tokens,
             }
         )
         items.append(AdminUserListItem(**base))
@@ -161,6 +151,7 @@ async def set_user_vip(
         user.vip_expires_at = None
     db.commit()
     db.refresh(user)
+    user_cache.invalidate(user.id)
     
     return {
         "message": f"用户VIP状态已更新",
@@ -198,34 +189,26 @@ async def get_quota_usage_by_month(
     else:
         end = datetime(start.year, start.month + 1, 1)
 
-    rows = (
-        db.query(
-            User.id.label("user_id"),
-            User.username,
-            User.email,
-            func.coalesce(func.sum(AnalysisLog.quota_cost), 0).label("total_quota_cost"),
-            func.count(AnalysisLog.id).label("task_count"),
-        )
-        .select_from(AnalysisLog)
-        .join(User, User.id == AnalysisLog.user_id)
-        .filter(AnalysisLog.created_at >= start)
-        .filter(AnalysisLog.created_at < end)
-        .filter(AnalysisLog.status == "success")
-        .group_by(User.id, User.username, User.email)
-        .order_by(desc(func.coalesce(func.sum(AnalysisLog.quota_cost), 0)))
-        .all()
-    )
+    # 成功任务的用量（汇总表 + 未汇总时段的原始日志）
+    usage = {
+        user_id: totals
+        for user_id, totals in usage_rollups.usage_by_user(db, start, end, end_inclusive=False).items()
+        if totals.success_count
+    }
+    users = db.query(User.id, User.username, User.email).filter(User.id.in_(list(usage))).all() if usage else []
 
-    return [
+    items = [
         AdminQuotaUsageItem(
-            user_id=r.user_id,
-            username=r.username,
-            email=r.email,
-            total_quota_cost=int(r.total_quota_cost or 0),
-            task_count=int(r.task_count or 0),
+            user_id=u.id,
+            username=u.username,
+            email=u.email,
+            total_quota_cost=usage[u.id].quota_cost,
+            task_count=usage[u.id].success_count,
         )
-        for r in rows
+        for u in users
     ]
+    items.sort(key=lambda item: item.total_quota_cost, reverse=True)
+    return items
 
 
 @router.get("/quota/tasks", response_model=List[AdminQuotaTaskItem])
@@ -234,10 +217,15 @@ async def get_quota_tasks_by_month(
     user_id: int = None,
     limit: int = 200,
     offset: int = 0,
+    cursor: str = None,
+    response: Response = None,
     current_admin: User = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
-    """按月获取配额消耗明细（任务维度），可按用户筛选"""
+    """按月获取配额消耗明细（任务维度），可按用户筛选
+
+    - 传 cursor（上一页响应头 X-Next-Cursor）按游标翻页，深页与首页同样快；offset 仅为兼容保留
+    """
 
     if month:
         try:
@@ -261,13 +249,13 @@ async def get_quota_tasks_by_month(
         .join(User, User.id == AnalysisLog.user_id)
         .filter(AnalysisLog.created_at >= start)
         .filter(AnalysisLog.created_at < end)
-        .order_by(desc(AnalysisLog.created_at))
     )
 
     if user_id:
         query = query.filter(AnalysisLog.user_id == user_id)
 
-    logs = query.limit(limit).offset(offset).all()
+    logs = keyset_page(query, AnalysisLog, cursor=cursor, limit=limit, offset=offset).all()
+    set_next_cursor(response, next_cursor([log for log, _ in logs], limit))
 
     return [
         AdminQuotaTaskItem(
@@ -304,6 +292,7 @@ async def toggle_user_active(
     user.is_active = not user.is_active
     db.commit()
     db.refresh(user)
+    user_cache.invalidate(user.id)
     
     return {
         "message": f"用户已{'启用' if user.is_active else '禁用'}",
@@ -349,14 +338,16 @@ async def delete_user(
             referrer.referral_count = max(0, (referrer.referral_count or 0) - 1)
 
     # 删除云存储中的上传文件（best-effort）
+    score_files = []
     try:
         # 先触发加载关系，避免删除后再访问
         score_files = list(getattr(user, "score_files", []) or [])
         for sf in score_files:
-            if not getattr(sf, "file_url", None):
+            # 去重存储的文件可能被其他用户引用：删除用户后再释放引用
+            if not getattr(sf, "file_url", None) or sf.content_sha256:
                 continue
             try:
-                blob_name = sf.file_url.split('/')[-1] if '/' in sf.file_url else sf.file_url
+                blob_name = unquote(sf.file_url.replace('\\', '/').split('/')[-1])
                 await file_storage.delete_file(blob_name, file_type="upload")
             except Exception as e:
                 logger.warning(f"删除用户文件失败 user_id={user_id} blob={getattr(sf, 'file_url', None)} err={e}")
@@ -367,8 +358,16 @@ async def delete_user(
     was_admin = user.is_admin
     was_vip = user.is_vip
 
+    referrer_id = user.referred_by
+    released_hashes = [sf.content_sha256 for sf in score_files if sf.content_sha256]
+
     db.delete(user)
     db.commit()
+    for content_sha256 in released_hashes:
+        await upload_store.release(db, content_sha256)
+    user_cache.invalidate(user_id)
+    if referrer_id:
+        user_cache.invalidate(referrer_id)
 
     return {
         "success": True,
@@ -403,46 +402,22 @@ async def get_admin_stats(
     # VIP用户
     vip_users = db.query(func.count(User.id)).filter(User.is_vip == True).scalar()
     
-    # 分析统计
-    total_analyses = db.query(func.count(AnalysisLog.id)).scalar()
-    success_analyses = (
-        db.query(func.count(AnalysisLog.id))
-        .filter(AnalysisLog.status == "success")
-        .scalar()
-    )
-    failed_analyses = (
-        db.query(func.count(AnalysisLog.id))
-        .filter(AnalysisLog.status == "failed")
-        .scalar()
-    )
+    # 分析统计 / 总 tokens 消耗（全平台，成功任务）：汇总表 + 未汇总时段的原始日志
+    usage = usage_rollups.usage_totals(db)
     
     # 总配额使用
     total_quota_used = db.query(func.sum(User.quota_used)).scalar() or 0
-
-    # 总 tokens 消耗（全平台，成功任务）
-    total_prompt_tokens = (
-        db.query(func.coalesce(func.sum(getattr(AnalysisLog, "prompt_tokens", 0)), 0))
-        .filter(AnalysisLog.status == "success")
-        .scalar()
-        or 0
-    )
-    total_completion_tokens = (
-        db.query(func.coalesce(func.sum(getattr(AnalysisLog, "completion_tokens", 0)), 0))
-        .filter(AnalysisLog.status == "success")
-        .scalar()
-        or 0
-    )
     
     return AdminStats(
         total_users=total_users,
         active_users=active_users,
         vip_users=vip_users,
-        total_analyses=total_analyses,
-        success_analyses=success_analyses,
-        failed_analyses=failed_analyses,
+        total_analyses=usage.task_count,
+        success_analyses=usage.success_count,
+        failed_analyses=usage.failed_count,
         total_quota_used=total_quota_used,
-        total_prompt_tokens=int(total_prompt_tokens),
-        total_completion_tokens=int(total_completion_tokens),
+        total_prompt_tokens=usage.prompt_tokens,
+        total_completion_tokens=usage.completion_tokens,
     )
 
 
@@ -452,6 +427,8 @@ async def get_analysis_logs(
     offset: int = 0,
     status_filter: str = None,
     user_id: int = None,
+    cursor: str = None,
+    response: Response = None,
     current_admin: User = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
@@ -459,6 +436,7 @@ async def get_analysis_logs(
     获取所有分析日志
     - 仅管理员可用
     - 支持按状态和用户筛选
+    - 传 cursor（上一页响应头 X-Next-Cursor）按游标翻页；offset 仅为兼容保留
     """
     # Join User so admin UI can display username.
     query = db.query(AnalysisLog, User.username).join(User, User.id == AnalysisLog.user_id)
@@ -469,13 +447,8 @@ async def get_analysis_logs(
     if user_id:
         query = query.filter(AnalysisLog.user_id == user_id)
 
-    rows = (
-        query
-        .order_by(desc(AnalysisLog.created_at))
-        .limit(limit)
-        .offset(offset)
-        .all()
-    )
+    rows = keyset_page(query, AnalysisLog, cursor=cursor, limit=limit, offset=offset).all()
+    set_next_cursor(response, next_cursor([log for log, _ in rows], limit))
 
     items: List[AnalysisLogInfo] = []
     for log, username in rows:
@@ -491,12 +464,15 @@ async def get_user_logs(
     user_id: int,
     limit: int = 50,
     offset: int = 0,
+    cursor: str = None,
+    response: Response = None,
     current_admin: User = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
     """
     获取特定用户的分析日志
     - 仅管理员可用
+    - 传 cursor（上一页响应头 X-Next-Cursor）按游标翻页
     """
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
@@ -505,14 +481,14 @@ async def get_user_logs(
             detail="用户不存在"
         )
     
-    logs = (
-        db.query(AnalysisLog)
-        .filter(AnalysisLog.user_id == user_id)
-        .order_by(desc(AnalysisLog.created_at))
-        .limit(limit)
-        .offset(offset)
-        .all()
-    )
+    logs = keyset_page(
+        db.query(AnalysisLog).filter(AnalysisLog.user_id == user_id),
+        AnalysisLog,
+        cursor=cursor,
+        limit=limit,
+        offset=offset,
+    ).all()
+    set_next_cursor(response, next_cursor(logs, limit))
 
     items: List[AnalysisLogInfo] = []
     for log in logs:
@@ -521,3 +497,43 @@ async def get_user_logs(
         items.append(AnalysisLogInfo(**base))
 
     return items
+
+
+@router.get("/runtime")
+async def get_runtime_stats(
+    current_admin: User = Depends(get_current_admin_user),
+):
+    """
+    进程内运行时指标（监控用）
+    - AOAI 共享连接池：请求数、并发中、连接数/空闲连接数、池配置
+    - AOAI 自适应并发：当前并发上限、限流/错误次数、retry-after 暂停
+    - AOAI RPM/TPM 令牌桶：剩余额度、排队数、累计等待时间
+    - 分析结果缓存：命中/未命中/写入/淘汰次数
+    - 解析映射缓存：命中/未命中/写入/作废次数
+    - 解析结果缓存：命中/未命中/写入/淘汰次数
+    - CPU 任务池：进程/线程、并发中、排队深度、超时/回退次数
+    - AI 分析后台任务：运行中、提交/成功/失败/重新排队次数
+    - 存储压缩：编码次数、原始/落库字节数、节省比例
+    - 登录用户缓存：命中/未命中/失效次数
+    - 用量汇总表：已汇总截止时间、压缩次数/写入行数、迟到日志增量更新次数
+    - 文件存储：Blob 后端类型、连接池配置、上传/下载/删除次数与字节数
+    - Blob 本地磁盘缓存：占用字节/条目数、命中/未命中/写入/淘汰次数、哈希校验失败次数
+    - 上传去重存储：上传次数、去重命中次数/节省字节数、引用释放/对象删除次数
+    - 仅反映当前 worker 进程
+    """
+    return {
+        "aoai_http_pool": aoai_http_pool.stats(),
+        "aoai_concurrency": concurrency_stats(),
+        "aoai_rate_limits": rate_limit_stats(),
+        "analysis_cache": analysis_cache.stats(),
+        "mapping_plan_cache": mapping_plan_cache.stats(),
+        "parse_result_cache": parse_result_cache.stats(),
+        "cpu_executor": cpu_executor.stats(),
+        "analysis_jobs": analysis_job_runner.stats(),
+        "payload_compression": payload_stats.as_dict(),
+        "user_cache": user_cache.stats(),
+        "usage_rollups": usage_rollups.stats(),
+        "blob_storage": file_storage.stats(),
+        "blob_disk_cache": blob_disk_cache.stats(),
+        "upload_store": upload_store.stats(),
+    }
@@ -17,9 +17,11 @@ from ..core.security import (
     get_password_hash,
     create_access_token,
     get_current_user,
+    get_current_identity,
     generate_referral_code,
     SECRET_KEY,
 )
+from ..core.user_cache import user_cache
 from ..models.user import User, QuotaTransaction, EmailCode
 from ..schemas import (
     UserRegister,
@@ -170,6 +172,8 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
 
         db.commit()
         db.refresh(new_user)
+        if referrer:
+            user_cache.invalidate(referrer.id)
     except IntegrityError as e:
         db.rollback()
         # 兜底：并发注册/唯一约束冲突等场景，转成 400
@@ -217,6 +221,7 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
         user.last_login = utcnow()
         db.commit()
         db.refresh(user)
+        user_cache.invalidate(user.id)
     except Exception as e:
         # 记录错误但允许登录继续（可能是数据库只读或锁定）
         print(f"Warning: Failed to update last_login: {e}")
@@ -379,6 +384,7 @@ async def bind_email_confirm(
     except IntegrityError as e:
         db.rollback()
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="该邮箱已被其他账号绑定") from e
+    user_cache.invalidate(current_user.id)
 
     return {"message": "邮箱绑定成功"}
 
@@ -555,12 +561,13 @@ async def password_reset_confirm(payload: PasswordResetConfirmRequest, request:
 
     row.used_at = now
     db.commit()
+    user_cache.invalidate(user.id)
 
     return {"message": "密码重置成功，请使用新密码登录"}
 
 
 @router.get("/me", response_model=UserInfo)
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(current_user: User = Depends(get_current_identity)):
     """
     获取当前登录用户信息
     - 需要JWT token认证
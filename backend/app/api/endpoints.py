@@ -1,29 +1,47 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Body, Depends, status
-from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Body, Depends, Request, Response, status
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Dict
+from typing import List, Dict, Optional
 from pydantic import BaseModel
 import os
+import asyncio
 import logging
+import hashlib
 import tempfile
 import io
 import math
-import numbers
 from pathlib import Path
 from urllib.parse import quote, urlparse, unquote
 from datetime import datetime
+from app.core.config import settings
 from app.core.time import utcnow
+from app.core import fast_json
+from app.core.fast_json import ORJSONResponse
+from app.core.compression import dumps_payload, loads_payload
 from app.models.score import StudentScore, ScoreResponse
 from app.services.analysis_service import AnalysisService
 from app.services.storage_service import StorageService
-from app.services.file_storage_service import file_storage
+from app.services.file_storage_service import UploadTooLarge, file_storage
+from app.services.upload_store import upload_store
 from app.services.export_service import ExportService
 from app.services.visualization_service import VisualizationService
 from app.core.database import get_db
-from app.core.security import get_current_user, check_quota
-from app.models.user import User, AnalysisLog, QuotaTransaction, ScoreFile
+from app.core.security import get_current_user
+from app.models.user import User, AnalysisLog, ScoreFile
 from app.models.file_parse_session import FileParseSession
-from app.services.universal_parsing_service import UniversalParsingService
+from app.services.universal_parsing_service import (
+    UniversalParsingService,
+    extract_preview_for_parse_task,
+    extract_preview_task,
+    parse_full_task,
+)
+from app.services.cpu_executor import cpu_executor
+from app.services.mapping_plan_cache_service import mapping_plan_cache
+from app.services.parse_result_cache_service import parse_result_cache
+from app.services.analysis_job_service import analysis_job_runner, job_snapshot
+from app.services import student_store
+from app.services.quota_service import QuotaExceeded
+from app.models.analysis_job import AnalysisJob
 import pandas as pd
 import uuid
 import json
@@ -66,32 +84,48 @@ async def upload_file(
             logger.error(f"不支持的文件格式: {file.filename}")
             raise HTTPException(status_code=400, detail="不支持的文件格式，仅支持 .xlsx, .docx, .pptx 格式")
         
-        # 读取文件内容
-        content = await file.read()
-        
-        # 保存上传的文件到存储服务
+        # 保存上传的文件到存储服务（按内容 SHA-256 去重：相同内容只存一份，重复上传跳过写入；
+        # 新内容分块流式写入，超过上限立即中止）
         logger.info(f"保存文件到存储: {file.filename}")
         try:
             # 保存到云存储或本地
-            file_url = await file_storage.save_file(
-                file_content=content,
+            stored = await upload_store.save(
+                db,
+                file,
                 filename=file.filename,
-                file_type="upload",
-                content_type=file.content_type
+                content_type=file.content_type,
+                max_bytes=settings.MAX_UPLOAD_SIZE_BYTES or None,
+            )
+            file_url = stored.url
+            logger.info(
+                f"文件保存成功: {file_url} ({stored.size} bytes, sha256={stored.sha256}, "
+                f"deduplicated={stored.deduplicated})"
             )
-            logger.info(f"文件保存成功: {file_url}")
 
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
         except Exception as e:
             logger.error(f"保存文件失败: {str(e)}")
             raise HTTPException(status_code=500, detail=f"保存文件失败: {str(e)}")
         
+        # 解析器需要完整文件（xlsx/docx/pptx 均为 zip 容器）：解析结果缓存未命中时才从上传的临时文件读回
+        content: Optional[bytes] = None
+        
+        async def _read_content() -> bytes:
+            nonlocal content
+            if content is None:
+                await file.seek(0)
+                content = await file.read()
+            return content
+        
         try:
             # 保存 ScoreFile 记录（稍后写入解析结果）
             score_file = ScoreFile(
                 user_id=current_user.id,
                 filename=file.filename,
-                file_size=len(content),
+                file_size=stored.size,
                 file_type=Path(file.filename).suffix.lstrip('.'),  # 去掉开头的点
+                content_sha256=stored.sha256,
                 student_count=0,
                 file_url=file_url,
                 analysis_completed=False,
@@ -103,44 +137,80 @@ async def upload_file(
             db.refresh(score_file)
 
             # 自动全能解析（无需用户确认映射）
-            preview = UniversalParsingService.extract_preview(file_bytes=content, filename=file.filename)
+            # 相同内容的文件：预览和解析结果直接取自解析结果缓存
+            # 解析是 CPU 密集型操作：放到进程池执行，避免阻塞事件循环
+            # 预览已解码的工作表随预览一起返回，完整解析直接复用（xlsx 只解码一次）
+            decoded_sheets = None
+            preview = await asyncio.to_thread(parse_result_cache.get_preview, stored.sha256, file.filename)
+            if preview is None:
+                preview, decoded_sheets = await cpu_executor.run(
+                    extract_preview_for_parse_task, await _read_content(), file.filename
+                )
+                await asyncio.to_thread(parse_result_cache.put_preview, stored.sha256, file.filename, preview)
             mapping_result = await UniversalParsingService.infer_mapping(
                 file_type=preview.file_type,
                 ir=preview.ir,
                 preview=preview.preview,
+                user_id=current_user.id,
             )
-            student_scores = UniversalParsingService.parse_full(
-                file_bytes=content,
-                filename=file.filename,
-                mapping=mapping_result.mapping,
+            students_payload = await asyncio.to_thread(
+                parse_result_cache.get_students, stored.sha256, file.filename, mapping_result.mapping
             )
+            parse_cached = students_payload is not None
+            if students_payload is None:
+                student_scores = await cpu_executor.run(
+                    parse_full_task,
+                    await _read_content(),
+                    file.filename,
+                    mapping_result.mapping,
+                    decoded_sheets,
+                )
 
-            _log_parsed_scores(
-                student_scores,
-                context=f"upload:file_id={score_file.id}:name={file.filename}",
-                ir=preview.ir,
-                preview=preview.preview,
-            )
+                _log_parsed_scores(
+                    student_scores,
+                    context=f"upload:file_id={score_file.id}:name={file.filename}",
+                    ir=preview.ir,
+                    preview=preview.preview,
+                )
+
+                # 只序列化一次：NaN/Inf 由 orjson 原生输出为 null
+                students_payload = [s.model_dump() for s in student_scores]
+                await asyncio.to_thread(
+                    parse_result_cache.put_students,
+                    stored.sha256,
+                    file.filename,
+                    mapping_result.mapping,
+                    students_payload,
+                )
 
-            if not student_scores:
+            if not students_payload:
                 raise HTTPException(status_code=400, detail="未能从文件中提取到有效的成绩数据")
 
-            students_payload = _json_sanitize([s.dict() for s in student_scores])
+            # 解析成功：记住该模板结构对应的映射，下次同模板上传跳过 AI 推断
+            if not mapping_result.cached:
+                await asyncio.to_thread(
+                    mapping_plan_cache.remember,
+                    fingerprint=mapping_plan_cache.fingerprint(preview.file_type, preview.ir),
+                    user_id=current_user.id,
+                    file_type=preview.file_type,
+                    mapping=mapping_result.mapping,
+                    confidence=mapping_result.confidence,
+                )
 
-            score_file.student_count = len(student_scores)
+            score_file.student_count = len(students_payload)
             score_file.analysis_completed = False
             score_file.analyzed_at = None
-            score_file.analysis_result = json.dumps(students_payload, ensure_ascii=False, allow_nan=False)
+            student_store.replace_students(db, score_file.id, students_payload)
             db.commit()
 
             processing_time = (datetime.utcnow() - start_time).total_seconds()
 
-            return ScoreResponse(
-                success=True,
-                message="解析成功，请点击 AI 分析",
-                data=students_payload,
-                original_filename=file.filename,
-                processing_info={
+            return ORJSONResponse({
+                "success": True,
+                "message": "解析成功，请点击 AI 分析",
+                "data": students_payload,
+                "original_filename": file.filename,
+                "processing_info": {
                     "file_id": score_file.id,
                     "student_count": score_file.student_count,
                     "quota_cost": 0,
@@ -148,8 +218,10 @@ async def upload_file(
                     "processing_time": processing_time,
                     "stages_completed": ["upload", "save", "parse"],
                     "parse_usage": getattr(mapping_result, "usage", None),
+                    "mapping_cached": mapping_result.cached,
+                    "parse_cached": parse_cached,
                 },
-            )
+            })
 
         except HTTPException as he:
             logger.error(f"❌ HTTP异常: {he.status_code} - {he.detail}")
@@ -179,6 +251,8 @@ async def upload_file(
 
 class AnalyzeFileRequest(BaseModel):
     one_shot_text: str | None = None
+    # 已分析文件：只补跑分析失败的学生（不重复扣费）
+    resume: bool = False
 
 
 class ParsePreviewRequest(BaseModel):
@@ -220,36 +294,6 @@ def _deep_merge_dict(base: dict, override: dict) -> dict:
     return out
 
 
-def _json_sanitize(value):
-    """Convert values to be JSON-compliant (replace NaN/Infinity with None).
-
-    Starlette's JSONResponse uses json.dumps(..., allow_nan=False) so any NaN/Inf
-    will crash the response serialization.
-    """
-    if value is None or isinstance(value, (str, bool, int)):
-        return value
-
-    # Handle native floats
-    if isinstance(value, float):
-        return value if math.isfinite(value) else None
-
-    # Handle numpy/pandas numeric scalars (and other Real types)
-    if isinstance(value, numbers.Real):
-        try:
-            f = float(value)
-            return f if math.isfinite(f) else None
-        except Exception:
-            return None
-
-    if isinstance(value, dict):
-        return {k: _json_sanitize(v) for k, v in value.items()}
-
-    if isinstance(value, (list, tuple, set)):
-        return [_json_sanitize(v) for v in value]
-
-    return value
-
-
 def _log_parsed_scores(
     student_scores: list,
     *,
@@ -376,28 +420,42 @@ async def parse_preview(
     if not file_record.file_url:
         raise HTTPException(status_code=400, detail="文件缺少存储地址，无法解析")
 
-    try:
-        storage_key = _extract_storage_key(file_record.file_url)
-        file_bytes = await file_storage.read_file(
-            storage_key if file_storage.storage_type == "azure" else file_record.file_url,
-            file_type="upload",
-        )
-    except Exception as e:
-        logger.error(
-            "读取文件失败: %s | storage_type=%s | file_url=%s | storage_key=%s",
-            e,
-            file_storage.storage_type,
-            file_record.file_url,
-            storage_key if 'storage_key' in locals() else None,
-        )
-        raise HTTPException(status_code=500, detail=f"读取文件失败: {str(e)}")
+    # 同一文件内容的预览（IR + 样本）来自解析结果缓存时，不再读取存储/重新提取（旧记录无内容哈希，不缓存）
+    content_sha256 = file_record.content_sha256
+    preview = (
+        await asyncio.to_thread(parse_result_cache.get_preview, content_sha256, file_record.filename)
+        if content_sha256
+        else None
+    )
+    parse_cached = preview is not None
+
+    if preview is None:
+        try:
+            storage_key = _extract_storage_key(file_record.file_url)
+            file_bytes = await file_storage.read_file(
+                storage_key if file_storage.storage_type == "azure" else file_record.file_url,
+                file_type="upload",
+            )
+        except Exception as e:
+            logger.error(
+                "读取文件失败: %s | storage_type=%s | file_url=%s | storage_key=%s",
+                e,
+                file_storage.storage_type,
+                file_record.file_url,
+                storage_key if 'storage_key' in locals() else None,
+            )
+            raise HTTPException(status_code=500, detail=f"读取文件失败: {str(e)}")
 
     try:
-        preview = UniversalParsingService.extract_preview(file_bytes=file_bytes, filename=file_record.filename)
+        if preview is None:
+            preview = await cpu_executor.run(extract_preview_task, file_bytes, file_record.filename)
+            if content_sha256:
+                await asyncio.to_thread(parse_result_cache.put_preview, content_sha256, file_record.filename, preview)
         mapping_result = await UniversalParsingService.infer_mapping(
             file_type=preview.file_type,
             ir=preview.ir,
             preview=preview.preview,
+            user_id=current_user.id,
         )
     except Exception as e:
         logger.error(f"生成解析预览失败: {e}")
@@ -412,14 +470,14 @@ async def parse_preview(
         score_file_id=file_record.id,
         status="previewed",
         file_type=preview.file_type,
-        ir_json=json.dumps(preview.ir, ensure_ascii=False),
-        ai_mapping_json=json.dumps(mapping_result.mapping, ensure_ascii=False),
+        ir_json=dumps_payload(preview.ir),
+        ai_mapping_json=dumps_payload(mapping_result.mapping),
         expires_at=expires_at,
     )
     db.add(session)
     db.commit()
 
-    return JSONResponse(
+    return ORJSONResponse(
         {
             "success": True,
             "message": "解析预览生成成功",
@@ -434,6 +492,8 @@ async def parse_preview(
                 "ir": preview.ir,
                 "preview": preview.preview,
                 "usage": mapping_result.usage,
+                "mapping_cached": mapping_result.cached,
+                "parse_cached": parse_cached,
                 "expires_at": expires_at.isoformat(),
             },
         }
@@ -469,56 +529,84 @@ async def parse_confirm(
         raise HTTPException(status_code=400, detail="文件缺少存储地址，无法解析")
 
     try:
-        stored_mapping = json.loads(session.ai_mapping_json) if session.ai_mapping_json else {}
+        stored_mapping = loads_payload(session.ai_mapping_json, {})
     except Exception:
         stored_mapping = {}
 
     override_mapping = request.mapping if isinstance(request.mapping, dict) else {}
     merged_mapping = _deep_merge_dict(stored_mapping, override_mapping)
 
-    try:
-        storage_key = _extract_storage_key(file_record.file_url)
-        file_bytes = await file_storage.read_file(
-            storage_key if file_storage.storage_type == "azure" else file_record.file_url,
-            file_type="upload",
-        )
-        student_scores = UniversalParsingService.parse_full(
-            file_bytes=file_bytes,
-            filename=file_record.filename,
-            mapping=merged_mapping,
-        )
+    # 同一文件内容 + 映射已解析过（上传时或上次确认）：直接复用解析结果，不再读取存储/重新解析
+    content_sha256 = file_record.content_sha256
+    students_payload = (
+        await asyncio.to_thread(parse_result_cache.get_students, content_sha256, file_record.filename, merged_mapping)
+        if content_sha256
+        else None
+    )
+    parse_cached = students_payload is not None
 
-        _log_parsed_scores(
-            student_scores,
-            context=f"confirm:file_id={file_record.id}:name={file_record.filename}",
-        )
-    except Exception as e:
-        logger.error(
-            "确认解析失败: %s | storage_type=%s | file_url=%s | storage_key=%s",
-            e,
-            file_storage.storage_type,
-            file_record.file_url,
-            storage_key if 'storage_key' in locals() else None,
-        )
-        raise HTTPException(status_code=500, detail=f"确认解析失败: {str(e)}")
+    if students_payload is None:
+        try:
+            storage_key = _extract_storage_key(file_record.file_url)
+            file_bytes = await file_storage.read_file(
+                storage_key if file_storage.storage_type == "azure" else file_record.file_url,
+                file_type="upload",
+            )
+            student_scores = await cpu_executor.run(parse_full_task, file_bytes, file_record.filename, merged_mapping)
 
-    if not student_scores:
+            _log_parsed_scores(
+                student_scores,
+                context=f"confirm:file_id={file_record.id}:name={file_record.filename}",
+            )
+        except Exception as e:
+            logger.error(
+                "确认解析失败: %s | storage_type=%s | file_url=%s | storage_key=%s",
+                e,
+                file_storage.storage_type,
+                file_record.file_url,
+                storage_key if 'storage_key' in locals() else None,
+            )
+            raise HTTPException(status_code=500, detail=f"确认解析失败: {str(e)}")
+
+        students_payload = [s.model_dump() for s in student_scores]
+        if content_sha256:
+            await asyncio.to_thread(
+                parse_result_cache.put_students, content_sha256, file_record.filename, merged_mapping, students_payload
+            )
+
+    if not students_payload:
         raise HTTPException(status_code=400, detail="未能从文件中提取到有效的成绩数据")
 
-    students_payload = _json_sanitize([s.dict() for s in student_scores])
+    # 映射缓存：用户修改了映射 => 作废该用户对该模板的缓存映射（全局映射不受影响），并记住用户修正后的映射
+    try:
+        session_ir = loads_payload(session.ir_json, {})
+    except Exception:
+        session_ir = {}
+    fingerprint = mapping_plan_cache.fingerprint(session.file_type, session_ir)
+    if override_mapping:
+        await asyncio.to_thread(mapping_plan_cache.invalidate, fingerprint=fingerprint, user_id=current_user.id)
+        await asyncio.to_thread(
+            mapping_plan_cache.remember,
+            fingerprint=fingerprint,
+            user_id=current_user.id,
+            file_type=session.file_type,
+            mapping=merged_mapping,
+            confidence=1.0,
+            source="user",
+        )
 
-    file_record.student_count = len(student_scores)
+    file_record.student_count = len(students_payload)
     file_record.analysis_completed = False
     file_record.analyzed_at = None
-    # Persist strict JSON (no NaN/Infinity)
-    file_record.analysis_result = json.dumps(students_payload, ensure_ascii=False, allow_nan=False)
+    file_record.analysis_result = None
+    student_store.replace_students(db, file_record.id, students_payload)
 
     session.status = "confirmed"
     session.confirmed_at = utcnow()
 
     db.commit()
 
-    return JSONResponse(
+    return ORJSONResponse(
         {
             "success": True,
             "message": "确认解析成功",
@@ -527,6 +615,7 @@ async def parse_confirm(
                 "student_count": file_record.student_count,
                 "students": students_payload,
                 "mapping": merged_mapping,
+                "parse_cached": parse_cached,
             },
         }
     )
@@ -539,9 +628,14 @@ async def analyze_file(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """对已上传解析的文件触发AI分析（需要认证）"""
-    start_time = datetime.utcnow()
-
+    """
+    对已上传解析的文件触发AI分析（需要认证）
+    - 已分析过：200 直接返回结果（幂等）
+    - 否则创建后台分析任务：202 + job_id（同一文件已有进行中的任务则复用）
+    - 已完成的学生逐个保存检查点；任务中断/失败后重新提交只分析缺失的学生
+    - resume=true：已分析文件中分析失败的学生单独补跑（不重复扣费）
+    - 进度：GET /analysis-jobs/{job_id}（轮询）或 GET /analysis-jobs/{job_id}/events（SSE）
+    """
     # 查询文件记录
     file_record = db.query(ScoreFile).filter(
         ScoreFile.id == file_id,
@@ -551,20 +645,37 @@ async def analyze_file(
     if not file_record:
         raise HTTPException(status_code=404, detail="文件不存在")
 
+    student_store.ensure_backfilled(db, file_record)
+    student_count = student_store.count_students(db, file_record.id)
+
     # 已分析过则直接返回（幂等）
-    import json
-    if file_record.analysis_completed and file_record.analysis_result:
-        try:
-            students_data = json.loads(file_record.analysis_result)
-        except Exception:
-            students_data = []
+    if file_record.analysis_completed and student_count:
+        students_data = student_store.load_students(db, file_record.id)
+
+        failed_students = [
+            s for s in (students_data or [])
+            if str((s or {}).get("analysis") or "").startswith(AnalysisService.FAILED_ANALYSIS_PREFIX)
+        ]
+        if request.resume and failed_students:
+            job = analysis_job_runner.find_active_job(db, file_id=file_record.id, user_id=current_user.id)
+            if job is None:
+                # 失败学生的配额已退还，补跑时只为这些学生预留配额
+                job = _create_analysis_job(
+                    db,
+                    user=current_user,
+                    file_record=file_record,
+                    student_count=len(students_data),
+                    one_shot_text=request.one_shot_text,
+                    quota_cost=len(failed_students),
+                )
+            return _analysis_job_accepted(job)
 
-        return ScoreResponse(
-            success=True,
-            message="文件已完成AI分析",
-            data=[StudentScore(**s) for s in students_data],
-            original_filename=file_record.filename,
-            processing_info={
+        return ORJSONResponse({
+            "success": True,
+            "message": "文件已完成AI分析",
+            "data": students_data,
+            "original_filename": file_record.filename,
+            "processing_info": {
                 "file_id": file_record.id,
                 "student_count": file_record.student_count,
                 "quota_cost": file_record.student_count,
@@ -573,135 +684,143 @@ async def analyze_file(
                 "processing_time": None,
                 "stages_completed": ["upload", "parse", "analyze", "save"],
             },
-        )
+        })
 
-    if not file_record.analysis_result:
+    if not student_count:
         raise HTTPException(status_code=400, detail="文件尚未完成解析，无法进行AI分析")
 
-    # 解析保存的解析结果JSON
-    try:
-        students_data = json.loads(file_record.analysis_result)
-    except Exception:
-        students_data = []
-
-    scores: List[StudentScore] = [StudentScore(**s) for s in (students_data or [])]
-    if not scores:
-        raise HTTPException(status_code=400, detail="未找到可分析的学生数据")
-
-    student_count = len(scores)
-    quota_cost = student_count
-    if not check_quota(current_user, quota_cost):
-        raise HTTPException(
-            status_code=status.HTTP_402_PAYMENT_REQUIRED,
-            detail=f"配额不足。需要 {quota_cost} 配额，当前余额 {current_user.quota_balance}",
+    # 同一文件已有排队/运行中的任务：复用，避免重复扣费
+    job = analysis_job_runner.find_active_job(db, file_id=file_record.id, user_id=current_user.id)
+    if job is None:
+        job = _create_analysis_job(
+            db,
+            user=current_user,
+            file_record=file_record,
+            student_count=student_count,
+            one_shot_text=request.one_shot_text,
+            quota_cost=student_count,
         )
 
-    analysis_log = AnalysisLog(
-        user_id=current_user.id,
-        filename=file_record.filename,
-        file_type=file_record.file_type,
-        student_count=student_count,
-        quota_cost=quota_cost,
-        status="processing",
-    )
-    db.add(analysis_log)
-    db.commit()
-    db.refresh(analysis_log)
+    return _analysis_job_accepted(job)
 
-    try:
-        one_shot_text = (request.one_shot_text or "").strip() or None
 
-        # 调用 AOAI 批量分析成绩
-        analyzed_scores, usage = await AnalysisService.analyze_scores_batch(
-            scores,
-            max_concurrent=50,
-            one_shot_text=one_shot_text,
+def _create_analysis_job(
+    db: Session,
+    *,
+    user: User,
+    file_record: ScoreFile,
+    student_count: int,
+    one_shot_text: Optional[str],
+    quota_cost: int,
+) -> AnalysisJob:
+    """创建分析任务并原子预留配额（余额不足返回 402）"""
+    try:
+        return analysis_job_runner.create_job(
+            db,
+            user=user,
+            file_record=file_record,
+            student_count=student_count,
+            one_shot_text=(one_shot_text or "").strip() or None,
+            quota_cost=quota_cost,
         )
+    except QuotaExceeded as e:
+        raise HTTPException(status_code=status.HTTP_402_PAYMENT_REQUIRED, detail=str(e)) from e
 
-        # 扣除配额（仅普通用户）
-        if not current_user.is_vip:
-            current_user.quota_balance -= quota_cost
-        current_user.quota_used += quota_cost
 
-        quota_transaction = QuotaTransaction(
-            user_id=current_user.id,
-            transaction_type="analysis_cost",
-            amount=-quota_cost,
-            balance_after=current_user.quota_balance,
-            description=f"分析文件: {file_record.filename}",
-        )
-        db.add(quota_transaction)
+def _analysis_job_accepted(job: AnalysisJob) -> ORJSONResponse:
+    analysis_job_runner.submit(job.id)
+    return ORJSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={
+            "success": True,
+            "message": "AI分析任务已提交",
+            "job": job_snapshot(job),
+            "status_url": f"/api/analysis-jobs/{job.id}",
+            "events_url": f"/api/analysis-jobs/{job.id}/events",
+        },
+    )
 
-        # 更新分析日志
-        processing_time = (datetime.utcnow() - start_time).total_seconds()
-        analysis_log.status = "success"
-        analysis_log.processing_time = processing_time
-        try:
-            analysis_log.prompt_tokens = int((usage or {}).get("prompt_tokens", 0) or 0)
-            analysis_log.completion_tokens = int((usage or {}).get("completion_tokens", 0) or 0)
-        except Exception:
-            pass
 
-        # 更新ScoreFile记录
-        file_record.analysis_completed = True
-        file_record.analyzed_at = utcnow()
-        file_record.analysis_result = json.dumps([s.dict() for s in analyzed_scores], ensure_ascii=False)
+def _get_owned_job(db: Session, job_id: str, user: User) -> AnalysisJob:
+    job = db.query(AnalysisJob).filter(
+        AnalysisJob.id == job_id,
+        AnalysisJob.user_id == user.id,
+    ).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="分析任务不存在")
+    return job
 
-        db.commit()
 
-        return ScoreResponse(
-            success=True,
+@router.get("/analysis-jobs/{job_id}")
+async def get_analysis_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """查询AI分析任务状态（轮询）；成功后附带完整分析结果（与原同步接口的 data/processing_info 一致）"""
+    job = _get_owned_job(db, job_id, current_user)
+    payload = {
+        "success": job.status != "failed",
+        "message": job.error_message if job.status == "failed" else None,
+        "job": job_snapshot(job),
+    }
+
+    if job.status == "succeeded":
+        file_record = db.query(ScoreFile).filter(ScoreFile.id == job.score_file_id).first()
+        analysis_log = (
+            db.query(AnalysisLog).filter(AnalysisLog.id == job.analysis_log_id).first()
+            if job.analysis_log_id
+            else None
+        )
+        students_data = student_store.load_students(db, job.score_file_id) if file_record else []
+
+        payload.update(
             message="AI分析完成",
-            data=analyzed_scores,
-            original_filename=file_record.filename,
+            data=students_data,
+            original_filename=file_record.filename if file_record else None,
             processing_info={
-                "file_id": file_record.id,
-                "student_count": student_count,
-                "analyzed_count": student_count,
-                "quota_cost": quota_cost,
+                "file_id": job.score_file_id,
+                "student_count": job.total_students,
+                "analyzed_count": len(students_data or []),
+                "quota_cost": int(job.quota_cost or 0) - int(job.quota_refunded or 0),
+                "quota_refunded": int(job.quota_refunded or 0),
+                "resumed_count": job.resumed_students,
                 "quota_remaining": current_user.quota_balance,
-                "processing_time": processing_time,
+                "processing_time": analysis_log.processing_time if analysis_log else None,
                 "analysis_completed": True,
                 "stages_completed": ["upload", "parse", "analyze", "save"],
             },
         )
 
-    except HTTPException as he:
-        # Best-effort: persist failure reason for admin logs.
-        try:
-            db.rollback()
-        except Exception:
-            pass
-        processing_time = (datetime.utcnow() - start_time).total_seconds()
-        try:
-            analysis_log.status = "failed"
-            analysis_log.error_message = f"HTTPException {he.status_code}: {he.detail}"
-            analysis_log.processing_time = processing_time
-            db.commit()
-        except Exception:
-            try:
-                db.rollback()
-            except Exception:
-                pass
-        raise
-    except Exception as e:
-        logger.exception("AI分析失败: file_id=%s user_id=%s", file_record.id, current_user.id)
-        try:
-            db.rollback()
-        except Exception:
-            pass
-        processing_time = (datetime.utcnow() - start_time).total_seconds()
-        try:
-            analysis_log.status = "failed"
-            analysis_log.error_message = f"{type(e).__name__}: {str(e)}"
-            analysis_log.processing_time = processing_time
-            db.commit()
-        except Exception:
-            try:
-                db.rollback()
-            except Exception:
-                pass
-        raise HTTPException(status_code=500, detail=f"AI分析失败: {str(e)}")
+    return payload
+
+
+@router.get("/analysis-jobs/{job_id}/events")
+async def stream_analysis_job_events(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    AI分析任务进度流（Server-Sent Events）
+    - started / student（每个学生完成，含分析结果）/ progress（跨 worker 轮询） / done
+    - 同一 worker 上的任务会先回放已完成的学生，再实时推送
+    """
+    job = _get_owned_job(db, job_id, current_user)
+
+    async def event_stream():
+        async for event in analysis_job_runner.events(job.id):
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            data = fast_json.dumps_str(event)
+            yield f"event: {event.get('type', 'message')}\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.get("/student/{student_name}", response_model=ScoreResponse)
 async def get_student_score(student_name: str):
@@ -860,7 +979,7 @@ async def get_chart(chart_type: str):
             raise HTTPException(status_code=400, detail="不支持的图表类型")
         
         # 返回图表 URL（可能是本地路径或 Azure Blob URL）
-        return JSONResponse({
+        return ORJSONResponse({
             "success": True,
             "chart_url": file_url,
             "chart_type": chart_type
@@ -909,7 +1028,7 @@ async def get_user_files(
                 "analyzed_at": file.analyzed_at.isoformat() if file.analyzed_at else None,
             })
         
-        return JSONResponse({
+        return ORJSONResponse({
             "success": True,
             "data": file_list,
             "pagination": {
@@ -924,14 +1043,37 @@ async def get_user_files(
         raise HTTPException(status_code=500, detail=f"获取历史文件列表失败: {str(e)}")
 
 
+def _parse_student_fields(fields: str | None) -> list[str] | None:
+    if not fields or not fields.strip():
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in student_store.STUDENT_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"未知字段: {', '.join(unknown)}；可选: {', '.join(student_store.STUDENT_FIELDS)}",
+        )
+    return requested
+
+
 @router.get("/files/{file_id}")
 async def get_file_detail(
     file_id: int,
+    request: Request,
+    page: int | None = Query(None, ge=1, description="页码；不传则返回全部学生"),
+    page_size: int = Query(50, ge=1, le=500),
+    name: str | None = Query(None, description="按学生姓名过滤（包含匹配）"),
+    fields: str | None = Query(
+        None,
+        description="学生字段投影（逗号分隔）：student_name,scores,total_score,analysis,suggestions；student_name 总是返回",
+    ),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     获取指定文件的详细信息（包括学生成绩数据）
+    - page/page_size 分页、name 姓名过滤、fields 字段投影（均在 SQL 中完成）
+    - 返回 ETag；If-None-Match 命中时返回 304（文件未变化不重复下发）
     """
     try:
         # 查询文件记录
@@ -942,32 +1084,71 @@ async def get_file_detail(
         
         if not file_record:
             raise HTTPException(status_code=404, detail="文件不存在")
-        
-        # 解析保存的分析结果JSON
-        import json
-        students_data = []
-        if file_record.analysis_result:
-            try:
-                students_data = json.loads(file_record.analysis_result)
-            except Exception as e:
-                logger.warning(f"解析分析结果失败: {str(e)}")
-        
-        return JSONResponse({
-            "success": True,
-            "data": {
-                "id": file_record.id,
-                "filename": file_record.filename,
-                "file_type": file_record.file_type,
-                "file_size": file_record.file_size,
-                "file_url": file_record.file_url,
-                "student_count": file_record.student_count,
-                "analysis_completed": file_record.analysis_completed,
-                "students": students_data,
-                "uploaded_at": file_record.uploaded_at.isoformat() if file_record.uploaded_at else None,
-                "analyzed_at": file_record.analyzed_at.isoformat() if file_record.analyzed_at else None,
-                # "students": []  # TODO: 添加学生成绩数据
+
+        projection = _parse_student_fields(fields)
+        student_store.ensure_backfilled(db, file_record)
+
+        # ETag：文件状态 + 学生行版本 + 查询参数
+        etag_material = json.dumps(
+            [
+                file_record.id,
+                file_record.filename,
+                file_record.student_count,
+                bool(file_record.analysis_completed),
+                str(file_record.analyzed_at or ""),
+                student_store.version_token(db, file_record.id),
+                page,
+                page_size if page else None,
+                name or "",
+                projection,
+            ],
+            ensure_ascii=False,
+        )
+        etag = f'W/"{hashlib.sha256(etag_material.encode("utf-8")).hexdigest()[:32]}"'
+        cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if_none_match = request.headers.get("if-none-match") or ""
+        if etag in [t.strip() for t in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+
+        pagination = None
+        if page is not None:
+            total = student_store.count_students(db, file_record.id, name=name)
+            students_data = student_store.load_students(
+                db,
+                file_record.id,
+                offset=(page - 1) * page_size,
+                limit=page_size,
+                name=name,
+                fields=projection,
+            )
+            pagination = {
+                "page": page,
+                "page_size": page_size,
+                "total": total,
+                "total_pages": (total + page_size - 1) // page_size,
             }
-        })
+        else:
+            students_data = student_store.load_students(db, file_record.id, name=name, fields=projection)
+
+        return ORJSONResponse(
+            {
+                "success": True,
+                "data": {
+                    "id": file_record.id,
+                    "filename": file_record.filename,
+                    "file_type": file_record.file_type,
+                    "file_size": file_record.file_size,
+                    "file_url": file_record.file_url,
+                    "student_count": file_record.student_count,
+                    "analysis_completed": file_record.analysis_completed,
+                    "students": students_data,
+                    "uploaded_at": file_record.uploaded_at.isoformat() if file_record.uploaded_at else None,
+                    "analyzed_at": file_record.analyzed_at.isoformat() if file_record.analyzed_at else None,
+                },
+                "pagination": pagination,
+            },
+            headers=cache_headers,
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -994,21 +1175,26 @@ async def delete_file(
         if not file_record:
             raise HTTPException(status_code=404, detail="文件不存在")
         
-        # 删除云存储中的文件（如果有）
-        if file_record.file_url:
+        # 删除云存储中的文件（旧记录各有一份独立副本；去重存储的文件在删除记录后释放引用）
+        if file_record.file_url and not file_record.content_sha256:
             try:
-                # 从 URL 中提取 blob 名称
-                blob_name = file_record.file_url.split('/')[-1] if '/' in file_record.file_url else file_record.file_url
+                # 从 URL 中提取 blob 名称（URL 中为编码后的名称，需解码）
+                blob_name = _extract_storage_key(file_record.file_url)
                 await file_storage.delete_file(blob_name, file_type="upload")
                 logger.info(f"已删除云存储文件: {blob_name}")
             except Exception as e:
                 logger.warning(f"删除云存储文件失败: {str(e)}")
         
         # 删除数据库记录
+        content_sha256 = file_record.content_sha256
+        student_store.delete_students(db, file_record.id)
         db.delete(file_record)
         db.commit()
         
-        return JSONResponse({
+        if content_sha256:
+            await upload_store.release(db, content_sha256)
+        
+        return ORJSONResponse({
             "success": True,
             "message": "文件删除成功"
         })
@@ -1032,6 +1218,7 @@ async def batch_delete_files(
     try:
         deleted_count = 0
         failed_ids = []
+        released_hashes = []
         
         for file_id in file_ids:
             try:
@@ -1042,19 +1229,22 @@ async def batch_delete_files(
                 ).first()
                 
                 if file_record:
-                    # 删除云存储中的文件（如果有）
-                    if file_record.file_url:
+                    # 删除云存储中的文件（旧记录各有一份独立副本；去重存储的文件在提交后释放引用）
+                    if file_record.file_url and not file_record.content_sha256:
                         try:
-                            # 从 URL 中提取 blob 名称
-                            blob_name = file_record.file_url.split('/')[-1] if '/' in file_record.file_url else file_record.file_url
+                            # 从 URL 中提取 blob 名称（URL 中为编码后的名称，需解码）
+                            blob_name = _extract_storage_key(file_record.file_url)
                             await file_storage.delete_file(blob_name, file_type="upload")
                             logger.info(f"已删除云存储文件: {blob_name}")
                         except Exception as e:
                             logger.warning(f"删除云存储文件失败: {str(e)}")
                     
                     # 删除数据库记录
+                    student_store.delete_students(db, file_record.id)
                     db.delete(file_record)
                     deleted_count += 1
+                    if file_record.content_sha256:
+                        released_hashes.append(file_record.content_sha256)
                 else:
                     failed_ids.append(file_id)
             except Exception as e:
@@ -1063,7 +1253,10 @@ async def batch_delete_files(
         
         db.commit()
         
-        return JSONResponse({
+        for content_sha256 in released_hashes:
+            await upload_store.release(db, content_sha256)
+        
+        return ORJSONResponse({
             "success": True,
             "message": f"成功删除 {deleted_count} 个文件",
             "deleted_count": deleted_count,
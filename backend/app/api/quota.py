@@ -1,14 +1,16 @@
 """
 配额管理API端点
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
+from sqlalchemy import func
 from typing import List
 from datetime import datetime, timedelta
 
 from ..core.database import get_db
-from ..core.security import get_current_user, get_current_admin_user, check_quota
+from ..core.pagination import keyset_page, next_cursor, set_next_cursor
+from ..core.security import get_current_user, get_current_identity, get_current_admin_user, check_quota
+from ..core.user_cache import user_cache
 from ..models.user import User, QuotaTransaction
 from ..schemas import QuotaTransactionInfo, AdminAddQuota, QuotaConsumptionResponse
 
@@ -16,7 +18,7 @@ router = APIRouter(prefix="/quota", tags=["配额管理"])
 
 
 @router.get("/balance")
-async def get_quota_balance(current_user: User = Depends(get_current_user)):
+async def get_quota_balance(current_user: User = Depends(get_current_identity)):
     """
     获取当前用户的配额余额
     """
@@ -32,7 +34,7 @@ async def get_quota_balance(current_user: User = Depends(get_current_user)):
 @router.post("/check")
 async def check_user_quota(
     cost: int = 1,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_identity)
 ):
     """
     检查用户配额是否足够
@@ -53,22 +55,24 @@ async def check_user_quota(
 async def get_quota_transactions(
     limit: int = 50,
     offset: int = 0,
+    cursor: str = None,
+    response: Response = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
     获取配额交易记录
-    - 分页查询
+    - 分页查询（传 cursor，即上一页响应头 X-Next-Cursor，按游标翻页；offset 仅为兼容保留）
     - 按时间倒序
     """
-    transactions = (
-        db.query(QuotaTransaction)
-        .filter(QuotaTransaction.user_id == current_user.id)
-        .order_by(desc(QuotaTransaction.created_at))
-        .limit(limit)
-        .offset(offset)
-        .all()
-    )
+    transactions = keyset_page(
+        db.query(QuotaTransaction).filter(QuotaTransaction.user_id == current_user.id),
+        QuotaTransaction,
+        cursor=cursor,
+        limit=limit,
+        offset=offset,
+    ).all()
+    set_next_cursor(response, next_cursor(transactions, limit))
     
     return [QuotaTransactionInfo.from_orm(t) for t in transactions]
 
@@ -80,6 +84,7 @@ async def get_quota_consumption(
     time_range: str = Query("7d", description="1d | 7d | 30d | custom"),
     start_at: datetime = None,
     end_at: datetime = None,
+    cursor: str = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -87,6 +92,7 @@ async def get_quota_consumption(
 
     - Only includes analysis_cost transactions.
     - Returns the latest 50 items by default.
+    - Pass ``next_cursor`` of the previous page as ``cursor`` for the next page.
     - Summary covers the full selected window (not just returned page).
     """
     now = end_at or datetime.utcnow()
@@ -112,12 +118,7 @@ async def get_quota_consumption(
         .filter(QuotaTransaction.created_at <= now)
     )
 
-    items = (
-        base.order_by(desc(QuotaTransaction.created_at))
-        .limit(limit)
-        .offset(offset)
-        .all()
-    )
+    items = keyset_page(base, QuotaTransaction, cursor=cursor, limit=limit, offset=offset).all()
 
     # amount is negative for analysis_cost
     total_consumed = (
@@ -142,6 +143,7 @@ async def get_quota_consumption(
 
     return {
         "items": [QuotaTransactionInfo.from_orm(t) for t in items],
+        "next_cursor": next_cursor(items, limit),
         "summary": {
             "start_at": start,
             "end_at": now,
@@ -182,6 +184,7 @@ async def admin_add_quota(
     db.add(transaction)
     db.commit()
     db.refresh(user)
+    user_cache.invalidate(user.id)
     
     return {
         "message": "配额添加成功",
@@ -192,7 +195,7 @@ async def admin_add_quota(
 
 
 @router.get("/referral/code")
-async def get_referral_code(current_user: User = Depends(get_current_user)):
+async def get_referral_code(current_user: User = Depends(get_current_identity)):
     """
     获取用户的引荐码
     """
@@ -0,0 +1,117 @@
+"""Compression of stored JSON payloads and of large HTTP responses.
+
+Stored payloads (parse-session IR/mapping, per-student checkpoints, legacy analysis blobs)
+are verbose JSON with repeated Chinese keys/labels. ``encode_payload`` zlib-compresses
+text above PAYLOAD_COMPRESSION_MIN_BYTES and stores it as ``"z1:" + base64`` in the same
+Text column; ``decode_payload`` passes unmarked (old / small) values through unchanged, so
+existing rows keep decoding and the format can be switched off at any time.
+
+``ScopedGZipMiddleware`` gzips responses only under the configured path prefixes
+(/api/files, /api/upload, job polling), never the SSE event stream.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Iterable
+
+import base64
+import binascii
+import json
+import zlib
+
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core import fast_json
+from app.core.config import settings
+
+PAYLOAD_MARKER = "z1:"
+
+
+class _PayloadStats:
+    def __init__(self) -> None:
+        self.encoded = 0
+        self.compressed = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.decode_errors = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "enabled": bool(getattr(settings, "PAYLOAD_COMPRESSION_ENABLED", True)),
+            "encoded": self.encoded,
+            "compressed": self.compressed,
+            "raw_bytes": self.raw_bytes,
+            "stored_bytes": self.stored_bytes,
+            "saved_ratio": round(1 - self.stored_bytes / self.raw_bytes, 4) if self.raw_bytes else 0.0,
+            "decode_errors": self.decode_errors,
+        }
+
+
+payload_stats = _PayloadStats()
+
+
+def encode_payload(text: str) -> str:
+    """Compress a stored JSON text if it is large enough and compression actually helps."""
+    raw = text.encode("utf-8")
+    payload_stats.encoded += 1
+    payload_stats.raw_bytes += len(raw)
+
+    min_bytes = int(getattr(settings, "PAYLOAD_COMPRESSION_MIN_BYTES", 1024) or 0)
+    if bool(getattr(settings, "PAYLOAD_COMPRESSION_ENABLED", True)) and len(raw) >= min_bytes:
+        packed = PAYLOAD_MARKER + base64.b64encode(zlib.compress(raw, 6)).decode("ascii")
+        if len(packed) < len(raw):
+            payload_stats.compressed += 1
+            payload_stats.stored_bytes += len(packed)
+            return packed
+
+    payload_stats.stored_bytes += len(raw)
+    return text
+
+
+def decode_payload(stored: str | None) -> str | None:
+    if not stored or not stored.startswith(PAYLOAD_MARKER):
+        return stored
+    try:
+        return zlib.decompress(base64.b64decode(stored[len(PAYLOAD_MARKER):])).decode("utf-8")
+    except (binascii.Error, zlib.error, UnicodeDecodeError):
+        payload_stats.decode_errors += 1
+        raise ValueError("corrupt compressed payload")
+
+
+def dumps_payload(value: Any) -> str:
+    return encode_payload(fast_json.dumps_str(value))
+
+
+def loads_payload(stored: str | None, default: Any = None) -> Any:
+    text = decode_payload(stored)
+    if not text:
+        return default
+    # stdlib json: legacy rows may contain NaN/Infinity tokens, which orjson rejects.
+    return json.loads(text)
+
+
+class ScopedGZipMiddleware:
+    """Starlette GZipMiddleware restricted to path prefixes (SSE streams are excluded)."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        prefixes: Iterable[str],
+        exclude_suffixes: Iterable[str] = ("/events",),
+        minimum_size: int = 1024,
+        compresslevel: int = 6,
+    ) -> None:
+        self.app = app
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=compresslevel)
+        self.prefixes = tuple(p for p in prefixes if p)
+        self.exclude_suffixes = tuple(exclude_suffixes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            path = scope.get("path", "")
+            if path.startswith(self.prefixes) and not path.endswith(self.exclude_suffixes):
+                await self.gzip(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
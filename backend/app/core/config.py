@@ -45,13 +45,118 @@ class Settings(BaseSettings):
     OPENAI_REQUEST_MAX_RETRIES: int = 2
     OPENAI_REQUEST_RETRY_BACKOFF_SECONDS: float = 0.8
     OPENAI_REQUEST_RETRY_MAX_BACKOFF_SECONDS: float = 8.0
-    
+
+    # Shared HTTP connection pool for /responses (app-lifetime, keep-alive).
+    # The *_2 knobs apply to the fallback resource; unset means "same as primary".
+    AOAI_HTTP_MAX_CONNECTIONS: int = 100
+    AOAI_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    AOAI_HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    AOAI_HTTP_MAX_CONNECTIONS_2: Optional[int] = None
+    AOAI_HTTP_MAX_KEEPALIVE_CONNECTIONS_2: Optional[int] = None
+    # HTTP/2 requires the optional `h2` package; falls back to HTTP/1.1 if missing.
+    AOAI_HTTP2_ENABLED: bool = False
+
+    # Process-wide adaptive (AIMD) concurrency for /responses, per endpoint role.
+    # Grows on success, shrinks on 429/5xx/timeouts/latency spikes; honors retry-after.
+    AOAI_CONCURRENCY_INITIAL: int = 16
+    AOAI_CONCURRENCY_MIN: int = 2
+    AOAI_CONCURRENCY_MAX: int = 64
+    AOAI_CONCURRENCY_INCREASE_STEP: float = 1.0
+    AOAI_CONCURRENCY_DECREASE_FACTOR: float = 0.5
+    AOAI_CONCURRENCY_LATENCY_SPIKE_FACTOR: float = 3.0
+
+    # Local token-bucket budgets per (endpoint, model) deployment; 0 disables.
+    # *_2 apply to the fallback resource (unset means "same as primary").
+    AOAI_RPM_LIMIT: int = 0
+    AOAI_TPM_LIMIT: int = 0
+    AOAI_RPM_LIMIT_2: Optional[int] = None
+    AOAI_TPM_LIMIT_2: Optional[int] = None
+    # Per-model overrides, e.g. '{"gpt-4.1-nano": {"rpm": 300, "tpm": 300000}, "fallback:o4-mini": {"tpm": 100000}}'
+    AOAI_RATE_LIMITS_JSON: Optional[str] = None
+    # Expected output tokens per request used in the TPM estimate (reconciled with real usage).
+    AOAI_ESTIMATED_OUTPUT_TOKENS: int = 1000
+
+    # Content-addressed cache of per-student analysis text (DB table analysis_cache_entries).
+    ANALYSIS_CACHE_ENABLED: bool = True
+    ANALYSIS_CACHE_TTL_SECONDS: int = 30 * 24 * 3600
+    ANALYSIS_CACHE_MAX_ENTRIES: int = 50000
+
+    # Reuse a previously successful parsing mapping for the same sheet structure (xlsx).
+    MAPPING_CACHE_ENABLED: bool = True
+    MAPPING_CACHE_MIN_CONFIDENCE: float = 0.8
+
+    # Parsed StudentScore[] / preview IR keyed by (file sha256, mapping, parser version)
+    # (DB table parse_result_cache_entries, LRU-evicted above PARSE_CACHE_MAX_ENTRIES).
+    PARSE_CACHE_ENABLED: bool = True
+    PARSE_CACHE_MAX_ENTRIES: int = 5000
+
+    # xlsx uploads at/above this size are parsed in streaming (read-only, row-by-row) mode
+    # to keep memory flat; 0 disables streaming.
+    EXCEL_STREAMING_THRESHOLD_BYTES: int = 10 * 1024 * 1024
+
+    # CPU-bound work (parsing, export generation, chart rendering) runs off the event loop.
+    # CPU_POOL_KIND: "process" (ProcessPoolExecutor, falls back to threads) or "thread".
+    CPU_POOL_KIND: Literal["process", "thread"] = "process"
+    # 0 means min(4, cpu_count).
+    CPU_POOL_MAX_WORKERS: int = 0
+    CPU_POOL_START_METHOD: Literal["spawn", "forkserver", "fork"] = "spawn"
+    CPU_TASK_TIMEOUT_SECONDS: float = 120.0
+
+    # AI analysis runs as a persisted background job (POST /files/{id}/analyze -> 202 + job id).
+    # A running job whose heartbeat is older than ANALYSIS_JOB_STALE_SECONDS is requeued
+    # (worker crashed/restarted); the sweeper also picks up queued jobs left by other workers.
+    ANALYSIS_JOB_HEARTBEAT_SECONDS: float = 30.0
+    ANALYSIS_JOB_STALE_SECONDS: float = 180.0
+    ANALYSIS_JOB_SWEEP_INTERVAL_SECONDS: float = 60.0
+    # In-memory SSE event replay is kept this long after a job finishes.
+    ANALYSIS_JOB_EVENT_RETENTION_SECONDS: float = 600.0
+    ANALYSIS_JOB_SSE_KEEPALIVE_SECONDS: float = 15.0
+
+    # Stored JSON payloads (parse-session IR/mapping, analysis checkpoints) at/above this
+    # size are zlib-compressed with a "z1:" marker; unmarked rows still decode.
+    PAYLOAD_COMPRESSION_ENABLED: bool = True
+    PAYLOAD_COMPRESSION_MIN_BYTES: int = 1024
+
+    # gzip responses under these path prefixes (comma separated); SSE streams are excluded.
+    GZIP_RESPONSES_ENABLED: bool = True
+    GZIP_PATH_PREFIXES: str = "/api/files,/api/upload,/api/analysis-jobs"
+    GZIP_MIN_RESPONSE_BYTES: int = 1024
+
+    # In-process cache of the authenticated user (keyed by token subject); 0 disables.
+    # Admin changes are invalidated locally; other workers pick them up within the TTL.
+    USER_CACHE_TTL_SECONDS: float = 30.0
+    USER_CACHE_MAX_ENTRIES: int = 10000
+
+    # Admin dashboards read per-user hourly/daily rollups of analysis_logs; hours older than
+    # USAGE_ROLLUP_SETTLE_SECONDS are compacted every USAGE_ROLLUP_INTERVAL_SECONDS.
+    USAGE_ROLLUP_ENABLED: bool = True
+    USAGE_ROLLUP_SETTLE_SECONDS: float = 900.0
+    USAGE_ROLLUP_INTERVAL_SECONDS: float = 300.0
+
+    # Uploads are streamed to storage in UPLOAD_CHUNK_SIZE_BYTES chunks (also the Azure block
+    # size); files over MAX_UPLOAD_SIZE_BYTES are rejected with 413 (0 disables the limit).
+    MAX_UPLOAD_SIZE_BYTES: int = 50 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE_BYTES: int = 4 * 1024 * 1024
+
+    # Local read-through disk cache for Azure Blob reads (LRU, sha256-verified on every hit);
+    # 0 disables. Workers on one machine may share the directory.
+    BLOB_DISK_CACHE_DIR: str = "data/blob_cache"
+    BLOB_DISK_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
     # Azure Storage 配置
     STORAGE_TYPE: Literal["local", "azure"] = "local"
     AZURE_STORAGE_CONNECTION_STRING: Optional[str] = None
     AZURE_STORAGE_ACCOUNT_NAME: Optional[str] = None
     AZURE_STORAGE_ACCOUNT_KEY: Optional[str] = None
     AZURE_STORAGE_BLOB_ENDPOINT: Optional[str] = None
+    # Async blob backend: "aio" (azure.storage.blob.aio + aiohttp), "thread" (sync SDK in
+    # worker threads), "fake" (filesystem under AZURE_STORAGE_FAKE_DIR, for offline dev/tests);
+    # "auto" is thread until the aio path has been run against Azurite. One pooled client
+    # per process.
+    AZURE_STORAGE_BACKEND: Literal["auto", "aio", "thread", "fake"] = "auto"
+    AZURE_STORAGE_MAX_CONNECTIONS: int = 32
+    AZURE_STORAGE_TRANSFER_CONCURRENCY: int = 4
+    AZURE_STORAGE_FAKE_DIR: str = "data/fake_blob"
     
     # Blob Container 名称
     AZURE_STORAGE_UPLOADS_CONTAINER: str = "uploads"
@@ -39,6 +39,15 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+COMPOSITE_INDEXES = (
+    ('analysis_logs', 'ix_analysis_logs_user_created', 'user_id, created_at'),
+    ('analysis_logs', 'ix_analysis_logs_status_created', 'status, created_at'),
+    ('analysis_logs', 'ix_analysis_logs_created_at', 'created_at'),
+    ('quota_transactions', 'ix_quota_transactions_user_created', 'user_id, created_at'),
+    ('quota_transactions', 'ix_quota_transactions_type_user_created', 'transaction_type, user_id, created_at'),
+)
+
+
 def ensure_schema_compatibility() -> None:
     """Best-effort schema patching for backward compatibility.
 
@@ -97,6 +106,88 @@ def ensure_schema_compatibility() -> None:
                             conn.execute(text(f'ALTER TABLE analysis_logs ADD COLUMN {name} {col_type} DEFAULT {default}'))
                         except Exception:
                             pass
+
+        if 'analysis_jobs' in insp.get_table_names():
+            cols = {c['name'] for c in insp.get_columns('analysis_jobs')}
+            to_add = [name for name in ('resumed_students', 'quota_cost') if name not in cols]
+            if to_add:
+                with engine.begin() as conn:
+                    for name in to_add:
+                        try:
+                            conn.execute(text(f'ALTER TABLE analysis_jobs ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0'))
+                        except Exception:
+                            pass
+                    if 'quota_cost' in to_add:
+                        try:
+                            conn.execute(text('UPDATE analysis_jobs SET quota_cost = total_students'))
+                        except Exception:
+                            pass
+            # quota_reserved stays NULL for existing jobs: they are debited when they finish.
+            reservation_cols = [
+                (name, ddl)
+                for name, ddl in (
+                    ('quota_reserved', 'INTEGER NULL'),
+                    ('quota_refunded', 'INTEGER NOT NULL DEFAULT 0'),
+                )
+                if name not in cols
+            ]
+            if reservation_cols:
+                with engine.begin() as conn:
+                    for name, ddl in reservation_cols:
+                        try:
+                            conn.execute(text(f'ALTER TABLE analysis_jobs ADD COLUMN {name} {ddl}'))
+                        except Exception:
+                            pass
+
+            # One queued/running job per file (create_all skips the existing table).
+            if 'uq_analysis_jobs_active_file' not in {ix['name'] for ix in insp.get_indexes('analysis_jobs')}:
+                with engine.begin() as conn:
+                    try:
+                        conn.execute(text(
+                            'CREATE UNIQUE INDEX uq_analysis_jobs_active_file ON analysis_jobs (score_file_id) '
+                            "WHERE status IN ('queued', 'running')"
+                        ))
+                    except Exception:
+                        pass
+
+        if 'score_files' in insp.get_table_names():
+            cols = {c['name'] for c in insp.get_columns('score_files')}
+            if 'content_sha256' not in cols:
+                with engine.begin() as conn:
+                    try:
+                        conn.execute(text('ALTER TABLE score_files ADD COLUMN content_sha256 VARCHAR(64) NULL'))
+                        conn.execute(text('CREATE INDEX ix_score_files_content_sha256 ON score_files (content_sha256)'))
+                    except Exception:
+                        pass
+            if 'data_version' not in cols:
+                with engine.begin() as conn:
+                    try:
+                        conn.execute(text('ALTER TABLE score_files ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0'))
+                    except Exception:
+                        pass
+
+        # score_items.category was VARCHAR(50) at first, but falls back to the full question name.
+        if dialect == 'postgresql' and 'score_items' in insp.get_table_names():
+            category = next((c for c in insp.get_columns('score_items') if c['name'] == 'category'), None)
+            if category is not None and getattr(category['type'], 'length', None):
+                with engine.begin() as conn:
+                    try:
+                        conn.execute(text('ALTER TABLE score_items ALTER COLUMN category TYPE TEXT'))
+                    except Exception:
+                        pass
+
+        # Composite indexes for keyset-paginated lists (create_all skips existing tables).
+        tables = set(insp.get_table_names())
+        for table, name, columns in COMPOSITE_INDEXES:
+            if table not in tables:
+                continue
+            if name in {ix['name'] for ix in insp.get_indexes(table)}:
+                continue
+            with engine.begin() as conn:
+                try:
+                    conn.execute(text(f'CREATE INDEX {name} ON {table} ({columns})'))
+                except Exception:
+                    pass
     except Exception:
         # Do not block app startup; environments that manage schema via Alembic can ignore this.
         pass
@@ -0,0 +1,50 @@
+"""orjson-based JSON encoding for responses and stored payloads.
+
+Large score payloads used to be walked by ``_json_sanitize`` (to drop NaN/Inf), then
+serialized by ``json.dumps`` for storage and again by Starlette's ``JSONResponse``.
+orjson serializes NaN/Infinity as ``null`` natively, handles numpy scalars/arrays and
+datetimes, and is several times faster, so payloads are encoded once here.
+"""
+
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if hasattr(value, "item"):  # numpy/pandas scalars not covered by OPT_SERIALIZE_NUMPY
+        return value.item()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(value: Any) -> bytes:
+    """Strict JSON bytes (NaN/Infinity -> null, non-ASCII kept as UTF-8)."""
+    return orjson.dumps(value, default=_default, option=_OPTIONS)
+
+
+def dumps_str(value: Any) -> str:
+    """Same as ``dumps`` for Text columns."""
+    return dumps(value).decode("utf-8")
+
+
+loads = orjson.loads
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson; also the app's default response class."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,63 @@
+"""Keyset (cursor) pagination for time-ordered lists (logs, quota transactions).
+
+``ORDER BY created_at DESC LIMIT/OFFSET`` reads and discards every skipped row, so deep
+pages get linearly slower. With a cursor the next page starts right after the last row
+returned (``(created_at, id) < (cursor)``) on the composite indexes, so page N costs the
+same as page 1. The cursor is opaque to clients: it is returned in the ``X-Next-Cursor``
+header (or a ``next_cursor`` field) and only present when more rows may follow.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Optional, Sequence, Tuple
+
+import base64
+import binascii
+
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, desc, or_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail="无效的分页游标") from e
+
+
+def keyset_page(query, model, *, cursor: Optional[str], limit: int, offset: int = 0):
+    """Newest first by (created_at, id); with a cursor, ``offset`` is ignored."""
+    query = query.order_by(desc(model.created_at), desc(model.id))
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(
+            or_(model.created_at < created_at, and_(model.created_at == created_at, model.id < row_id))
+        )
+    elif offset:
+        query = query.offset(offset)
+    return query.limit(limit)
+
+
+def next_cursor(rows: Sequence[Any], limit: int) -> Optional[str]:
+    """Cursor after the last row of a full page (rows are model instances)."""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    if last.created_at is None:
+        return None
+    return encode_cursor(last.created_at, last.id)
+
+
+def set_next_cursor(response: Response, cursor: Optional[str]) -> None:
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
@@ -11,7 +11,8 @@ from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from app.core.database import get_db
+from app.core.database import SessionLocal, get_db
+from app.core.user_cache import user_cache
 from app.models.user import User
 
 # JWT配置
@@ -67,50 +68,106 @@ def generate_referral_code() -> str:
     return secrets.token_urlsafe(8)
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """获取当前用户（依赖注入）"""
-    token = credentials.credentials
-    payload = decode_token(token)
-    
+def _token_subject(credentials: HTTPAuthorizationCredentials) -> str:
+    payload = decode_token(credentials.credentials)
     username: str = payload.get("sub")
     if username is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="无法验证凭证",
         )
-    
+    return username
+
+
+def _ensure_active(user: User) -> None:
+    if not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="用户已被禁用",
+        )
+
+
+def _vip_expired(user: User) -> bool:
+    if not (user.is_vip and getattr(user, "vip_expires_at", None)):
+        return False
+    vip_expires_at = ensure_utc_aware(getattr(user, "vip_expires_at", None))
+    return bool(vip_expires_at and vip_expires_at <= utcnow())
+
+
+def _load_user(db: Session, username: str) -> User:
+    """从数据库加载用户（含 VIP 到期降级），并写入用户缓存"""
     user = db.query(User).filter(User.username == username).first()
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户不存在",
         )
-    
-    if not user.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="用户已被禁用",
-        )
 
     # VIP 到期处理（best-effort）：到期则自动降级
     try:
-        if user.is_vip and getattr(user, "vip_expires_at", None):
-            now = utcnow()
-            vip_expires_at = ensure_utc_aware(getattr(user, "vip_expires_at", None))
-            if vip_expires_at and vip_expires_at <= now:
-                user.is_vip = False
-                user.vip_expires_at = None
-                db.commit()
-                db.refresh(user)
+        if _vip_expired(user):
+            user.is_vip = False
+            user.vip_expires_at = None
+            db.commit()
+            db.refresh(user)
     except Exception:
         db.rollback()
-    
+
+    user_cache.put(user)
     return user
 
 
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> User:
+    """获取当前用户（依赖注入）
+
+    命中用户缓存时不查询 users 表：快照以 merge(load=False) 挂到本次请求的 Session，
+    处理函数仍可修改并提交该用户。
+    """
+    username = _token_subject(credentials)
+
+    snapshot = user_cache.get(username)
+    if snapshot is not None:
+        cached = user_cache.to_user(snapshot)
+        if not _vip_expired(cached):
+            _ensure_active(cached)
+            return db.merge(cached, load=False)
+        user_cache.invalidate(username=username)
+
+    user = _load_user(db, username)
+    _ensure_active(user)
+    return user
+
+
+async def get_current_identity(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+) -> User:
+    """获取当前用户身份（快速路径，依赖注入）
+
+    适用于只读取身份/配额字段的端点：缓存命中时不打开数据库会话；返回的 User 已脱离
+    Session，不能访问关系属性或提交修改。
+    """
+    username = _token_subject(credentials)
+
+    snapshot = user_cache.get(username)
+    if snapshot is not None:
+        user = user_cache.to_user(snapshot)
+        if not _vip_expired(user):
+            _ensure_active(user)
+            return user
+        user_cache.invalidate(username=username)
+
+    db = SessionLocal()
+    try:
+        user = _load_user(db, username)
+        _ensure_active(user)
+        return user_cache.to_user(user_cache.snapshot(user))
+    finally:
+        db.close()
+
+
 async def get_current_admin_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
@@ -123,15 +180,21 @@ async def get_current_admin_user(
     return current_user
 
 
+def is_vip_active(user: User) -> bool:
+    """VIP 是否有效（有效 VIP 不扣余额）"""
+    if not user.is_vip:
+        return False
+    vip_expires_at = getattr(user, "vip_expires_at", None)
+    # 兼容老数据：vip_expires_at 为空表示永久 VIP
+    if vip_expires_at is None:
+        return True
+    # 有到期时间则按是否未过期判断
+    vip_expires_at = ensure_utc_aware(vip_expires_at)
+    return bool(vip_expires_at and vip_expires_at > utcnow())
+
+
 def check_quota(user: User, cost: int = 1) -> bool:
     """检查用户配额是否足够"""
-    if user.is_vip:
-        vip_expires_at = getattr(user, "vip_expires_at", None)
-        # 兼容老数据：vip_expires_at 为空表示永久 VIP
-        if vip_expires_at is None:
-            return True
-        # 有到期时间则按是否未过期判断
-        vip_expires_at = ensure_utc_aware(vip_expires_at)
-        if vip_expires_at and vip_expires_at > utcnow():
-            return True
+    if is_vip_active(user):
+        return True
     return user.quota_balance >= cost
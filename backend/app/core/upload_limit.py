@@ -0,0 +1,52 @@
+"""Reject oversized uploads from the Content-Length header, before the body is received.
+
+Starlette parses ``multipart/form-data`` (spooling the file) before the endpoint runs, so a
+size check inside ``/upload`` only happens after the whole body has arrived. This middleware
+answers 413 as soon as the declared request size exceeds the limit. Bodies without a
+Content-Length (chunked) pass through and are cut off by the streaming size check in
+``FileStorageService.save_stream``.
+"""
+
+from __future__ import annotations
+
+from typing import Iterable
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+def too_large_message(max_bytes: int) -> str:
+    if max_bytes >= 1024 * 1024:
+        limit = f"{max_bytes / (1024 * 1024):.4g} MB"
+    else:
+        limit = f"{max_bytes / 1024:.4g} KB"
+    return f"文件过大，最大允许 {limit}"
+
+
+class UploadSizeLimitMiddleware:
+    def __init__(self, app: ASGIApp, *, max_bytes: int, paths: Iterable[str]) -> None:
+        self.app = app
+        self.max_body_bytes = max_bytes + MULTIPART_OVERHEAD_BYTES
+        self.max_bytes = max_bytes
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope.get("method") == "POST" and scope.get("path") in self.paths:
+            for key, value in scope.get("headers") or ():
+                if key == b"content-length":
+                    try:
+                        declared = int(value)
+                    except ValueError:
+                        break
+                    if declared > self.max_body_bytes:
+                        response = JSONResponse(
+                            {"detail": too_large_message(self.max_bytes)},
+                            status_code=413,
+                        )
+                        await response(scope, receive, send)
+                        return
+                    break
+        await self.app(scope, receive, send)
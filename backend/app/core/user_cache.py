@@ -0,0 +1,123 @@
+"""Short-TTL in-process cache of authenticated users, keyed by the JWT subject (username).
+
+Every authenticated request used to run ``SELECT ... FROM users WHERE username=?``; polling
+UIs (job status, quota balance) made that the dominant query. A cache hit returns the
+user's column snapshot instead:
+
+- ``get_current_user`` merges the snapshot into the request's Session without loading
+  (``merge(load=False)``), so handlers can still modify/commit the user;
+- ``get_current_identity`` returns a detached User and never opens a Session on a hit,
+  for endpoints that only need identity / quota fields.
+
+Entries are dropped when the user is changed (admin set-vip / toggle-active / delete,
+quota add, analysis debit, login, password reset, email bind). The cache is per process,
+so other workers see such changes after at most USER_CACHE_TTL_SECONDS.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Optional
+
+import threading
+import time
+
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.core.config import settings
+from app.models.user import User
+
+_COLUMNS = tuple(c.key for c in User.__table__.columns)
+
+
+class UserCache:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple[float, dict[str, Any]]]" = OrderedDict()
+        self._names_by_id: dict[int, str] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def ttl_seconds(self) -> float:
+        return float(getattr(settings, "USER_CACHE_TTL_SECONDS", 30.0) or 0.0)
+
+    @property
+    def max_entries(self) -> int:
+        return int(getattr(settings, "USER_CACHE_MAX_ENTRIES", 10000) or 0)
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    @staticmethod
+    def snapshot(user: User) -> dict[str, Any]:
+        return {key: getattr(user, key) for key in _COLUMNS}
+
+    @staticmethod
+    def to_user(snapshot: dict[str, Any]) -> User:
+        """A detached User carrying the snapshot (columns only; relationships are not loaded)."""
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        return user
+
+    def get(self, username: str) -> Optional[dict[str, Any]]:
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    self._drop(username)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, user: User) -> None:
+        if not self.enabled or user.id is None:
+            return
+        snapshot = self.snapshot(user)
+        with self._lock:
+            self._drop(snapshot["username"])
+            self._entries[snapshot["username"]] = (time.monotonic() + self.ttl_seconds, snapshot)
+            self._names_by_id[snapshot["id"]] = snapshot["username"]
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, user_id: Optional[int] = None, *, username: Optional[str] = None) -> None:
+        with self._lock:
+            if username is None and user_id is not None:
+                username = self._names_by_id.get(user_id)
+            if username is not None and username in self._entries:
+                self._drop(username)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._names_by_id.clear()
+
+    def _drop(self, username: str) -> None:
+        entry = self._entries.pop(username, None)
+        if entry is not None:
+            self._names_by_id.pop(entry[1]["id"], None)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            size = len(self._entries)
+        return {
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl_seconds,
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+# 全局实例
+user_cache = UserCache()
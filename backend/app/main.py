@@ -6,32 +6,54 @@ import os
 
 from app.core.database import engine, Base, ensure_schema_compatibility
 from app.core.config import settings
+from app.core.fast_json import ORJSONResponse
+from app.core.compression import ScopedGZipMiddleware
+from app.core.upload_limit import UploadSizeLimitMiddleware
 from app.api import router as api_router
 from app.api.auth import router as auth_router
 from app.api.quota import router as quota_router
 from app.api.admin import router as admin_router
+from app.services.aoai_http_pool import aoai_http_pool
+from app.services.cpu_executor import cpu_executor
+from app.services.analysis_job_service import analysis_job_runner
+from app.services.usage_rollup_service import usage_rollups
+from app.services.file_storage_service import file_storage
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     应用生命周期管理
-    - 启动时创建数据库表
+    - 启动时创建数据库表、AOAI 共享连接池、CPU 任务进程池、AI 分析任务调度（恢复排队/僵死任务）、
+      管理后台用量汇总压缩任务、Blob 存储共享客户端（确认容器存在）
     - 关闭时清理资源
     """
     # 启动时创建所有数据库表
     Base.metadata.create_all(bind=engine)
     # 兼容性补齐（best-effort）
     ensure_schema_compatibility()
+    await aoai_http_pool.start()
+    await file_storage.start()
+    cpu_executor.start()
+    analysis_job_runner.start()
+    usage_rollups.start()
     yield
-    # 关闭时的清理操作（如果需要）
+    await usage_rollups.shutdown()
+    # 停止本 worker 上的分析任务（心跳过期后由其他 worker / 下次启动重新排队）
+    await analysis_job_runner.shutdown()
+    # 关闭连接池（释放 keep-alive 连接）
+    await aoai_http_pool.aclose()
+    await file_storage.aclose()
+    cpu_executor.shutdown()
 
 
 app = FastAPI(
     title="Auto Score Analyzer",
     description="智能成绩分析系统 - 支持多用户认证、配额管理和引荐系统",
     version="2.0.2",
-    lifespan=lifespan
+    lifespan=lifespan,
+    # orjson：大体量成绩数据序列化更快，NaN/Inf 原生输出为 null
+    default_response_class=ORJSONResponse,
 )
 
 # 配置CORS
@@ -84,8 +106,26 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    # 游标分页：列表接口通过响应头返回下一页游标
+    expose_headers=["X-Next-Cursor"],
 )
 
+# 响应压缩（成绩详情/上传结果等大响应；SSE 进度流不压缩）
+if settings.GZIP_RESPONSES_ENABLED:
+    app.add_middleware(
+        ScopedGZipMiddleware,
+        prefixes=[p.strip() for p in (settings.GZIP_PATH_PREFIXES or "").split(",")],
+        minimum_size=settings.GZIP_MIN_RESPONSE_BYTES,
+    )
+
+# 上传大小限制：按 Content-Length 在接收请求体之前拒绝超大文件
+if settings.MAX_UPLOAD_SIZE_BYTES > 0:
+    app.add_middleware(
+        UploadSizeLimitMiddleware,
+        max_bytes=settings.MAX_UPLOAD_SIZE_BYTES,
+        paths=["/api/upload"],
+    )
+
 # 注册路由
 app.include_router(auth_router, prefix="/api", tags=["认证"])
 app.include_router(quota_router, prefix="/api", tags=["配额"])
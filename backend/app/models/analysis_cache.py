@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from sqlalchemy import Column, DateTime, Integer, String, Text
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class AnalysisCacheEntry(Base):
+    """Content-addressed cache of per-student AI analysis text.
+
+    Keyed by sha256(system prompt incl. one-shot example, user prompt, model, temperature).
+    """
+
+    __tablename__ = "analysis_cache_entries"
+
+    cache_key = Column(String(64), primary_key=True)  # sha256 hex
+    model = Column(String(100), nullable=False)
+
+    response_text = Column(Text, nullable=False)
+
+    # Tokens paid when the entry was produced (hits cost 0).
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+
+    hit_count = Column(Integer, default=0)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_accessed_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
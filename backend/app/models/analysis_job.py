@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text, UniqueConstraint, text
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class AnalysisJob(Base):
+    """Background AI analysis of one ScoreFile (POST /files/{id}/analyze -> 202 + job id)."""
+
+    __tablename__ = "analysis_jobs"
+    # At most one queued/running job per file: concurrent submits of the same file (double
+    # click, two tabs) lose the insert and reuse the winner instead of running and paying twice.
+    __table_args__ = (
+        Index(
+            "uq_analysis_jobs_active_file",
+            "score_file_id",
+            unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+            sqlite_where=text("status IN ('queued', 'running')"),
+        ),
+    )
+
+    id = Column(String(36), primary_key=True, index=True)  # uuid
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False)
+    score_file_id = Column(Integer, ForeignKey("score_files.id", ondelete="CASCADE"), index=True, nullable=False)
+    analysis_log_id = Column(Integer, ForeignKey("analysis_logs.id", ondelete="SET NULL"), nullable=True)
+
+    status = Column(String(20), nullable=False, index=True)  # queued/running/succeeded/failed
+
+    one_shot_text = Column(Text, nullable=True)
+
+    # Per-student progress
+    total_students = Column(Integer, nullable=False, default=0)
+    completed_students = Column(Integer, nullable=False, default=0)
+    failed_students = Column(Integer, nullable=False, default=0)
+    # Students taken from checkpoints / earlier results instead of calling the model again
+    resumed_students = Column(Integer, nullable=False, default=0)
+
+    # Quota units reserved when the job is created (one per student to analyze); students
+    # whose analysis failed and failed jobs are refunded (quota_refunded).
+    quota_cost = Column(Integer, nullable=False, default=0)
+    # Held from quota_balance at reservation (0 for VIP); NULL for jobs created before
+    # reservations existed, which are debited when they finish.
+    quota_reserved = Column(Integer, nullable=True)
+    quota_refunded = Column(Integer, nullable=False, default=0)
+
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+
+    error_message = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    # Refreshed on every completed student; a running job with a stale heartbeat is reclaimed.
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class AnalysisStudentResult(Base):
+    """Per-student analysis checkpoint, written as soon as that student's analysis finishes.
+
+    A (re)run of a job reuses succeeded rows whose input_hash still matches, so a crash or
+    timeout late in a batch only costs the students that never finished. Rows are removed
+    once the file's full result is saved to the students rows.
+    """
+
+    __tablename__ = "analysis_student_results"
+    __table_args__ = (UniqueConstraint("score_file_id", "student_index", name="uq_analysis_student_results_file_index"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    score_file_id = Column(Integer, ForeignKey("score_files.id", ondelete="CASCADE"), index=True, nullable=False)
+    job_id = Column(String(36), ForeignKey("analysis_jobs.id", ondelete="SET NULL"), nullable=True)
+    student_index = Column(Integer, nullable=False)
+    student_name = Column(String(255), nullable=False)
+
+    # sha256 of the student's parsed scores + one-shot example (what the model saw)
+    input_hash = Column(String(64), nullable=False)
+    status = Column(String(20), nullable=False)  # succeeded/failed
+    result_json = Column(Text, nullable=False)  # StudentScore incl. analysis
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String, Text
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class MappingPlanCacheEntry(Base):
+    """Previously successful parsing mapping plan for a sheet structure fingerprint.
+
+    user_id IS NULL => global entry (shared across users for the same template).
+    """
+
+    __tablename__ = "mapping_plan_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    fingerprint = Column(String(64), nullable=False, index=True)  # sha256 of IR structure
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True)
+
+    file_type = Column(String(20), nullable=False)
+    mapping_json = Column(Text, nullable=False)
+    confidence = Column(Float, nullable=False, default=0.0)
+    source = Column(String(20), nullable=False, default="ai")  # ai | user
+
+    hit_count = Column(Integer, default=0)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    last_used_at = Column(DateTime(timezone=True), nullable=True)
+    invalidated_at = Column(DateTime(timezone=True), nullable=True)
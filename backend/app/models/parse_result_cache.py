@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from sqlalchemy import Column, DateTime, Integer, String, Text
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class ParseResultCacheEntry(Base):
+    """Cached parse output for one file content.
+
+    Keyed by sha256(kind, file content sha256, canonical mapping, parser version); ``kind`` is
+    "full" (StudentScore[] dumps) or "preview" (file_type / IR / preview samples).
+    """
+
+    __tablename__ = "parse_result_cache_entries"
+
+    cache_key = Column(String(64), primary_key=True)  # sha256 hex
+    kind = Column(String(20), nullable=False)
+    content_sha256 = Column(String(64), nullable=False, index=True)
+
+    payload = Column(Text, nullable=False)  # dumps_payload (zlib-compressed JSON)
+    payload_bytes = Column(Integer, default=0)
+    student_count = Column(Integer, default=0)
+
+    hit_count = Column(Integer, default=0)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_accessed_at = Column(DateTime(timezone=True), nullable=False, index=True)
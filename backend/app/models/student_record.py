@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, String, Text, UniqueConstraint
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class StudentRecord(Base):
+    """One student of a parsed ScoreFile (replaces the JSON blob in ScoreFile.analysis_result).
+
+    position keeps the order of the source file; analysis/suggestions are filled per row by
+    the AI analysis job.
+    """
+
+    __tablename__ = "students"
+    __table_args__ = (UniqueConstraint("score_file_id", "position", name="uq_students_file_position"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    score_file_id = Column(Integer, ForeignKey("score_files.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+
+    student_name = Column(String(255), nullable=False, index=True)
+    total_score = Column(Float, nullable=False)
+
+    analysis = Column(Text, nullable=True)
+    suggestions = Column(Text, nullable=True)  # JSON list[str]
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class ScoreItemRecord(Base):
+    """A deducted question of one student (ScoreItem)."""
+
+    __tablename__ = "score_items"
+    __table_args__ = (Index("ix_score_items_file_category", "score_file_id", "category"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Denormalized so per-file category filters/aggregations don't need to join students.
+    score_file_id = Column(Integer, ForeignKey("score_files.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+
+    question_name = Column(Text, nullable=False)
+    deduction = Column(Float, nullable=False)
+    # _guess_category falls back to the question name itself, so this is as long as that.
+    category = Column(Text, nullable=True, index=True)
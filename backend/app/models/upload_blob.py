@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class UploadBlob(Base):
+    """One stored copy of uploaded file content, keyed by its SHA-256.
+
+    ``ref_count`` is the number of ScoreFile rows pointing at it (score_files.content_sha256);
+    the stored object is deleted when the last one goes.
+    """
+
+    __tablename__ = "upload_blobs"
+
+    sha256 = Column(String(64), primary_key=True)  # hex digest of the file bytes
+    size = Column(BigInteger, nullable=False)
+
+    storage_key = Column(String(500), nullable=False)  # blob name (azure) / path (local)
+    file_url = Column(String(500), nullable=False)
+
+    ref_count = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_referenced_at = Column(DateTime(timezone=True), nullable=True)
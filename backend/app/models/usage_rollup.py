@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, UniqueConstraint
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class UsageRollup(Base):
+    """Per-user AnalysisLog totals of one closed hour or day (admin dashboards).
+
+    bucket_start is naive UTC. Maintained by ``usage_rollup_service``; buckets before
+    UsageRollupState.closed_until are final, later ones are read from analysis_logs.
+    """
+
+    __tablename__ = "usage_rollups"
+    __table_args__ = (
+        UniqueConstraint("granularity", "bucket_start", "user_id", name="uq_usage_rollups_bucket_user"),
+        Index("ix_usage_rollups_user_bucket", "user_id", "granularity", "bucket_start"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    granularity = Column(String(8), nullable=False)  # hour/day
+    bucket_start = Column(DateTime, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+
+    # All logs created in the bucket, by final status
+    task_count = Column(Integer, nullable=False, default=0)
+    success_count = Column(Integer, nullable=False, default=0)
+    failed_count = Column(Integer, nullable=False, default=0)
+    # Successful logs only (same filter as the admin usage pages)
+    quota_cost = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+
+
+class UsageRollupState(Base):
+    """Compaction watermark: every hour before closed_until (naive UTC) is rolled up."""
+
+    __tablename__ = "usage_rollup_state"
+
+    name = Column(String(50), primary_key=True)
+    closed_until = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -1,6 +1,6 @@
 """用户与相关数据模型"""
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey, Index, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -44,6 +44,11 @@ class User(Base):
 class QuotaTransaction(Base):
     """配额交易记录"""
     __tablename__ = "quota_transactions"
+    # 按用户 / 类型+用户的时间倒序列表（游标分页）
+    __table_args__ = (
+        Index("ix_quota_transactions_user_created", "user_id", "created_at"),
+        Index("ix_quota_transactions_type_user_created", "transaction_type", "user_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False)
@@ -66,6 +71,12 @@ class QuotaTransaction(Base):
 class AnalysisLog(Base):
     """分析请求日志"""
     __tablename__ = "analysis_logs"
+    # 管理后台日志/任务列表：按用户、按状态或全部的时间倒序（游标分页）
+    __table_args__ = (
+        Index("ix_analysis_logs_user_created", "user_id", "created_at"),
+        Index("ix_analysis_logs_status_created", "status", "created_at"),
+        Index("ix_analysis_logs_created_at", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False)
@@ -106,11 +117,16 @@ class ScoreFile(Base):
     file_size = Column(Integer, nullable=True)  # 文件大小（字节）
     file_url = Column(String(500), nullable=True)  # 云存储URL
     file_type = Column(String(20), nullable=False)
+    # 文件内容 SHA-256（upload_blobs 主键；相同内容只存一份）。旧记录为 NULL
+    content_sha256 = Column(String(64), nullable=True, index=True)
     
     # 分析结果
     student_count = Column(Integer, nullable=False)
     analysis_completed = Column(Boolean, default=False)
-    analysis_result = Column(Text, nullable=True)  # JSON格式的完整分析结果
+    # 旧版 JSON 格式的完整结果；学生数据已迁移到 students / score_items 表（迁移 009 回填后清空）
+    analysis_result = Column(Text, nullable=True)
+    # 学生行每次写入（重新解析 / 分析结果 / 删除）自增，用作 ETag 版本号
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")
     
     # 时间戳
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
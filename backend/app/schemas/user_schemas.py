@@ -71,6 +71,7 @@ class QuotaConsumptionSummary(BaseModel):
 
 class QuotaConsumptionResponse(BaseModel):
     items: list[QuotaTransactionInfo]
+    next_cursor: Optional[str] = None
     summary: QuotaConsumptionSummary
 
 
@@ -0,0 +1,253 @@
+"""Process-wide AIMD concurrency limiter for Azure OpenAI /responses.
+
+Every outbound /responses attempt (including retries and failover) takes a slot from
+the limiter of its endpoint role (primary/fallback). Because the limiters live at
+module level, concurrent batches from different users/files share the same budget
+instead of each claiming a fixed number of slots.
+
+- Additive increase: +AOAI_CONCURRENCY_INCREASE_STEP per "window" of successes
+  (i.e. +step/limit per success, like TCP congestion avoidance).
+- Multiplicative decrease: limit *= AOAI_CONCURRENCY_DECREASE_FACTOR on 429/5xx,
+  network errors/timeouts or latency spikes (at most once per cooldown window).
+- ``retry-after`` / ``retry-after-ms`` pause new acquisitions for that endpoint.
+- ``x-ratelimit-remaining-requests`` caps the limit; a nearly exhausted
+  ``x-ratelimit-remaining-tokens`` stops further growth.
+"""
+
+from __future__ import annotations
+
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Mapping, Optional
+
+import asyncio
+import logging
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Return the server-suggested delay in seconds, if any."""
+    for key, scale in (("retry-after-ms", 0.001), ("x-ms-retry-after-ms", 0.001), ("retry-after", 1.0)):
+        raw = headers.get(key)
+        if raw is None:
+            continue
+        try:
+            return max(0.0, float(str(raw).strip()) * scale)
+        except Exception:
+            # HTTP-date form of Retry-After is not used by Azure OpenAI; ignore it.
+            continue
+    return None
+
+
+def _header_int(headers: Mapping[str, str], key: str) -> Optional[int]:
+    raw = headers.get(key)
+    if raw is None:
+        return None
+    try:
+        return int(float(str(raw).strip()))
+    except Exception:
+        return None
+
+
+class AdaptiveConcurrencyLimiter:
+    def __init__(
+        self,
+        *,
+        name: str,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        increase_step: float = 1.0,
+        decrease_factor: float = 0.5,
+        latency_spike_factor: float = 3.0,
+        decrease_cooldown_seconds: float = 2.0,
+    ) -> None:
+        self.name = name
+        self._min_limit = max(1, int(min_limit))
+        self._max_limit = max(self._min_limit, int(max_limit))
+        self._limit = float(min(self._max_limit, max(self._min_limit, int(initial_limit))))
+        self._increase_step = max(0.0, float(increase_step))
+        self._decrease_factor = min(0.95, max(0.05, float(decrease_factor)))
+        self._latency_spike_factor = max(1.0, float(latency_spike_factor))
+        self._decrease_cooldown = max(0.0, float(decrease_cooldown_seconds))
+
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._last_decrease_at = 0.0
+        self._latency_ewma: Optional[float] = None
+        self._latency_samples = 0
+        self._growth_blocked = False
+
+        self._cond: Optional[asyncio.Condition] = None
+        self._cond_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self._successes = 0
+        self._throttled = 0
+        self._errors = 0
+        self._decreases = 0
+        self._last_remaining_requests: Optional[int] = None
+        self._last_remaining_tokens: Optional[int] = None
+
+    @property
+    def current_limit(self) -> int:
+        return max(self._min_limit, int(self._limit))
+
+    def _get_cond(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._cond is None or self._cond_loop is not loop:
+            # asyncio primitives are bound to one loop; scripts may call asyncio.run() repeatedly.
+            self._cond = asyncio.Condition()
+            self._cond_loop = loop
+            self._in_flight = 0
+        return self._cond
+
+    async def acquire(self) -> None:
+        cond = self._get_cond()
+        async with cond:
+            while True:
+                now = time.monotonic()
+                if self._paused_until > now:
+                    try:
+                        await asyncio.wait_for(cond.wait(), timeout=self._paused_until - now)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                if self._in_flight < self.current_limit:
+                    self._in_flight += 1
+                    return
+                await cond.wait()
+
+    async def release(self) -> None:
+        cond = self._get_cond()
+        async with cond:
+            self._in_flight = max(0, self._in_flight - 1)
+            cond.notify_all()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator["AdaptiveConcurrencyLimiter"]:
+        await self.acquire()
+        try:
+            yield self
+        finally:
+            await self.release()
+
+    # ---- feedback ----
+
+    def record_response(self, status_code: int, headers: Mapping[str, str], latency_seconds: float) -> None:
+        self._apply_rate_limit_headers(headers)
+
+        if status_code == 429 or 500 <= status_code < 600:
+            self._throttled += 1
+            retry_after = parse_retry_after(headers)
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            self._decrease(f"HTTP {status_code}")
+            return
+
+        if status_code >= 400:
+            # Client errors say nothing about capacity.
+            return
+
+        self._successes += 1
+        spiked = self._observe_latency(latency_seconds)
+        if spiked:
+            self._decrease(f"latency spike {latency_seconds:.2f}s")
+            return
+
+        if not self._growth_blocked and self._limit < self._max_limit:
+            self._limit = min(float(self._max_limit), self._limit + self._increase_step / max(1.0, self._limit))
+
+    def record_error(self, exc: BaseException) -> None:
+        self._errors += 1
+        self._decrease(type(exc).__name__)
+
+    def _observe_latency(self, latency_seconds: float) -> bool:
+        latency = max(0.0, float(latency_seconds))
+        baseline = self._latency_ewma
+        self._latency_samples += 1
+        spiked = (
+            baseline is not None
+            and self._latency_samples > 5
+            and latency > baseline * self._latency_spike_factor
+        )
+        # Keep spikes out of the baseline so one slow burst does not normalize itself.
+        if not spiked:
+            self._latency_ewma = latency if baseline is None else baseline * 0.8 + latency * 0.2
+        return spiked
+
+    def _apply_rate_limit_headers(self, headers: Mapping[str, str]) -> None:
+        remaining_requests = _header_int(headers, "x-ratelimit-remaining-requests")
+        remaining_tokens = _header_int(headers, "x-ratelimit-remaining-tokens")
+        limit_tokens = _header_int(headers, "x-ratelimit-limit-tokens")
+
+        if remaining_requests is not None:
+            self._last_remaining_requests = remaining_requests
+            if remaining_requests < self._limit:
+                self._limit = float(max(self._min_limit, remaining_requests))
+
+        if remaining_tokens is not None:
+            self._last_remaining_tokens = remaining_tokens
+            if limit_tokens:
+                self._growth_blocked = remaining_tokens < limit_tokens * 0.1
+            else:
+                self._growth_blocked = remaining_tokens <= 0
+
+    def _decrease(self, reason: str) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease_at < self._decrease_cooldown:
+            return
+        self._last_decrease_at = now
+        before = self.current_limit
+        self._limit = max(float(self._min_limit), self._limit * self._decrease_factor)
+        self._decreases += 1
+        logger.warning(
+            "AOAI concurrency[%s] decreased %d -> %d (%s)",
+            self.name,
+            before,
+            self.current_limit,
+            reason,
+        )
+
+    def stats(self) -> dict[str, Any]:
+        paused_for = max(0.0, self._paused_until - time.monotonic())
+        return {
+            "limit": self.current_limit,
+            "min_limit": self._min_limit,
+            "max_limit": self._max_limit,
+            "in_flight": self._in_flight,
+            "paused_for_seconds": round(paused_for, 3),
+            "latency_ewma_seconds": round(self._latency_ewma, 3) if self._latency_ewma is not None else None,
+            "successes": self._successes,
+            "throttled": self._throttled,
+            "errors": self._errors,
+            "decreases": self._decreases,
+            "growth_blocked": self._growth_blocked,
+            "last_remaining_requests": self._last_remaining_requests,
+            "last_remaining_tokens": self._last_remaining_tokens,
+        }
+
+
+_limiters: dict[str, AdaptiveConcurrencyLimiter] = {}
+
+
+def get_concurrency_limiter(endpoint: str) -> AdaptiveConcurrencyLimiter:
+    limiter = _limiters.get(endpoint)
+    if limiter is None:
+        limiter = AdaptiveConcurrencyLimiter(
+            name=endpoint,
+            initial_limit=int(getattr(settings, "AOAI_CONCURRENCY_INITIAL", 16) or 16),
+            min_limit=int(getattr(settings, "AOAI_CONCURRENCY_MIN", 2) or 2),
+            max_limit=int(getattr(settings, "AOAI_CONCURRENCY_MAX", 64) or 64),
+            increase_step=float(getattr(settings, "AOAI_CONCURRENCY_INCREASE_STEP", 1.0) or 1.0),
+            decrease_factor=float(getattr(settings, "AOAI_CONCURRENCY_DECREASE_FACTOR", 0.5) or 0.5),
+            latency_spike_factor=float(getattr(settings, "AOAI_CONCURRENCY_LATENCY_SPIKE_FACTOR", 3.0) or 3.0),
+        )
+        _limiters[endpoint] = limiter
+    return limiter
+
+
+def concurrency_stats() -> dict[str, Any]:
+    return {name: limiter.stats() for name, limiter in _limiters.items()}
@@ -0,0 +1,85 @@
+"""Content-addressed cache for per-student AI analysis results.
+
+Re-uploading the same sheet, re-parsing after a mapping tweak, or students with identical
+deduction lists produce byte-identical prompts. The cache key is a sha256 over everything
+that determines the model output (system prompt incl. one-shot example, user prompt,
+model, temperature), so a hit returns the previous text instantly at zero token cost.
+
+Backed by the ``analysis_cache_entries`` table (``DBCache``) with TTL expiry and LRU
+eviction once ANALYSIS_CACHE_MAX_ENTRIES is exceeded.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Optional
+
+import hashlib
+import json
+
+from app.core.config import settings
+from app.core.time import utcnow
+from app.models.analysis_cache import AnalysisCacheEntry
+from app.services.db_cache import DBCache
+
+
+@dataclass(frozen=True)
+class CachedAnalysis:
+    text: str
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+
+
+class AnalysisResultCache(DBCache):
+    entry_model = AnalysisCacheEntry
+    name = "analysis cache"
+    enabled_setting = "ANALYSIS_CACHE_ENABLED"
+    max_entries_setting = "ANALYSIS_CACHE_MAX_ENTRIES"
+    default_max_entries = 50000
+
+    @staticmethod
+    def make_key(*, system_prompt: str, user_prompt: str, model: str, temperature: Optional[float]) -> str:
+        material = json.dumps(
+            {
+                "system": system_prompt,
+                "user": user_prompt,
+                "model": model,
+                "temperature": None if temperature is None else round(float(temperature), 4),
+            },
+            ensure_ascii=False,
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedAnalysis]:
+        return self._get(
+            key,
+            lambda entry: CachedAnalysis(
+                text=entry.response_text,
+                model=entry.model,
+                prompt_tokens=int(entry.prompt_tokens or 0),
+                completion_tokens=int(entry.completion_tokens or 0),
+            ),
+        )
+
+    def put(self, key: str, *, model: str, text: str, usage: dict[str, int]) -> None:
+        if not (text or "").strip():
+            return
+
+        ttl = int(getattr(settings, "ANALYSIS_CACHE_TTL_SECONDS", 30 * 24 * 3600) or 0)
+
+        def fill(entry: AnalysisCacheEntry) -> None:
+            entry.model = model
+            entry.response_text = text
+            entry.prompt_tokens = int((usage or {}).get("prompt_tokens", 0) or 0)
+            entry.completion_tokens = int((usage or {}).get("completion_tokens", 0) or 0)
+            entry.expires_at = utcnow() + timedelta(seconds=max(1, ttl))
+
+        self._put(key, fill)
+
+
+# 全局实例
+analysis_cache = AnalysisResultCache()
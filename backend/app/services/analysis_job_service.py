@@ -0,0 +1,738 @@
+"""Background AI analysis jobs.
+
+``POST /files/{id}/analyze`` used to hold the HTTP request open for the whole batch, which
+runs into ingress timeouts and ties up workers. Now it creates an ``AnalysisJob`` row and
+returns 202 + job id; the batch runs as an asyncio task on the API worker.
+
+- Claiming is an atomic ``UPDATE ... WHERE status = 'queued'``, so with several workers /
+  replicas exactly one of them runs a job.
+- A running job refreshes ``heartbeat_at`` on every finished student and on a timer. The
+  sweeper requeues running jobs whose heartbeat went stale (worker crashed or restarted)
+  and picks up queued jobs nobody is running.
+- Every finished student is checkpointed (``analysis_student_results``) together with the
+  progress counters. A (re)run reuses succeeded checkpoints whose input hash still matches
+  and only sends the remaining students to the model.
+- Resume mode (``resume=true`` on an analyzed file) re-runs only the students whose
+  analysis failed; those were refunded, so only they are charged again.
+- A partial unique index allows one queued/running job per file; a concurrent second
+  submit of the same file gets the existing job instead of a duplicate.
+- Quota is reserved atomically when the job is created (``quota_service``). On success
+  the students whose analysis failed are refunded; a failed job is refunded in full.
+  Finishing is a conditional ``UPDATE ... WHERE status = 'running'``, so a job is settled
+  exactly once even if a stale copy of it finishes on another worker.
+- The AnalysisLog is closed and the per-student analysis written to the ``students`` rows
+  only when the whole batch succeeded (same semantics as the former synchronous endpoint).
+- Per-student completions are published to an in-memory channel with full replay, served
+  as SSE by ``GET /analysis-jobs/{id}/events``. Subscribers on another worker (or after
+  the replay window) fall back to polling the job row.
+"""
+
+from __future__ import annotations
+
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import asyncio
+import hashlib
+import json
+import logging
+import uuid
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from app.core.compression import decode_payload, encode_payload
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.time import ensure_utc_aware, utcnow
+from app.core.user_cache import user_cache
+from app.models.analysis_job import AnalysisJob, AnalysisStudentResult
+from app.models.score import StudentScore
+from app.models.user import AnalysisLog, ScoreFile, User
+from app.services.analysis_service import AnalysisService
+from app.services import quota_service, student_store
+from app.services.usage_rollup_service import usage_rollups
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+
+def job_snapshot(job: AnalysisJob) -> Dict[str, Any]:
+    total = int(job.total_students or 0)
+    completed = int(job.completed_students or 0)
+    failed = int(job.failed_students or 0)
+
+    def _iso(value):
+        value = ensure_utc_aware(value)
+        return value.isoformat() if value else None
+
+    return {
+        "job_id": job.id,
+        "file_id": job.score_file_id,
+        "status": job.status,
+        "total": total,
+        "completed": completed,
+        "failed": failed,
+        "resumed": int(job.resumed_students or 0),
+        "progress": round((completed + failed) / total, 4) if total else 0.0,
+        "error_message": job.error_message,
+        "created_at": _iso(job.created_at),
+        "started_at": _iso(job.started_at),
+        "finished_at": _iso(job.finished_at),
+    }
+
+
+def student_input_hash(score: StudentScore, one_shot_text: Optional[str]) -> str:
+    """Fingerprint of what the model sees for one student; a checkpoint is reused only on a match."""
+    material = json.dumps(
+        {
+            "student": score.model_dump(mode="json", include={"student_name", "scores", "total_score"}),
+            "one_shot_text": (one_shot_text or "").strip(),
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class _JobChannel:
+    """Append-only event log of one job; every subscriber replays it from the start."""
+
+    def __init__(self) -> None:
+        self.events: List[Dict[str, Any]] = []
+        self.closed = False
+        self._cond = asyncio.Condition()
+
+    async def publish(self, event: Dict[str, Any], *, close: bool = False) -> None:
+        async with self._cond:
+            self.events.append(event)
+            self.closed = self.closed or close
+            self._cond.notify_all()
+
+    async def close(self) -> None:
+        async with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    async def subscribe(self, keepalive: float) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Yields events; ``None`` means "nothing new for ``keepalive`` seconds"."""
+        seen = 0
+        while True:
+            async with self._cond:
+                if seen >= len(self.events) and not self.closed:
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), timeout=keepalive)
+                    except asyncio.TimeoutError:
+                        pass
+                batch = self.events[seen:]
+                seen = len(self.events)
+                closed = self.closed
+
+            if not batch and not closed:
+                yield None
+            for event in batch:
+                yield event
+            if closed and seen >= len(self.events):
+                return
+
+
+class AnalysisJobRunner:
+    def __init__(self) -> None:
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._channels: Dict[str, _JobChannel] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.requeued = 0
+
+    @staticmethod
+    def _setting(name: str, default: float) -> float:
+        return float(getattr(settings, name, default) or default)
+
+    # ---- lifecycle -------------------------------------------------------
+
+    def start(self) -> None:
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_loop(), name="analysis-job-sweeper")
+
+    async def shutdown(self) -> None:
+        """Stop local jobs; they stay ``running`` and are requeued once their heartbeat is stale."""
+        tasks = [t for t in (self._sweeper, *self._tasks.values()) if t is not None]
+        self._sweeper = None
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        for channel in list(self._channels.values()):
+            await channel.close()
+        self._channels.clear()
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            try:
+                await self.sweep()
+            except Exception:
+                logger.warning("analysis job sweep failed", exc_info=True)
+            await asyncio.sleep(self._setting("ANALYSIS_JOB_SWEEP_INTERVAL_SECONDS", 60.0))
+
+    async def sweep(self) -> None:
+        """Requeue stale running jobs, then start every queued job not already running here."""
+        for job_id in await asyncio.to_thread(self._requeue_stale, set(self._tasks)):
+            self.submit(job_id)
+
+    def _requeue_stale(self, local_jobs: set[str]) -> List[str]:
+        """DB side of ``sweep`` (worker thread); returns the queued job ids."""
+        stale_before = utcnow().timestamp() - self._setting("ANALYSIS_JOB_STALE_SECONDS", 180.0)
+        db = SessionLocal()
+        try:
+            running = db.query(AnalysisJob).filter(AnalysisJob.status == "running").all()
+            for job in running:
+                if job.id in local_jobs:
+                    continue
+                heartbeat = ensure_utc_aware(job.heartbeat_at or job.started_at)
+                if heartbeat is None or heartbeat.timestamp() < stale_before:
+                    result = db.execute(
+                        update(AnalysisJob)
+                        .where(AnalysisJob.id == job.id, AnalysisJob.status == "running")
+                        .where(AnalysisJob.heartbeat_at == job.heartbeat_at)
+                        .values(status="queued")
+                        .execution_options(synchronize_session=False)
+                    )
+                    if result.rowcount:
+                        self.requeued += 1
+                        logger.warning("requeued stale analysis job %s", job.id)
+            db.commit()
+
+            queued = [
+                job_id
+                for (job_id,) in db.query(AnalysisJob.id)
+                .filter(AnalysisJob.status == "queued")
+                .order_by(AnalysisJob.created_at)
+                .all()
+            ]
+        finally:
+            db.close()
+        return queued
+
+    # ---- job creation ----------------------------------------------------
+
+    @staticmethod
+    def find_active_job(db, *, file_id: int, user_id: int) -> Optional[AnalysisJob]:
+        return (
+            db.query(AnalysisJob)
+            .filter(
+                AnalysisJob.score_file_id == file_id,
+                AnalysisJob.user_id == user_id,
+                AnalysisJob.status.in_(ACTIVE_STATUSES),
+            )
+            .order_by(AnalysisJob.created_at.desc())
+            .first()
+        )
+
+    @staticmethod
+    def create_job(
+        db,
+        *,
+        user: User,
+        file_record: ScoreFile,
+        student_count: int,
+        one_shot_text: Optional[str],
+        quota_cost: Optional[int] = None,
+    ) -> AnalysisJob:
+        """Create the job (and its AnalysisLog) and reserve its quota in one transaction.
+
+        Raises ``quota_service.QuotaExceeded`` (nothing is written) if the balance is short.
+        If another request created an active job for the file in the meantime, the unique
+        index rejects this one; the reservation is rolled back and that job is returned.
+        """
+        quota_cost = student_count if quota_cost is None else quota_cost
+        try:
+            quota_reserved = quota_service.reserve(
+                db, user=user, units=quota_cost, description=f"分析文件: {file_record.filename}"
+            )
+        except quota_service.QuotaExceeded:
+            db.rollback()
+            raise
+
+        analysis_log = AnalysisLog(
+            user_id=user.id,
+            filename=file_record.filename,
+            file_type=file_record.file_type,
+            student_count=student_count,
+            quota_cost=quota_cost,
+            status="processing",
+        )
+        db.add(analysis_log)
+        db.flush()
+
+        job = AnalysisJob(
+            id=str(uuid.uuid4()),
+            user_id=user.id,
+            score_file_id=file_record.id,
+            analysis_log_id=analysis_log.id,
+            status="queued",
+            one_shot_text=one_shot_text,
+            total_students=student_count,
+            completed_students=0,
+            failed_students=0,
+            resumed_students=0,
+            quota_cost=quota_cost,
+            quota_reserved=quota_reserved,
+            quota_refunded=0,
+        )
+        db.add(job)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            existing = AnalysisJobRunner.find_active_job(db, file_id=file_record.id, user_id=user.id)
+            if existing is None:
+                raise
+            return existing
+        db.refresh(job)
+        if quota_cost:
+            user_cache.invalidate(user.id)
+        return job
+
+    def submit(self, job_id: str) -> None:
+        if job_id in self._tasks:
+            return
+        self.submitted += 1
+        self._channels.setdefault(job_id, _JobChannel())
+        task = asyncio.create_task(self._run(job_id), name=f"analysis-job-{job_id}")
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _t: self._tasks.pop(job_id, None))
+
+    # ---- execution -------------------------------------------------------
+
+    @staticmethod
+    def _claim(job_id: str) -> bool:
+        now = utcnow()
+        db = SessionLocal()
+        try:
+            result = db.execute(
+                update(AnalysisJob)
+                .where(AnalysisJob.id == job_id, AnalysisJob.status == "queued")
+                .values(status="running", started_at=now, heartbeat_at=now, error_message=None)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            return bool(result.rowcount)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _update_job(job_id: str, **values: Any) -> None:
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(AnalysisJob)
+                .where(AnalysisJob.id == job_id)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def load_snapshot(job_id: str) -> Optional[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            job = db.get(AnalysisJob, job_id)
+            return job_snapshot(job) if job is not None else None
+        finally:
+            db.close()
+
+    async def _heartbeat_loop(self, job_id: str) -> None:
+        interval = self._setting("ANALYSIS_JOB_HEARTBEAT_SECONDS", 30.0)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self._update_job, job_id, heartbeat_at=utcnow())
+            except Exception:
+                logger.warning("analysis job %s heartbeat failed", job_id, exc_info=True)
+
+    async def _run(self, job_id: str) -> None:
+        channel = self._channels.setdefault(job_id, _JobChannel())
+        if not await asyncio.to_thread(self._claim, job_id):
+            # Another worker claimed it; late subscribers fall back to DB polling.
+            await channel.close()
+            self._forget_channel(job_id)
+            return
+
+        heartbeat = asyncio.create_task(self._heartbeat_loop(job_id))
+        cancelled = False
+        try:
+            file_id, one_shot_text, scores, input_hashes, results = await asyncio.to_thread(
+                self._load_work, job_id
+            )
+            pending = [i for i, r in enumerate(results) if r is None]
+            resumed = len(scores) - len(pending)
+
+            progress = {"completed": resumed, "failed": 0}
+            await asyncio.to_thread(
+                self._update_job,
+                job_id,
+                resumed_students=resumed,
+                completed_students=resumed,
+                failed_students=0,
+                heartbeat_at=utcnow(),
+            )
+            snapshot = await asyncio.to_thread(self.load_snapshot, job_id)
+            await channel.publish({"type": "started", "job": dict(snapshot)})
+            for i, score in enumerate(results):
+                if score is not None:
+                    await channel.publish(
+                        {
+                            "type": "student",
+                            "index": i,
+                            "failed": False,
+                            "resumed": True,
+                            "student": score.model_dump(mode="json"),
+                            "job": dict(snapshot),
+                        }
+                    )
+            if resumed:
+                logger.info("analysis job %s: resumed %d/%d students from checkpoints", job_id, resumed, len(scores))
+
+            async def on_result(batch_index: int, score: StudentScore, usage: Dict[str, int]) -> None:
+                index = pending[batch_index]
+                failed = AnalysisService.is_failed_analysis(score)
+                progress["failed" if failed else "completed"] += 1
+                # Sync DB write: keep it off the loop while the rest of the batch is in flight.
+                await asyncio.to_thread(
+                    self._save_checkpoint,
+                    job_id,
+                    file_id=file_id,
+                    index=index,
+                    score=score,
+                    input_hash=input_hashes[index],
+                    failed=failed,
+                )
+                snapshot.update(
+                    status="running",
+                    completed=progress["completed"],
+                    failed=progress["failed"],
+                    progress=round(sum(progress.values()) / len(scores), 4),
+                )
+                await channel.publish(
+                    {
+                        "type": "student",
+                        "index": index,
+                        "failed": failed,
+                        "student": score.model_dump(mode="json"),
+                        "job": dict(snapshot),
+                    }
+                )
+
+            usage: Dict[str, int] = {"prompt_tokens": 0, "completion_tokens": 0}
+            if pending:
+                analyzed, usage = await AnalysisService.analyze_scores_batch(
+                    [scores[i] for i in pending],
+                    one_shot_text=one_shot_text,
+                    on_result=on_result,
+                )
+                for i, score in zip(pending, analyzed):
+                    results[i] = score
+            await asyncio.to_thread(self._finish_success, job_id, results, usage)
+            self.succeeded += 1
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        except Exception as e:
+            logger.exception("AI分析任务失败: job_id=%s", job_id)
+            await asyncio.to_thread(self._finish_failure, job_id, e)
+            self.failed += 1
+        finally:
+            heartbeat.cancel()
+            if not cancelled:
+                try:
+                    snapshot = await asyncio.to_thread(self.load_snapshot, job_id)
+                    await channel.publish({"type": "done", "job": snapshot}, close=True)
+                except Exception:
+                    logger.warning("analysis job %s: failed to publish completion", job_id, exc_info=True)
+                    await channel.close()
+                self._forget_channel(job_id)
+
+    @staticmethod
+    def _load_work(
+        job_id: str,
+    ) -> Tuple[int, Optional[str], List[StudentScore], List[str], List[Optional[StudentScore]]]:
+        """Load the job's students and reuse what is already done (runs in a worker thread).
+
+        Returns (file_id, one_shot_text, scores, input_hashes, results); ``results[i]`` is
+        set for students kept from an earlier run or a matching checkpoint.
+        """
+        db = SessionLocal()
+        try:
+            job = db.get(AnalysisJob, job_id)
+            file_record = db.get(ScoreFile, job.score_file_id)
+            if file_record is None:
+                raise ValueError("文件不存在或尚未完成解析")
+            student_store.ensure_backfilled(db, file_record)
+            scores = student_store.load_scores(db, file_record.id)
+            one_shot_text = job.one_shot_text
+            file_id = file_record.id
+            checkpoints = {
+                row.student_index: row
+                for row in db.query(AnalysisStudentResult).filter(
+                    AnalysisStudentResult.score_file_id == file_id,
+                    AnalysisStudentResult.status == "succeeded",
+                )
+            }
+        finally:
+            db.close()
+
+        if not scores:
+            raise ValueError("未找到可分析的学生数据")
+
+        input_hashes = [student_input_hash(s, one_shot_text) for s in scores]
+        results: List[Optional[StudentScore]] = [None] * len(scores)
+        for i, score in enumerate(scores):
+            if score.analysis and not AnalysisService.is_failed_analysis(score):
+                # 已分析文件的补跑：成功的学生保持原结果
+                results[i] = score
+                continue
+            checkpoint = checkpoints.get(i)
+            if checkpoint is not None and checkpoint.input_hash == input_hashes[i]:
+                results[i] = StudentScore.model_validate_json(decode_payload(checkpoint.result_json))
+        return file_id, one_shot_text, scores, input_hashes, results
+
+    @staticmethod
+    def _save_checkpoint(
+        job_id: str,
+        *,
+        file_id: int,
+        index: int,
+        score: StudentScore,
+        input_hash: str,
+        failed: bool,
+    ) -> None:
+        """Persist one student's result and the job progress in the same transaction.
+
+        Runs in a worker thread; counters are incremented in SQL so checkpoints committing
+        out of order never move them backwards.
+        """
+        db = SessionLocal()
+        try:
+            row = (
+                db.query(AnalysisStudentResult)
+                .filter(
+                    AnalysisStudentResult.score_file_id == file_id,
+                    AnalysisStudentResult.student_index == index,
+                )
+                .first()
+            )
+            if row is None:
+                row = AnalysisStudentResult(score_file_id=file_id, student_index=index)
+                db.add(row)
+            row.job_id = job_id
+            row.student_name = score.student_name
+            row.input_hash = input_hash
+            row.status = "failed" if failed else "succeeded"
+            row.result_json = encode_payload(score.model_dump_json())
+
+            db.execute(
+                update(AnalysisJob)
+                .where(AnalysisJob.id == job_id)
+                .values(
+                    completed_students=AnalysisJob.completed_students + (0 if failed else 1),
+                    failed_students=AnalysisJob.failed_students + (1 if failed else 0),
+                    heartbeat_at=utcnow(),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _forget_channel(self, job_id: str) -> None:
+        retention = self._setting("ANALYSIS_JOB_EVENT_RETENTION_SECONDS", 600.0)
+        loop = asyncio.get_running_loop()
+        loop.call_later(retention, self._channels.pop, job_id, None)
+
+    @staticmethod
+    def _close_job(db, job_id: str, **values: Any) -> Optional[AnalysisJob]:
+        """Move a running job to its final status; None if it is no longer ours to finish."""
+        result = db.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.id == job_id, AnalysisJob.status == "running")
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        if not result.rowcount:
+            logger.warning("analysis job %s is no longer running; not finishing it again", job_id)
+            return None
+        return db.get(AnalysisJob, job_id)
+
+    @staticmethod
+    def _finish_success(job_id: str, results: List[Optional[StudentScore]], usage: Dict[str, int]) -> None:
+        now = utcnow()
+        prompt_tokens = int((usage or {}).get("prompt_tokens", 0) or 0)
+        completion_tokens = int((usage or {}).get("completion_tokens", 0) or 0)
+        db = SessionLocal()
+        try:
+            job = AnalysisJobRunner._close_job(
+                db,
+                job_id,
+                status="succeeded",
+                finished_at=now,
+                heartbeat_at=now,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+            )
+            if job is None:
+                db.rollback()
+                return
+            file_record = db.get(ScoreFile, job.score_file_id)
+            analysis_log = db.get(AnalysisLog, job.analysis_log_id) if job.analysis_log_id else None
+
+            quota_cost = int(job.quota_cost or 0)
+            description = f"分析文件: {file_record.filename}"
+            if job.quota_reserved is None:
+                # 预留机制上线前创建的任务：结束时扣费（与原逻辑一致）
+                job.quota_reserved = quota_service.reserve(
+                    db, user=db.get(User, job.user_id), units=quota_cost, description=description, force=True
+                )
+
+            # 分析失败的学生退还配额（可用 resume 模式补跑）
+            failed = sum(1 for score in results if score is not None and AnalysisService.is_failed_analysis(score))
+            refunded = min(failed, quota_cost)
+            if refunded:
+                quota_service.release(
+                    db,
+                    user_id=job.user_id,
+                    units=refunded,
+                    held=int(job.quota_reserved or 0),
+                    description=f"{description}（{refunded} 名学生分析失败，退还配额）",
+                )
+            job.quota_refunded = refunded
+
+            started_at = ensure_utc_aware(job.started_at) or now
+            processing_time = (now - started_at).total_seconds()
+            if analysis_log is not None:
+                analysis_log.status = "success"
+                analysis_log.processing_time = processing_time
+                analysis_log.prompt_tokens = prompt_tokens
+                analysis_log.completion_tokens = completion_tokens
+                analysis_log.quota_cost = quota_cost - refunded
+                usage_rollups.record_finished(db, analysis_log)
+
+            # 更新ScoreFile记录（逐个学生写入分析结果）
+            student_store.save_analysis(
+                db, file_record.id, [(i, score) for i, score in enumerate(results) if score is not None]
+            )
+            file_record.analysis_completed = True
+            file_record.analyzed_at = now
+
+            # 完整结果已落盘，检查点不再需要
+            db.query(AnalysisStudentResult).filter(
+                AnalysisStudentResult.score_file_id == file_record.id
+            ).delete(synchronize_session=False)
+
+            db.commit()
+            if quota_cost:
+                user_cache.invalidate(job.user_id)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def _finish_failure(job_id: str, error: BaseException) -> None:
+        now = utcnow()
+        message = f"{type(error).__name__}: {error}"
+        db = SessionLocal()
+        try:
+            job = AnalysisJobRunner._close_job(
+                db, job_id, status="failed", error_message=message, finished_at=now
+            )
+            if job is None:
+                db.rollback()
+                return
+
+            # 任务失败：退还全部预留配额（预留机制上线前的任务尚未扣费）
+            refunded = int(job.quota_cost or 0) if job.quota_reserved is not None else 0
+            if refunded:
+                quota_service.release(
+                    db,
+                    user_id=job.user_id,
+                    units=refunded,
+                    held=int(job.quota_reserved or 0),
+                    description=f"AI分析任务失败，退还配额（任务 {job_id}）",
+                )
+            job.quota_refunded = refunded
+
+            if job.analysis_log_id:
+                analysis_log = db.get(AnalysisLog, job.analysis_log_id)
+                if analysis_log is not None:
+                    started_at = ensure_utc_aware(job.started_at) or now
+                    analysis_log.status = "failed"
+                    analysis_log.error_message = message
+                    analysis_log.processing_time = (now - started_at).total_seconds()
+                    usage_rollups.record_finished(db, analysis_log)
+            db.commit()
+            if refunded:
+                user_cache.invalidate(job.user_id)
+        except Exception:
+            db.rollback()
+            logger.warning("analysis job %s: failed to record failure", job_id, exc_info=True)
+        finally:
+            db.close()
+
+    # ---- progress streaming ----------------------------------------------
+
+    async def events(self, job_id: str) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Job events for SSE; ``None`` is a keepalive tick. Ends after the ``done`` event."""
+        keepalive = self._setting("ANALYSIS_JOB_SSE_KEEPALIVE_SECONDS", 15.0)
+
+        channel = self._channels.get(job_id)
+        if channel is not None:
+            async for event in channel.subscribe(keepalive):
+                yield event
+                if event is not None and event.get("type") == "done":
+                    return
+
+        # Job runs on another worker (or its replay expired): poll the row.
+        last: Optional[Dict[str, Any]] = None
+        idle = 0.0
+        poll = min(1.0, keepalive)
+        while True:
+            snapshot = await asyncio.to_thread(self.load_snapshot, job_id)
+            if snapshot is None:
+                return
+            if snapshot["status"] in TERMINAL_STATUSES:
+                yield {"type": "done", "job": snapshot}
+                return
+            if snapshot != last:
+                yield {"type": "progress", "job": snapshot}
+                last = snapshot
+                idle = 0.0
+            elif idle >= keepalive:
+                yield None
+                idle = 0.0
+            await asyncio.sleep(poll)
+            idle += poll
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": len(self._tasks),
+            "channels": len(self._channels),
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "requeued": self.requeued,
+        }
+
+
+# 全局实例
+analysis_job_runner = AnalysisJobRunner()
@@ -1,12 +1,22 @@
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, Awaitable, Callable
+import logging
 import math
 from app.models.score import StudentScore, ScoreAnalysis
 from app.core.config import settings
 import asyncio
 
 from app.services.azure_openai_responses_client import AzureOpenAIResponsesClient
+from app.services.analysis_cache_service import analysis_cache
+
+logger = logging.getLogger(__name__)
+
+# 单个学生分析完成时的回调：(学生序号, 分析后的成绩, token 用量)
+StudentResultCallback = Callable[[int, StudentScore, Dict[str, int]], Awaitable[None]]
 
 class AnalysisService:
+    # Reused across students/batches; connections live in the shared aoai_http_pool.
+    _client: AzureOpenAIResponsesClient | None = None
+
     SYSTEM_ROLE_INSTRUCTION = (
         "你是一位专业的小学学科教育分析专家。请根据学生的薄弱知识点与扣分情况，生成一段完整的成绩分析和改进建议，要鼓励与建议并存。\n\n"
     )
@@ -19,6 +29,9 @@ class AnalysisService:
         "4. 既要指出问题，也要给出具体的改进建议"
     )
 
+    # 单个学生分析失败时 analysis 字段的前缀（批次不中断）
+    FAILED_ANALYSIS_PREFIX = "分析失败"
+
     DEFAULT_REFERENCE_EXAMPLE = (
         "从知识点方面，小朋友能够基本掌握，但是在以下方面还需要继续加强：除法算理的运用不够灵活，根据余数和除数求最小、最大的被除数，可以针对性练习，回顾这个专题的练习，同时加强计算；轴对称图形观察图形的细致性还要提高；长度单位的换算和比较，不够熟练，假期要加强练习；英文表述的倍数关系不够熟练，建议多总结句型，针对性练习；归一问题读题不够透彻，很容易找不到那个单一的量，建议在读题的基础上，善于做一些标记、图来帮助分析；单位换算还需要继续练习；对于长度单位、面积单位的感知还不够熟悉，平时要在日常生活中多多留心，从生活中身边的例子出发，加深对于单位概念的理解和熟练度；混合运算的变形不够熟练，建议做一些标记、简单的提示词来帮助梳理思路；计算面积会忘记统一单位，还是要多总结做题方法、题型。"
     )
@@ -64,21 +77,25 @@ class AnalysisService:
             return settings.AZURE_OPENAI_DEPLOYMENT_NAME.strip()
         raise ValueError("ANALYSIS_MODEL (or AZURE_OPENAI_DEPLOYMENT_NAME) must be set")
 
-    @staticmethod
-    async def analyze_score(score: StudentScore, one_shot_text: str | None = None) -> Tuple[ScoreAnalysis, Dict[str, int]]:
-        """分析学生成绩"""
-        try:
+    @classmethod
+    def _get_client(cls) -> AzureOpenAIResponsesClient:
+        if cls._client is None:
             if not settings.AZURE_OPENAI_API_KEY:
                 raise ValueError("AZURE_OPENAI_API_KEY must be set")
 
-            client = AzureOpenAIResponsesClient(
-                responses_url=AnalysisService._resolve_responses_url(),
+            cls._client = AzureOpenAIResponsesClient(
+                responses_url=cls._resolve_responses_url(),
                 api_key=settings.AZURE_OPENAI_API_KEY,
                 fallback_responses_url=(settings.AZURE_OPENAI_RESPONSES_URL_2 or None),
                 fallback_api_key=(settings.AZURE_OPENAI_API_KEY_2 or None),
                 timeout_seconds=float(settings.OPENAI_REQUEST_TIMEOUT_SECONDS or 600.0),
             )
+        return cls._client
 
+    @staticmethod
+    async def analyze_score(score: StudentScore, one_shot_text: str | None = None) -> Tuple[ScoreAnalysis, Dict[str, int]]:
+        """分析学生成绩"""
+        try:
             # User prompt: directly list original Excel questions and their deduction.
             # Only include deducted items (deduction > 0) to keep prompt focused and reduce token usage.
             deducted_items = []
@@ -126,13 +143,34 @@ class AnalysisService:
                 })
 
             system_content = AnalysisService._build_system_prompt(one_shot_text=one_shot_text)
+            model = AnalysisService._resolve_analysis_model()
+            temperature = float(settings.ANALYSIS_TEMPERATURE or 0.5)
 
+            # Identical prompt => identical request: serve from cache at zero token cost.
+            # The cache is a synchronous DB lookup; run it off the event loop so the
+            # students gathered in analyze_scores_batch don't queue behind each other.
+            cache_key = analysis_cache.make_key(
+                system_prompt=system_content,
+                user_prompt=prompt,
+                model=model,
+                temperature=temperature,
+            )
+            cached = await asyncio.to_thread(analysis_cache.get, cache_key)
+            if cached is not None:
+                return ScoreAnalysis(
+                    student_name=score.student_name,
+                    deduction_summary=deduction_by_category,
+                    analysis=cached.text,
+                    suggestions=[]
+                ), {"prompt_tokens": 0, "completion_tokens": 0}
+
+            client = AnalysisService._get_client()
             result = await client.create_text_response(
-                model=AnalysisService._resolve_analysis_model(),
+                model=model,
                 fallback_model=(settings.ANALYSIS_MODEL_2.strip() if settings.ANALYSIS_MODEL_2 else None),
                 system_prompt=system_content,
                 user_prompt=prompt,
-                temperature=float(settings.ANALYSIS_TEMPERATURE or 0.5),
+                temperature=temperature,
             )
 
             # Backward compatible keys used across the codebase.
@@ -144,6 +182,8 @@ class AnalysisService:
             analysis_text = (result.text or "").strip()
             if not analysis_text:
                 analysis_text = "（模型未返回有效文本）"
+            else:
+                await asyncio.to_thread(analysis_cache.put, cache_key, model=model, text=analysis_text, usage=usage)
 
             # 返回分析结果
             return ScoreAnalysis(
@@ -158,40 +198,57 @@ class AnalysisService:
     @staticmethod
     async def analyze_scores_batch(
         scores: List[StudentScore],
-        max_concurrent: int = 50,
+        max_concurrent: int | None = None,
         one_shot_text: str | None = None,
+        on_result: StudentResultCallback | None = None,
     ) -> Tuple[List[StudentScore], Dict[str, int]]:
         """
         批量分析学生成绩，支持并发处理
-        
+
+        并发度由进程级自适应限流器（adaptive_concurrency）统一控制，
+        多个文件/用户同时分析时共享同一配额，而不是各自占满固定并发。
+
         Args:
             scores: 学生成绩列表
-            max_concurrent: 最大并发数，默认50
-            
+            max_concurrent: 可选，单批次并发上限（默认不额外限制）
+            on_result: 可选，每个学生分析完成（含失败）后立即回调，用于进度推送；
+                回调异常只记录日志，不影响批次
+
         Returns:
             包含分析结果的学生成绩列表
         """
-        # 创建信号量限制并发数
-        semaphore = asyncio.Semaphore(max_concurrent)
-        
-        async def analyze_with_semaphore(score: StudentScore) -> Tuple[StudentScore, Dict[str, int]]:
-            """使用信号量控制的分析函数"""
-            async with semaphore:
+        # 可选的单批次上限（全局并发由自适应限流器控制）
+        semaphore = asyncio.Semaphore(max_concurrent) if max_concurrent else None
+
+        async def analyze_one(score: StudentScore) -> Tuple[StudentScore, Dict[str, int]]:
+            try:
+                analysis, usage = await AnalysisService.analyze_score(score, one_shot_text=one_shot_text)
+                # 将分析结果添加到原始score对象中
+                score.analysis = analysis.analysis
+                score.suggestions = analysis.suggestions
+                return score, usage
+            except Exception as e:
+                # 如果分析失败，记录错误但不中断整个流程
+                print(f"分析学生 {score.student_name} 时出错: {str(e)}")
+                score.analysis = f"{AnalysisService.FAILED_ANALYSIS_PREFIX}: {str(e)}"
+                score.suggestions = []
+                return score, {"prompt_tokens": 0, "completion_tokens": 0}
+
+        async def analyze_with_semaphore(index: int, score: StudentScore) -> Tuple[StudentScore, Dict[str, int]]:
+            if semaphore is None:
+                result = await analyze_one(score)
+            else:
+                async with semaphore:
+                    result = await analyze_one(score)
+            if on_result is not None:
                 try:
-                    analysis, usage = await AnalysisService.analyze_score(score, one_shot_text=one_shot_text)
-                    # 将分析结果添加到原始score对象中
-                    score.analysis = analysis.analysis
-                    score.suggestions = analysis.suggestions
-                    return score, usage
-                except Exception as e:
-                    # 如果分析失败，记录错误但不中断整个流程
-                    print(f"分析学生 {score.student_name} 时出错: {str(e)}")
-                    score.analysis = f"分析失败: {str(e)}"
-                    score.suggestions = []
-                    return score, {"prompt_tokens": 0, "completion_tokens": 0}
-        
+                    await on_result(index, *result)
+                except Exception:
+                    logger.warning("analysis on_result callback failed for %s", score.student_name, exc_info=True)
+            return result
+
         # 并发执行所有分析任务
-        tasks = [analyze_with_semaphore(score) for score in scores]
+        tasks = [analyze_with_semaphore(i, score) for i, score in enumerate(scores)]
         results = await asyncio.gather(*tasks, return_exceptions=True)
 
         analyzed: List[StudentScore] = []
@@ -206,4 +263,8 @@ class AnalysisService:
             total_prompt += int((usage or {}).get("prompt_tokens", 0) or 0)
             total_completion += int((usage or {}).get("completion_tokens", 0) or 0)
 
-        return analyzed, {"prompt_tokens": total_prompt, "completion_tokens": total_completion}
\ No newline at end of file
+        return analyzed, {"prompt_tokens": total_prompt, "completion_tokens": total_completion}
+
+    @staticmethod
+    def is_failed_analysis(score: StudentScore) -> bool:
+        return (score.analysis or "").startswith(AnalysisService.FAILED_ANALYSIS_PREFIX)
\ No newline at end of file
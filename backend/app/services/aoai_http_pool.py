@@ -0,0 +1,189 @@
+"""App-lifetime, connection-pooled httpx clients for Azure OpenAI /responses.
+
+One ``httpx.AsyncClient`` per endpoint role (primary / fallback) so that keep-alive
+connections and TLS sessions are reused across students, batches and users instead
+of paying a fresh handshake for every request.
+
+The pool is started/closed by the FastAPI lifespan (app/main.py). Clients are also
+created lazily on first use so scripts that never run the lifespan still work.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import logging
+import time
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+ENDPOINT_PRIMARY = "primary"
+ENDPOINT_FALLBACK = "fallback"
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    max_connections: int
+    max_keepalive_connections: int
+    keepalive_expiry: float
+    http2: bool
+
+
+@dataclass
+class _EndpointStats:
+    requests_total: int = 0
+    in_flight: int = 0
+    errors_total: int = 0
+    last_status: Optional[int] = None
+    last_latency_ms: Optional[float] = None
+    created_at: Optional[float] = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except Exception:
+        return False
+    return True
+
+
+class AOAIHttpClientPool:
+    def __init__(self) -> None:
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._configs: dict[str, PoolConfig] = {}
+        self._stats: dict[str, _EndpointStats] = {}
+
+    @staticmethod
+    def _config_for(endpoint: str) -> PoolConfig:
+        max_connections = int(getattr(settings, "AOAI_HTTP_MAX_CONNECTIONS", 100) or 100)
+        max_keepalive = int(getattr(settings, "AOAI_HTTP_MAX_KEEPALIVE_CONNECTIONS", 20) or 20)
+
+        if endpoint == ENDPOINT_FALLBACK:
+            v = getattr(settings, "AOAI_HTTP_MAX_CONNECTIONS_2", None)
+            if v:
+                max_connections = int(v)
+            v = getattr(settings, "AOAI_HTTP_MAX_KEEPALIVE_CONNECTIONS_2", None)
+            if v:
+                max_keepalive = int(v)
+
+        http2 = bool(getattr(settings, "AOAI_HTTP2_ENABLED", False))
+        if http2 and not _http2_available():
+            logger.warning("AOAI_HTTP2_ENABLED=true but the 'h2' package is not installed; using HTTP/1.1.")
+            http2 = False
+
+        return PoolConfig(
+            max_connections=max(1, max_connections),
+            max_keepalive_connections=max(0, min(max_keepalive, max_connections)),
+            keepalive_expiry=float(getattr(settings, "AOAI_HTTP_KEEPALIVE_EXPIRY_SECONDS", 60.0) or 60.0),
+            http2=http2,
+        )
+
+    def get_client(self, endpoint: str = ENDPOINT_PRIMARY) -> httpx.AsyncClient:
+        client = self._clients.get(endpoint)
+        if client is not None and not client.is_closed:
+            return client
+
+        cfg = self._config_for(endpoint)
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=cfg.max_connections,
+                max_keepalive_connections=cfg.max_keepalive_connections,
+                keepalive_expiry=cfg.keepalive_expiry,
+            ),
+            http2=cfg.http2,
+            timeout=float(settings.OPENAI_REQUEST_TIMEOUT_SECONDS or 600.0),
+        )
+        self._clients[endpoint] = client
+        self._configs[endpoint] = cfg
+        stats = self._stats.setdefault(endpoint, _EndpointStats())
+        stats.created_at = time.time()
+        return client
+
+    async def start(self) -> None:
+        """Eagerly create the primary client (fallback is created on first failover)."""
+        self.get_client(ENDPOINT_PRIMARY)
+
+    async def aclose(self) -> None:
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception:
+                logger.warning("Failed to close AOAI http client", exc_info=True)
+
+    async def post(
+        self,
+        *,
+        endpoint: str,
+        url: str,
+        headers: dict[str, str],
+        payload: dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> httpx.Response:
+        client = self.get_client(endpoint)
+        stats = self._stats.setdefault(endpoint, _EndpointStats())
+
+        stats.requests_total += 1
+        stats.in_flight += 1
+        started = time.perf_counter()
+        try:
+            kwargs: dict[str, Any] = {"headers": headers, "json": payload}
+            if timeout is not None:
+                kwargs["timeout"] = timeout
+            resp = await client.post(url, **kwargs)
+            stats.last_status = resp.status_code
+            return resp
+        except Exception:
+            stats.errors_total += 1
+            raise
+        finally:
+            stats.in_flight -= 1
+            stats.last_latency_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def stats(self) -> dict[str, Any]:
+        out: dict[str, Any] = {}
+        for endpoint, s in self._stats.items():
+            cfg = self._configs.get(endpoint)
+            client = self._clients.get(endpoint)
+            item: dict[str, Any] = {
+                "open": bool(client is not None and not client.is_closed),
+                "requests_total": s.requests_total,
+                "in_flight": s.in_flight,
+                "errors_total": s.errors_total,
+                "last_status": s.last_status,
+                "last_latency_ms": s.last_latency_ms,
+                "limits": {
+                    "max_connections": cfg.max_connections,
+                    "max_keepalive_connections": cfg.max_keepalive_connections,
+                    "keepalive_expiry": cfg.keepalive_expiry,
+                    "http2": cfg.http2,
+                }
+                if cfg
+                else None,
+            }
+            item.update(_connection_counts(client))
+            out[endpoint] = item
+        return out
+
+
+def _connection_counts(client: Optional[httpx.AsyncClient]) -> dict[str, Any]:
+    """Best-effort connection counts from the underlying httpcore pool."""
+    if client is None or client.is_closed:
+        return {"connections": 0, "idle_connections": 0}
+    try:
+        pool = client._transport._pool  # type: ignore[attr-defined]
+        conns = list(pool.connections)
+        idle = sum(1 for c in conns if c.is_idle())
+        return {"connections": len(conns), "idle_connections": idle}
+    except Exception:
+        return {"connections": None, "idle_connections": None}
+
+
+# 全局实例（由 app.main 的 lifespan 负责启动/关闭）
+aoai_http_pool = AOAIHttpClientPool()
@@ -8,8 +8,17 @@ import httpx
 import json
 import logging
 import random
+import time
 
 from app.core.config import settings
+from app.services.adaptive_concurrency import get_concurrency_limiter
+from app.services.rate_limiter import estimate_request_tokens, get_rate_limiter
+from app.services.aoai_http_pool import (
+    AOAIHttpClientPool,
+    ENDPOINT_FALLBACK,
+    ENDPOINT_PRIMARY,
+    aoai_http_pool,
+)
 
 # Use the same logger name as the parsing logs so it shows up consistently in the console.
 logger = logging.getLogger("app.services.universal_parsing_service")
@@ -37,12 +46,14 @@ class AzureOpenAIResponsesClient:
         fallback_responses_url: Optional[str] = None,
         fallback_api_key: Optional[str] = None,
         timeout_seconds: float = 600.0,
+        http_pool: Optional[AOAIHttpClientPool] = None,
     ) -> None:
         self._responses_url = responses_url.rstrip("/")
         self._api_key = api_key
         self._fallback_responses_url = (fallback_responses_url or "").strip().rstrip("/") or None
         self._fallback_api_key = (fallback_api_key or "").strip() or None
         self._timeout_seconds = timeout_seconds
+        self._http_pool = http_pool or aoai_http_pool
 
     async def create_text_response(
         self,
@@ -124,9 +135,44 @@ class AzureOpenAIResponsesClient:
             pass
         return url
 
+    def _endpoint_for(self, url: str) -> str:
+        if self._fallback_responses_url and url == self._fallback_responses_url:
+            return ENDPOINT_FALLBACK
+        return ENDPOINT_PRIMARY
+
     async def _post_json(self, *, url: str, headers: dict[str, str], payload: dict[str, Any]) -> httpx.Response:
-        async with httpx.AsyncClient(timeout=self._timeout_seconds) as client:
-            return await client.post(url, headers=headers, json=payload)
+        endpoint = self._endpoint_for(url)
+        limiter = get_concurrency_limiter(endpoint)
+
+        # Budget RPM/TPM locally before dispatch (no-op unless limits are configured).
+        rate_limiter = get_rate_limiter(endpoint, str(payload.get("model") or ""))
+        estimated_tokens = estimate_request_tokens(payload) if rate_limiter.enabled else 0
+        await rate_limiter.acquire(estimated_tokens)
+
+        # Process-wide adaptive concurrency slot; the outcome feeds back into the limit.
+        async with limiter.slot():
+            started = time.perf_counter()
+            try:
+                # Shared keep-alive pool: no per-request client / TLS handshake.
+                resp = await self._http_pool.post(
+                    endpoint=endpoint,
+                    url=url,
+                    headers=headers,
+                    payload=payload,
+                    timeout=self._timeout_seconds,
+                )
+            except (httpx.TimeoutException, httpx.NetworkError) as e:
+                limiter.record_error(e)
+                raise
+            limiter.record_response(resp.status_code, resp.headers, time.perf_counter() - started)
+
+        if rate_limiter.enabled and resp.is_success:
+            try:
+                usage = _extract_usage(resp.json())
+                rate_limiter.settle(estimated_tokens, usage.input_tokens + usage.output_tokens)
+            except Exception:
+                pass
+        return resp
 
     async def _post_with_retries(
         self,
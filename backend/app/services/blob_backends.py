@@ -0,0 +1,514 @@
+"""Non-blocking Azure Blob backends for FileStorageService (STORAGE_TYPE=azure).
+
+The storage methods used to be ``async def`` wrappers around the synchronous
+``BlobServiceClient``, so every upload/download blocked the event loop for its whole
+duration. All backends here are awaited without blocking the loop and share one client
+(and its connection pool) for the process lifetime:
+
+- ``thread`` (also ``auto``): the synchronous SDK with a pooled requests session, run in
+  worker threads.
+- ``aio``: ``azure.storage.blob.aio`` over one pooled aiohttp session (needs ``aiohttp``).
+  Opt-in until it has been exercised against Azurite (``UseDevelopmentStorage=true``);
+  ``auto`` will switch to it then.
+- ``fake``: a filesystem stand-in with blob semantics (containers, overwrite, prefix
+  listing, not-found, staged blocks) for offline development and tests; no connection
+  string needed.
+
+``upload_stream`` takes an async iterator of chunks: a single chunk is a plain upload,
+otherwise each chunk is staged as a block (up to AZURE_STORAGE_TRANSFER_CONCURRENCY in
+flight) and the block list is committed at the end, so the whole blob is never buffered.
+If the iterator raises, nothing is committed (Azure discards uncommitted blocks).
+
+Started/closed by the FastAPI lifespan; created lazily on first use otherwise.
+"""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import asyncio
+import base64
+import logging
+import shutil
+import time
+from pathlib import Path
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _aiohttp_available() -> bool:
+    try:
+        import aiohttp  # noqa: F401
+    except Exception:
+        return False
+    return True
+
+
+class BlobBackend(ABC):
+    """Async blob operations; missing blobs raise FileNotFoundError on download."""
+
+    name = "base"
+
+    def __init__(self) -> None:
+        self.max_connections = max(1, int(getattr(settings, "AZURE_STORAGE_MAX_CONNECTIONS", 32) or 32))
+        self.max_concurrency = max(1, int(getattr(settings, "AZURE_STORAGE_TRANSFER_CONCURRENCY", 4) or 4))
+        self.uploads = 0
+        self.block_uploads = 0
+        self.downloads = 0
+        self.deletes = 0
+        self.errors = 0
+        self.bytes_uploaded = 0
+        self.bytes_downloaded = 0
+        self.transfer_seconds = 0.0
+
+    async def close(self) -> None:
+        return None
+
+    @abstractmethod
+    async def ensure_containers(self, containers: List[str]) -> None: ...
+
+    @abstractmethod
+    async def _upload(self, container: str, blob_name: str, data: bytes, content_type: Optional[str]) -> str: ...
+
+    @abstractmethod
+    async def _download(self, container: str, blob_name: str) -> bytes: ...
+
+    @abstractmethod
+    async def _delete(self, container: str, blob_name: str) -> bool: ...
+
+    @abstractmethod
+    async def list(self, container: str, prefix: str = "") -> List[str]: ...
+
+    @abstractmethod
+    async def _stage_block(self, container: str, blob_name: str, block_id: str, data: bytes) -> None: ...
+
+    @abstractmethod
+    async def _commit_blocks(
+        self, container: str, blob_name: str, block_ids: List[str], content_type: Optional[str]
+    ) -> str: ...
+
+    async def _upload_chunks(
+        self, container: str, blob_name: str, chunks: AsyncIterator[bytes], content_type: Optional[str]
+    ) -> tuple[int, str]:
+        """Stage every chunk as a block, then commit; returns (total size, blob URL)."""
+        block_ids: List[str] = []
+        pending: set[asyncio.Task] = set()
+        size = 0
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                block_id = base64.b64encode(f"{len(block_ids):08d}".encode()).decode()
+                block_ids.append(block_id)
+                size += len(chunk)
+                pending.add(asyncio.create_task(self._stage_block(container, blob_name, block_id, chunk)))
+                if len(pending) >= self.max_concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        task.result()
+            if pending:
+                await asyncio.gather(*pending)
+                pending = set()
+        finally:
+            for task in pending:
+                task.cancel()
+        url = await self._commit_blocks(container, blob_name, block_ids, content_type)
+        return size, url
+
+    async def upload_stream(
+        self,
+        container: str,
+        blob_name: str,
+        chunks: AsyncIterator[bytes],
+        content_type: Optional[str] = None,
+    ) -> str:
+        iterator = chunks.__aiter__()
+        first = await anext(iterator, b"")
+        second = await anext(iterator, None)
+        if second is None:
+            return await self.upload(container, blob_name, first, content_type)
+
+        async def _all() -> AsyncIterator[bytes]:
+            yield first
+            yield second
+            async for chunk in iterator:
+                yield chunk
+
+        started = time.perf_counter()
+        try:
+            size, url = await self._upload_chunks(container, blob_name, _all(), content_type)
+        except Exception:
+            self.errors += 1
+            raise
+        self.uploads += 1
+        self.block_uploads += 1
+        self.bytes_uploaded += size
+        self.transfer_seconds += time.perf_counter() - started
+        return url
+
+    async def upload(self, container: str, blob_name: str, data: bytes, content_type: Optional[str] = None) -> str:
+        started = time.perf_counter()
+        try:
+            url = await self._upload(container, blob_name, data, content_type)
+        except Exception:
+            self.errors += 1
+            raise
+        self.uploads += 1
+        self.bytes_uploaded += len(data)
+        self.transfer_seconds += time.perf_counter() - started
+        return url
+
+    async def download(self, container: str, blob_name: str) -> bytes:
+        started = time.perf_counter()
+        try:
+            data = await self._download(container, blob_name)
+        except FileNotFoundError:
+            raise
+        except Exception:
+            self.errors += 1
+            raise
+        self.downloads += 1
+        self.bytes_downloaded += len(data)
+        self.transfer_seconds += time.perf_counter() - started
+        return data
+
+    async def delete(self, container: str, blob_name: str) -> bool:
+        try:
+            deleted = await self._delete(container, blob_name)
+        except Exception:
+            self.errors += 1
+            raise
+        self.deletes += 1
+        return deleted
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "max_connections": self.max_connections,
+            "transfer_concurrency": self.max_concurrency,
+            "uploads": self.uploads,
+            "block_uploads": self.block_uploads,
+            "downloads": self.downloads,
+            "deletes": self.deletes,
+            "errors": self.errors,
+            "bytes_uploaded": self.bytes_uploaded,
+            "bytes_downloaded": self.bytes_downloaded,
+            "transfer_seconds": round(self.transfer_seconds, 3),
+        }
+
+
+class AioAzureBlobBackend(BlobBackend):
+    name = "aio"
+
+    def __init__(self, connection_string: str) -> None:
+        super().__init__()
+        self._connection_string = connection_string
+        self._client = None
+        self._session = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def _get_client(self):
+        if self._client is not None:
+            return self._client
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._client is None:
+                import aiohttp
+                from azure.core.pipeline.transport import AioHttpTransport
+                from azure.storage.blob.aio import BlobServiceClient
+
+                self._session = aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=30)
+                )
+                self._client = BlobServiceClient.from_connection_string(
+                    self._connection_string,
+                    transport=AioHttpTransport(session=self._session, session_owner=False),
+                )
+        return self._client
+
+    async def close(self) -> None:
+        client, session = self._client, self._session
+        self._client = self._session = None
+        if client is not None:
+            await client.close()
+        if session is not None:
+            await session.close()
+
+    async def ensure_containers(self, containers: List[str]) -> None:
+        from azure.core.exceptions import ResourceExistsError
+
+        client = await self._get_client()
+        for container in containers:
+            try:
+                await client.get_container_client(container).create_container()
+                logger.info("created blob container %s", container)
+            except ResourceExistsError:
+                pass
+            except Exception as e:
+                logger.warning("blob container %s check failed: %s", container, e)
+
+    async def _upload(self, container: str, blob_name: str, data: bytes, content_type: Optional[str]) -> str:
+        from azure.storage.blob import ContentSettings
+
+        client = await self._get_client()
+        blob_client = client.get_blob_client(container=container, blob=blob_name)
+        await blob_client.upload_blob(
+            data,
+            overwrite=True,
+            content_settings=ContentSettings(content_type=content_type) if content_type else None,
+            max_concurrency=self.max_concurrency,
+        )
+        return blob_client.url
+
+    async def _stage_block(self, container: str, blob_name: str, block_id: str, data: bytes) -> None:
+        client = await self._get_client()
+        await client.get_blob_client(container=container, blob=blob_name).stage_block(block_id, data, length=len(data))
+
+    async def _commit_blocks(
+        self, container: str, blob_name: str, block_ids: List[str], content_type: Optional[str]
+    ) -> str:
+        from azure.storage.blob import BlobBlock, ContentSettings
+
+        client = await self._get_client()
+        blob_client = client.get_blob_client(container=container, blob=blob_name)
+        await blob_client.commit_block_list(
+            [BlobBlock(block_id=block_id) for block_id in block_ids],
+            content_settings=ContentSettings(content_type=content_type) if content_type else None,
+        )
+        return blob_client.url
+
+    async def _download(self, container: str, blob_name: str) -> bytes:
+        from azure.core.exceptions import ResourceNotFoundError
+
+        client = await self._get_client()
+        blob_client = client.get_blob_client(container=container, blob=blob_name)
+        try:
+            downloader = await blob_client.download_blob(max_concurrency=self.max_concurrency)
+            return await downloader.readall()
+        except ResourceNotFoundError:
+            raise FileNotFoundError(f"文件不存在: {blob_name}")
+
+    async def _delete(self, container: str, blob_name: str) -> bool:
+        from azure.core.exceptions import ResourceNotFoundError
+
+        client = await self._get_client()
+        try:
+            await client.get_blob_client(container=container, blob=blob_name).delete_blob()
+            return True
+        except ResourceNotFoundError:
+            return False
+
+    async def list(self, container: str, prefix: str = "") -> List[str]:
+        client = await self._get_client()
+        container_client = client.get_container_client(container)
+        return [blob.name async for blob in container_client.list_blobs(name_starts_with=prefix or None)]
+
+
+class ThreadedAzureBlobBackend(BlobBackend):
+    """Synchronous SDK in worker threads; one client and requests connection pool."""
+
+    name = "thread"
+
+    def __init__(self, connection_string: str) -> None:
+        super().__init__()
+        import requests
+        from azure.core.pipeline.transport import RequestsTransport
+        from azure.storage.blob import BlobServiceClient
+
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=self.max_connections)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        self._session = session
+        self._client = BlobServiceClient.from_connection_string(
+            connection_string, transport=RequestsTransport(session=session, session_owner=False)
+        )
+
+    async def close(self) -> None:
+        await asyncio.to_thread(self._client.close)
+        self._session.close()
+
+    async def ensure_containers(self, containers: List[str]) -> None:
+        from azure.core.exceptions import ResourceExistsError
+
+        def _ensure() -> None:
+            for container in containers:
+                try:
+                    self._client.get_container_client(container).create_container()
+                    logger.info("created blob container %s", container)
+                except ResourceExistsError:
+                    pass
+                except Exception as e:
+                    logger.warning("blob container %s check failed: %s", container, e)
+
+        await asyncio.to_thread(_ensure)
+
+    async def _upload(self, container: str, blob_name: str, data: bytes, content_type: Optional[str]) -> str:
+        from azure.storage.blob import ContentSettings
+
+        blob_client = self._client.get_blob_client(container=container, blob=blob_name)
+        await asyncio.to_thread(
+            blob_client.upload_blob,
+            data,
+            overwrite=True,
+            content_settings=ContentSettings(content_type=content_type) if content_type else None,
+            max_concurrency=self.max_concurrency,
+        )
+        return blob_client.url
+
+    async def _stage_block(self, container: str, blob_name: str, block_id: str, data: bytes) -> None:
+        blob_client = self._client.get_blob_client(container=container, blob=blob_name)
+        await asyncio.to_thread(blob_client.stage_block, block_id, data, length=len(data))
+
+    async def _commit_blocks(
+        self, container: str, blob_name: str, block_ids: List[str], content_type: Optional[str]
+    ) -> str:
+        from azure.storage.blob import BlobBlock, ContentSettings
+
+        blob_client = self._client.get_blob_client(container=container, blob=blob_name)
+        await asyncio.to_thread(
+            blob_client.commit_block_list,
+            [BlobBlock(block_id=block_id) for block_id in block_ids],
+            content_settings=ContentSettings(content_type=content_type) if content_type else None,
+        )
+        return blob_client.url
+
+    async def _download(self, container: str, blob_name: str) -> bytes:
+        from azure.core.exceptions import ResourceNotFoundError
+
+        blob_client = self._client.get_blob_client(container=container, blob=blob_name)
+
+        def _read() -> bytes:
+            return blob_client.download_blob(max_concurrency=self.max_concurrency).readall()
+
+        try:
+            return await asyncio.to_thread(_read)
+        except ResourceNotFoundError:
+            raise FileNotFoundError(f"文件不存在: {blob_name}")
+
+    async def _delete(self, container: str, blob_name: str) -> bool:
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            await asyncio.to_thread(self._client.get_blob_client(container=container, blob=blob_name).delete_blob)
+            return True
+        except ResourceNotFoundError:
+            return False
+
+    async def list(self, container: str, prefix: str = "") -> List[str]:
+        container_client = self._client.get_container_client(container)
+        return await asyncio.to_thread(
+            lambda: [blob.name for blob in container_client.list_blobs(name_starts_with=prefix or None)]
+        )
+
+
+class FakeBlobBackend(BlobBackend):
+    """Filesystem stand-in: <AZURE_STORAGE_FAKE_DIR>/<container>/<blob name>.
+
+    Staged blocks live under ``<root>/.blocks`` until committed, like Azure's uncommitted
+    block list, so streamed uploads go through the same staging path as the real backends.
+    """
+
+    name = "fake"
+
+    def __init__(self, root: str) -> None:
+        super().__init__()
+        self.root = Path(root).resolve()
+
+    def _path(self, container: str, blob_name: str) -> Path:
+        path = (self.root / container / blob_name).resolve()
+        if self.root / container not in path.parents:
+            raise ValueError(f"非法的 blob 名称: {blob_name}")
+        return path
+
+    async def ensure_containers(self, containers: List[str]) -> None:
+        for container in containers:
+            (self.root / container).mkdir(parents=True, exist_ok=True)
+
+    async def _upload(self, container: str, blob_name: str, data: bytes, content_type: Optional[str]) -> str:
+        path = self._path(container, blob_name)
+
+        def _write() -> None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(path.name + ".partial")
+            tmp.write_bytes(data)
+            tmp.replace(path)
+
+        await asyncio.to_thread(_write)
+        return path.as_uri()
+
+    def _staging_dir(self, container: str, blob_name: str) -> Path:
+        self._path(container, blob_name)  # validates the name
+        return self.root / ".blocks" / container / blob_name.encode("utf-8").hex()
+
+    async def _stage_block(self, container: str, blob_name: str, block_id: str, data: bytes) -> None:
+        staging = self._staging_dir(container, blob_name)
+
+        def _write() -> None:
+            staging.mkdir(parents=True, exist_ok=True)
+            (staging / block_id.encode("ascii").hex()).write_bytes(data)
+
+        await asyncio.to_thread(_write)
+
+    async def _commit_blocks(
+        self, container: str, blob_name: str, block_ids: List[str], content_type: Optional[str]
+    ) -> str:
+        path = self._path(container, blob_name)
+        staging = self._staging_dir(container, blob_name)
+
+        def _commit() -> None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(path.name + ".partial")
+            with open(tmp, "wb") as handle:
+                for block_id in block_ids:
+                    handle.write((staging / block_id.encode("ascii").hex()).read_bytes())
+            tmp.replace(path)
+            shutil.rmtree(staging, ignore_errors=True)
+
+        await asyncio.to_thread(_commit)
+        return path.as_uri()
+
+    async def _download(self, container: str, blob_name: str) -> bytes:
+        path = self._path(container, blob_name)
+        try:
+            return await asyncio.to_thread(path.read_bytes)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"文件不存在: {blob_name}")
+
+    async def _delete(self, container: str, blob_name: str) -> bool:
+        path = self._path(container, blob_name)
+        try:
+            await asyncio.to_thread(path.unlink)
+            return True
+        except FileNotFoundError:
+            return False
+
+    async def list(self, container: str, prefix: str = "") -> List[str]:
+        base = self.root / container
+
+        def _scan() -> List[str]:
+            if not base.exists():
+                return []
+            names = (p.relative_to(base).as_posix() for p in base.rglob("*") if p.is_file())
+            return sorted(n for n in names if n.startswith(prefix or "") and not n.endswith(".partial"))
+
+        return await asyncio.to_thread(_scan)
+
+
+def create_blob_backend() -> BlobBackend:
+    kind = str(getattr(settings, "AZURE_STORAGE_BACKEND", "auto") or "auto").lower()
+    if kind == "fake":
+        return FakeBlobBackend(getattr(settings, "AZURE_STORAGE_FAKE_DIR", "data/fake_blob") or "data/fake_blob")
+
+    connection_string = settings.AZURE_STORAGE_CONNECTION_STRING
+    if not connection_string:
+        raise ValueError("Azure Storage 连接字符串未配置")
+    if kind == "aio":
+        if _aiohttp_available():
+            return AioAzureBlobBackend(connection_string)
+        logger.warning("AZURE_STORAGE_BACKEND=aio but aiohttp is not installed; Azure Blob I/O runs in worker threads.")
+    return ThreadedAzureBlobBackend(connection_string)
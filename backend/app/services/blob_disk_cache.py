@@ -0,0 +1,255 @@
+"""Size-bounded local disk cache in front of Azure Blob reads (STORAGE_TYPE=azure).
+
+``/files/parse/preview`` and ``/files/parse/confirm`` read the upload back from Azure on
+every call, even right after it was uploaded through the same replica. FileStorageService
+now reads through this cache and fills it on upload:
+
+- one file per blob under BLOB_DISK_CACHE_DIR, named ``<sha256(container/blob)>.<content
+  sha256>``, written to a temp file and renamed into place;
+- every hit re-hashes the bytes and compares them with the name, so a corrupt or truncated
+  file is dropped and re-downloaded instead of served;
+- LRU by last access (kept in memory, rebuilt from file mtimes on startup) and evicted once
+  the total exceeds BLOB_DISK_CACHE_MAX_BYTES; 0 disables the cache;
+- deletes and overwrites through FileStorageService drop the entry.
+
+Workers on the same machine may share the directory: a file evicted by another process is
+simply a miss here.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Entry:
+    path: Path
+    size: int
+    sha256: str
+
+
+class BlobCacheWriter:
+    """Copies an upload's chunks into the cache; ``commit`` only after the blob is stored."""
+
+    def __init__(self, cache: "BlobDiskCache", key: str) -> None:
+        self._cache = cache
+        self._key = key
+        self._tmp = cache.root / f"{key}.{os.getpid()}.{uuid.uuid4().hex}.partial"
+        self._handle = None
+        self._digest = hashlib.sha256()
+        self._size = 0
+        self._active = cache.enabled
+
+    async def feed(self, chunk: bytes) -> None:
+        if not self._active:
+            return
+        if self._size + len(chunk) > self._cache.max_bytes:
+            self.abort()
+            return
+        try:
+            if self._handle is None:
+                await asyncio.to_thread(self._cache.root.mkdir, parents=True, exist_ok=True)
+                self._handle = await asyncio.to_thread(open, self._tmp, "wb")
+            await asyncio.to_thread(self._handle.write, chunk)
+        except OSError:
+            logger.warning("blob disk cache write failed", exc_info=True)
+            self.abort()
+            return
+        self._digest.update(chunk)
+        self._size += len(chunk)
+
+    async def commit(self) -> None:
+        if not self._active or self._handle is None:
+            return
+        try:
+            await asyncio.to_thread(self._handle.close)
+            await asyncio.to_thread(self._cache._install, self._key, self._tmp, self._size, self._digest.hexdigest())
+        except OSError:
+            logger.warning("blob disk cache write failed", exc_info=True)
+            self.abort()
+
+    def abort(self) -> None:
+        self._active = False
+        if self._handle is not None:
+            self._handle.close()
+        self._tmp.unlink(missing_ok=True)
+
+
+class BlobDiskCache:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.integrity_failures = 0
+
+    @property
+    def root(self) -> Path:
+        return Path(getattr(settings, "BLOB_DISK_CACHE_DIR", "data/blob_cache") or "data/blob_cache")
+
+    @property
+    def max_bytes(self) -> int:
+        return int(getattr(settings, "BLOB_DISK_CACHE_MAX_BYTES", 512 * 1024 * 1024) or 0)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def make_key(container: str, blob_name: str) -> str:
+        return hashlib.sha256(f"{container}/{blob_name}".encode("utf-8")).hexdigest()
+
+    async def start(self) -> None:
+        if self.enabled:
+            await asyncio.to_thread(self._load)
+
+    def _load(self) -> None:
+        """Rebuild the index from disk (oldest mtime first) and drop leftovers/overflow."""
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            self.root.mkdir(parents=True, exist_ok=True)
+            found = []
+            for path in self.root.iterdir():
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                key, _, sha256 = path.name.partition(".")
+                if len(key) != 64 or len(sha256) != 64:
+                    # temp file of an interrupted write (recent ones may belong to another worker)
+                    if time.time() - st.st_mtime > 3600:
+                        path.unlink(missing_ok=True)
+                    continue
+                found.append((st.st_mtime, key, _Entry(path, st.st_size, sha256)))
+            for _, key, entry in sorted(found, key=lambda item: item[0]):
+                self._replace(key, entry)
+            self._evict()
+
+    async def get(self, container: str, blob_name: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        if not self._loaded:
+            await asyncio.to_thread(self._load)
+
+        key = self.make_key(container, blob_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        def _read() -> tuple[Optional[bytes], bool]:
+            try:
+                data = entry.path.read_bytes()
+            except OSError:
+                return None, False
+            if hashlib.sha256(data).hexdigest() != entry.sha256:
+                return data, False
+            try:
+                os.utime(entry.path)
+            except OSError:
+                pass
+            return data, True
+
+        data, intact = await asyncio.to_thread(_read)
+        if intact:
+            self.hits += 1
+            return data
+
+        if data is not None:
+            self.integrity_failures += 1
+            logger.warning("blob disk cache integrity check failed for %s/%s", container, blob_name)
+        self._drop(key, entry)
+        self.misses += 1
+        return None
+
+    async def put(self, container: str, blob_name: str, data: bytes) -> None:
+        writer = self.writer(container, blob_name)
+        await writer.feed(data)
+        await writer.commit()
+
+    def writer(self, container: str, blob_name: str) -> BlobCacheWriter:
+        return BlobCacheWriter(self, self.make_key(container, blob_name))
+
+    async def invalidate(self, container: str, blob_name: str) -> None:
+        key = self.make_key(container, blob_name)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            await asyncio.to_thread(self._drop, key, entry)
+
+    def _install(self, key: str, tmp: Path, size: int, sha256: str) -> None:
+        path = self.root / f"{key}.{sha256}"
+        tmp.replace(path)
+        with self._lock:
+            old = self._entries.get(key)
+            if old is not None and old.path != path:
+                old.path.unlink(missing_ok=True)
+            self._replace(key, _Entry(path, size, sha256))
+            self.stores += 1
+            self._evict()
+
+    def _replace(self, key: str, entry: _Entry) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.size
+        self._entries[key] = entry
+        self._bytes += entry.size
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            entry.path.unlink(missing_ok=True)
+            self.evictions += 1
+
+    def _drop(self, key: str, entry: _Entry) -> None:
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+                self._bytes -= entry.size
+        entry.path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries, size = len(self._entries), self._bytes
+        return {
+            "enabled": self.enabled,
+            "max_bytes": self.max_bytes,
+            "bytes": size,
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "integrity_failures": self.integrity_failures,
+        }
+
+
+# 全局实例
+blob_disk_cache = BlobDiskCache()
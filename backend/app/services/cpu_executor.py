@@ -0,0 +1,191 @@
+"""Bounded executor for CPU-bound work (file parsing, export generation, chart rendering).
+
+Handlers are ``async def``; running pandas/openpyxl/matplotlib work inline blocks the event
+loop, so one heavy workbook would stall every other request on the worker (incl. /health).
+``cpu_executor.run(fn, *args)`` dispatches ``fn`` to a ``ProcessPoolExecutor`` and awaits it.
+
+- Functions and arguments must be picklable (module-level functions, plain data).
+- If the process pool cannot be created, breaks, or an argument cannot be pickled, the
+  call falls back to a thread pool (still off the event loop).
+- Each call has a timeout (CPU_TASK_TIMEOUT_SECONDS); a timed-out task is abandoned,
+  the caller gets ``CPUTaskTimeout``.
+
+The executor is started/closed by the FastAPI lifespan (app/main.py) and created lazily on
+first use otherwise.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Optional, TypeVar
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import pickle
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CPUTaskTimeout(Exception):
+    pass
+
+
+class CPUTaskExecutor:
+    def __init__(self) -> None:
+        self._executor: Optional[Executor] = None
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._kind: Optional[str] = None
+        self._workers = 0
+
+        self._in_flight = 0
+        self._max_queue_depth = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._timeouts = 0
+        self._fallbacks = 0
+        self._busy_seconds = 0.0
+
+    @staticmethod
+    def _configured_workers() -> int:
+        workers = int(getattr(settings, "CPU_POOL_MAX_WORKERS", 0) or 0)
+        if workers <= 0:
+            workers = min(4, os.cpu_count() or 1)
+        return max(1, workers)
+
+    def start(self) -> None:
+        if self._executor is not None:
+            return
+
+        self._workers = self._configured_workers()
+        kind = str(getattr(settings, "CPU_POOL_KIND", "process") or "process").lower()
+        if kind == "process":
+            try:
+                method = str(getattr(settings, "CPU_POOL_START_METHOD", "spawn") or "spawn")
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self._workers,
+                    mp_context=multiprocessing.get_context(method),
+                )
+                self._kind = "process"
+                return
+            except Exception:
+                logger.warning("CPU process pool unavailable; falling back to threads", exc_info=True)
+
+        self._executor = self._thread_pool()
+        self._kind = "thread"
+
+    def _thread_pool(self) -> ThreadPoolExecutor:
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(
+                max_workers=self._workers or self._configured_workers(),
+                thread_name_prefix="cpu-task",
+            )
+        return self._threads
+
+    def shutdown(self) -> None:
+        executor, threads = self._executor, self._threads
+        self._executor = None
+        self._threads = None
+        self._kind = None
+        for ex in {id(x): x for x in (executor, threads) if x is not None}.values():
+            try:
+                ex.shutdown(wait=False, cancel_futures=True)
+            except Exception:
+                logger.warning("CPU executor shutdown failed", exc_info=True)
+
+    async def run(self, fn: Callable[..., T], *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> T:
+        if self._executor is None:
+            self.start()
+
+        if timeout is None:
+            timeout = float(getattr(settings, "CPU_TASK_TIMEOUT_SECONDS", 120.0) or 0.0) or None
+
+        call = partial(fn, *args, **kwargs)
+        self._submitted += 1
+        self._in_flight += 1
+        self._max_queue_depth = max(self._max_queue_depth, self.queue_depth)
+        started = time.monotonic()
+        try:
+            try:
+                result = await self._submit(self._executor, call, timeout)
+            except (BrokenProcessPool, pickle.PicklingError, TypeError, AttributeError) as e:
+                if self._kind != "process" or not self._is_dispatch_error(e):
+                    raise
+                self._fallbacks += 1
+                logger.warning("CPU task %s could not run in the process pool (%s); using a thread", _name(fn), e)
+                if isinstance(e, BrokenProcessPool):
+                    self._restart_process_pool()
+                result = await self._submit(self._thread_pool(), call, timeout)
+            self._completed += 1
+            return result
+        except CPUTaskTimeout:
+            self._timeouts += 1
+            raise
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            self._in_flight -= 1
+            self._busy_seconds += time.monotonic() - started
+
+    async def _submit(self, executor: Executor, call: Callable[[], T], timeout: Optional[float]) -> T:
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(executor, call)
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            raise CPUTaskTimeout(f"CPU task timed out after {timeout:g}s")
+
+    @staticmethod
+    def _is_dispatch_error(e: BaseException) -> bool:
+        if isinstance(e, (BrokenProcessPool, pickle.PicklingError)):
+            return True
+        # Unpicklable arguments surface as TypeError/AttributeError mentioning pickle.
+        return "pickle" in str(e).lower()
+
+    def _restart_process_pool(self) -> None:
+        broken = self._executor
+        self._executor = None
+        self._kind = None
+        if broken is not None and broken is not self._threads:
+            try:
+                broken.shutdown(wait=False, cancel_futures=True)
+            except Exception:
+                pass
+        self.start()
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self._in_flight - (self._workers or self._configured_workers()))
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "kind": self._kind,
+            "workers": self._workers,
+            "in_flight": self._in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self._max_queue_depth,
+            "submitted": self._submitted,
+            "completed": self._completed,
+            "failed": self._failed,
+            "timeouts": self._timeouts,
+            "fallbacks": self._fallbacks,
+            "busy_seconds": round(self._busy_seconds, 3),
+        }
+
+
+def _name(fn: Callable[..., Any]) -> str:
+    return getattr(fn, "__qualname__", None) or getattr(fn, "__name__", None) or repr(fn)
+
+
+# 全局实例
+cpu_executor = CPUTaskExecutor()
@@ -0,0 +1,159 @@
+"""Shared get/put/evict/stats for the key-value caches stored in database tables.
+
+``AnalysisResultCache`` and ``ParseResultCache`` both keep one row per sha256 ``cache_key``
+with ``hit_count`` / ``last_accessed_at`` (and optionally ``expires_at``). ``DBCache``
+owns the session handling, hit/miss accounting, TTL expiry and LRU eviction (oldest
+``last_accessed_at`` first, swept every EVICT_EVERY_N_PUTS writes once the table exceeds
+its max entries); subclasses only build keys and map their payload to and from columns.
+
+Cache problems never fail the caller: errors are logged, counted and treated as a miss.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Optional, TypeVar
+
+import logging
+
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.time import ensure_utc_aware, utcnow
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class DBCache:
+    # ORM entity with cache_key (PK), hit_count, last_accessed_at and optionally expires_at.
+    entry_model: Any = None
+    # Used in log messages ("<name> lookup failed").
+    name = "cache"
+    enabled_setting = ""
+    max_entries_setting = ""
+    default_max_entries = 0
+    # Run the (relatively expensive) eviction sweep every N writes rather than on each one.
+    EVICT_EVERY_N_PUTS = 100
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.errors = 0
+        self._puts_since_evict = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(getattr(settings, self.enabled_setting, True))
+
+    @property
+    def max_entries(self) -> int:
+        return int(getattr(settings, self.max_entries_setting, self.default_max_entries) or 0)
+
+    def _get(self, key: str, load: Callable[[Any], T]) -> Optional[T]:
+        """Look up ``key`` and return ``load(entry)``; None on miss, expiry or error."""
+        if not self.enabled:
+            return None
+
+        model = self.entry_model
+        db = SessionLocal()
+        try:
+            entry = db.query(model).filter(model.cache_key == key).first()
+            if entry is None:
+                self.misses += 1
+                return None
+
+            now = utcnow()
+            expires_at = ensure_utc_aware(getattr(entry, "expires_at", None))
+            if expires_at and expires_at <= now:
+                db.delete(entry)
+                db.commit()
+                self.misses += 1
+                return None
+
+            value = load(entry)
+            entry.hit_count = int(entry.hit_count or 0) + 1
+            entry.last_accessed_at = now
+            db.commit()
+            self.hits += 1
+            return value
+        except Exception:
+            db.rollback()
+            self.errors += 1
+            self.misses += 1
+            logger.warning("%s lookup failed", self.name, exc_info=True)
+            return None
+        finally:
+            db.close()
+
+    def _put(self, key: str, fill: Callable[[Any], None]) -> None:
+        """Insert or overwrite ``key``; ``fill(entry)`` sets the payload columns."""
+        if not self.enabled:
+            return
+
+        model = self.entry_model
+        db = SessionLocal()
+        try:
+            entry = db.query(model).filter(model.cache_key == key).first()
+            if entry is None:
+                entry = model(cache_key=key, hit_count=0)
+                db.add(entry)
+            fill(entry)
+            entry.last_accessed_at = utcnow()
+            db.commit()
+            self.stores += 1
+
+            self._puts_since_evict += 1
+            if self._puts_since_evict >= self.EVICT_EVERY_N_PUTS:
+                self._puts_since_evict = 0
+                self._evict(db)
+        except IntegrityError:
+            # Stored concurrently by another request with the same key.
+            db.rollback()
+        except Exception:
+            db.rollback()
+            self.errors += 1
+            logger.warning("%s store failed", self.name, exc_info=True)
+        finally:
+            db.close()
+
+    def _evict(self, db) -> None:
+        model = self.entry_model
+        removed = 0
+        if hasattr(model, "expires_at"):
+            removed += db.query(model).filter(model.expires_at <= utcnow()).delete(synchronize_session=False)
+
+        max_entries = self.max_entries
+        if max_entries > 0:
+            overflow = db.query(model).count() - max_entries
+            if overflow > 0:
+                # LRU: drop the least recently accessed entries.
+                stale_keys = [
+                    k
+                    for (k,) in db.query(model.cache_key)
+                    .order_by(model.last_accessed_at.asc())
+                    .limit(overflow)
+                    .all()
+                ]
+                if stale_keys:
+                    removed += db.query(model).filter(model.cache_key.in_(stale_keys)).delete(
+                        synchronize_session=False
+                    )
+
+        db.commit()
+        self.evictions += int(removed or 0)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "errors": self.errors,
+        }
@@ -0,0 +1,166 @@
+"""Single-pass xlsx workbook for one parsing preview or full parse.
+
+``pd.read_excel`` unzips and XML-parses the workbook on every call, and the preview and
+full parse read the same sheet several times (header probing, per-sheet samples).
+``ParsedWorkbook`` opens the workbook once and materializes each sheet's cell grid
+lazily, on first access; frames are then built from the cached grid with the same
+TextParser settings ``pd.read_excel`` uses, so results are identical.
+
+``/upload`` previews and fully parses the same bytes in two executor tasks (the mapping is
+inferred in between, on the event loop). Handles cannot cross worker processes, but the
+decoded cells can: ``decoded()`` exports the grids materialized by the preview and a
+``ParsedWorkbook`` built with ``decoded=`` starts from them, opening the xlsx again only
+for a sheet the preview never touched.
+
+In ``streaming`` mode (very large uploads) sheets are never materialized: callers iterate
+rows straight off openpyxl's read-only reader and a preview only decodes the rows it needs.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Iterator, Optional, Sequence, Union
+
+import io
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+from pandas.io.parsers import TextParser
+
+
+def _convert_cell(cell: Any) -> Any:
+    # Same conversion as pandas' openpyxl reader (ints stay ints, errors become NaN).
+    value = cell.value
+    if value is None:
+        return ""
+    if cell.data_type == TYPE_ERROR:
+        return np.nan
+    if cell.data_type == TYPE_NUMERIC:
+        as_int = int(value)
+        if as_int == value:
+            return as_int
+        return float(value)
+    return value
+
+
+def rows_to_frame(rows: Sequence[list[Any]], *, header: Optional[int] = 0, nrows: Optional[int] = None) -> pd.DataFrame:
+    """Build a DataFrame from converted cell rows the way ``pd.read_excel`` does."""
+    if nrows is not None:
+        rows = rows[: (header or 0) + 1 + nrows]
+
+    # Trailing empty rows are dropped and short rows padded, exactly like pandas does
+    # for the rows it read.
+    last = len(rows)
+    while last and not rows[last - 1]:
+        last -= 1
+    if not last:
+        return pd.DataFrame()
+    width = max(len(r) for r in rows[:last])
+    # Copy rows: TextParser may consume them, and a cached grid must stay intact.
+    data = [list(r) + [""] * (width - len(r)) for r in rows[:last]]
+
+    if header is not None and header > len(data) - 1:
+        raise ValueError(f"header index {header} exceeds maximum index {len(data) - 1} of data.")
+
+    parser = TextParser(data, header=header, nrows=nrows, skip_blank_lines=False)
+    try:
+        return parser.read(nrows=nrows)
+    finally:
+        parser.close()
+
+
+@dataclass(frozen=True)
+class DecodedSheets:
+    """Sheet names and the cell grids materialized so far (picklable)."""
+
+    sheet_names: tuple[str, ...]
+    grids: dict[str, list[list[Any]]]
+
+
+class ParsedWorkbook:
+    def __init__(
+        self, stream: io.BytesIO, *, streaming: bool = False, decoded: Optional[DecodedSheets] = None
+    ) -> None:
+        self._stream = stream
+        self._handle: Any = None
+        self.streaming = streaming
+        self._grids: dict[str, list[list[Any]]] = {}
+        if decoded is not None:
+            self.sheet_names: list[str] = list(decoded.sheet_names)
+            self._grids.update(decoded.grids)
+        else:
+            self.sheet_names = list(self._book.sheetnames)
+
+    @property
+    def _book(self) -> Any:
+        # Opened on first use: a workbook seeded with decoded grids may never need it.
+        if self._handle is None:
+            self._handle = load_workbook(self._stream, read_only=True, data_only=True, keep_links=False)
+        return self._handle
+
+    def decoded(self) -> DecodedSheets:
+        """The grids materialized so far, to continue in another process without re-decoding."""
+        return DecodedSheets(sheet_names=tuple(self.sheet_names), grids=dict(self._grids))
+
+    def resolve_sheet_name(self, sheet: Union[str, int, None]) -> str:
+        if sheet is None or sheet == "":
+            sheet = 0
+        if isinstance(sheet, int):
+            if not (0 <= sheet < len(self.sheet_names)):
+                raise ValueError(f"Worksheet index {sheet} is invalid, {len(self.sheet_names)} worksheets found")
+            return self.sheet_names[sheet]
+        if sheet not in self.sheet_names:
+            raise ValueError(f"Worksheet named '{sheet}' not found")
+        return str(sheet)
+
+    def iter_rows(self, sheet: Union[str, int, None] = 0) -> Iterator[list[Any]]:
+        """Converted cell rows (trailing empty cells trimmed), without caching the sheet."""
+        name = self.resolve_sheet_name(sheet)
+        cached = self._grids.get(name)
+        if cached is not None:
+            yield from cached
+            return
+
+        ws = self._book[name]
+        ws.reset_dimensions()
+        for row in ws.rows:
+            converted = [_convert_cell(cell) for cell in row]
+            while converted and converted[-1] == "":
+                converted.pop()
+            yield converted
+
+    def grid(self, sheet: Union[str, int, None] = 0) -> list[list[Any]]:
+        """All cell rows of a sheet; decoded from XML only once."""
+        name = self.resolve_sheet_name(sheet)
+        cached = self._grids.get(name)
+        if cached is None:
+            cached = list(self.iter_rows(name))
+            self._grids[name] = cached
+        return cached
+
+    def frame(
+        self,
+        sheet: Union[str, int, None] = 0,
+        *,
+        header: Optional[int] = 0,
+        nrows: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """Equivalent of ``pd.read_excel(sheet_name=sheet, header=header, nrows=nrows)``."""
+        if self.streaming and nrows is not None:
+            # Only decode the rows the caller asked for.
+            rows = list(islice(self.iter_rows(sheet), (header or 0) + 1 + nrows))
+        else:
+            rows = self.grid(sheet)
+        return rows_to_frame(rows, header=header, nrows=nrows)
+
+    def close(self) -> None:
+        if self._handle is not None:
+            try:
+                self._handle.close()
+            except Exception:
+                pass
+            self._handle = None
+        self._grids.clear()
@@ -1,18 +1,46 @@
 """
 文件存储服务 - 支持本地文件系统和 Azure Blob Storage
+
+Azure 模式下的读写通过 app.services.blob_backends 的异步后端完成（aio / 线程池 / 本地 fake），
+进程内共享一个客户端与连接池，不再在事件循环里同步调用 SDK。
+
+上传走 save_stream：按 UPLOAD_CHUNK_SIZE_BYTES 分块读取，边读边计算大小和 SHA-256，
+本地写入临时文件后改名、Azure 按块并行暂存后提交；超过 MAX_UPLOAD_SIZE_BYTES 立即中止。
+
+Azure 读取先查本地磁盘缓存（app.services.blob_disk_cache，LRU + 哈希校验），未命中再下载并写入缓存；
+上传时同步写入缓存，删除/覆盖时作废。
 """
 import os
 import io
-from typing import BinaryIO, Optional, List
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, BinaryIO, Dict, Optional, List, Protocol
 from pathlib import Path
 from datetime import datetime, timedelta
 
 from app.core.config import settings
+from app.core.upload_limit import too_large_message
+from app.services.blob_backends import BlobBackend, create_blob_backend
+from app.services.blob_disk_cache import blob_disk_cache
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, max_bytes: int) -> None:
+        super().__init__(too_large_message(max_bytes))
+        self.max_bytes = max_bytes
+
+
+class AsyncReader(Protocol):
+    async def read(self, size: int = -1) -> bytes: ...
 
-# 根据配置动态导入
-if settings.STORAGE_TYPE == "azure":
-    from azure.storage.blob import BlobServiceClient, BlobClient, ContainerClient, generate_blob_sas, BlobSasPermissions
-    from azure.core.exceptions import ResourceNotFoundError
+
+@dataclass
+class StoredFile:
+    """save_stream 的结果：访问路径/URL、字节数、内容 SHA-256"""
+    url: str
+    size: int
+    sha256: str
 
 
 class FileStorageService:
@@ -20,6 +48,8 @@ class FileStorageService:
     
     def __init__(self):
         self.storage_type = settings.STORAGE_TYPE
+        self._blob_backend: Optional[BlobBackend] = None
+        self._containers_ready = False
         
         if self.storage_type == "azure":
             self._init_azure_storage()
@@ -27,16 +57,25 @@ class FileStorageService:
             self._init_local_storage()
     
     def _init_azure_storage(self):
-        """初始化 Azure Blob Storage"""
-        if not settings.AZURE_STORAGE_CONNECTION_STRING:
-            raise ValueError("Azure Storage 连接字符串未配置")
-        
-        self.blob_service_client = BlobServiceClient.from_connection_string(
-            settings.AZURE_STORAGE_CONNECTION_STRING
-        )
-        
-        # 确保容器存在
-        self._ensure_containers_exist()
+        """初始化 Azure Blob Storage（只创建后端，不发起网络请求；容器在 start() 或首次使用时确认）"""
+        self._blob_backend = create_blob_backend()
+    
+    @property
+    def blob_backend(self) -> BlobBackend:
+        if self._blob_backend is None:
+            raise RuntimeError("当前不是 Azure 存储模式")
+        return self._blob_backend
+    
+    async def start(self) -> None:
+        """应用启动时调用：确保 Azure Blob 容器存在、加载本地磁盘缓存索引（本地模式无操作）"""
+        await self._ensure_containers_exist()
+        if self.storage_type == "azure":
+            await blob_disk_cache.start()
+    
+    async def aclose(self) -> None:
+        """应用关闭时调用：释放共享的 Blob 客户端与连接池"""
+        if self._blob_backend is not None:
+            await self._blob_backend.close()
     
     def _init_local_storage(self):
         """初始化本地文件存储"""
@@ -51,22 +90,16 @@ class FileStorageService:
         ]:
             Path(dir_path).mkdir(parents=True, exist_ok=True)
     
-    def _ensure_containers_exist(self):
+    async def _ensure_containers_exist(self):
         """确保 Azure Blob 容器存在"""
-        containers = [
+        if self._blob_backend is None or self._containers_ready:
+            return
+        await self._blob_backend.ensure_containers([
             settings.AZURE_STORAGE_UPLOADS_CONTAINER,
             settings.AZURE_STORAGE_EXPORTS_CONTAINER,
             settings.AZURE_STORAGE_CHARTS_CONTAINER
-        ]
-        
-        for container_name in containers:
-            try:
-                container_client = self.blob_service_client.get_container_client(container_name)
-                if not container_client.exists():
-                    container_client.create_container()
-                    print(f"✅ 创建容器: {container_name}")
-            except Exception as e:
-                print(f"⚠️ 容器 {container_name} 检查失败: {e}")
+        ])
+        self._containers_ready = True
     
     def _get_container_name(self, file_type: str) -> str:
         """根据文件类型获取容器名称"""
@@ -110,6 +143,91 @@ class FileStorageService:
         else:
             return await self._save_to_local(file_content, filename, file_type)
     
+    async def save_stream(
+        self,
+        reader: AsyncReader,
+        filename: str,
+        file_type: str = "upload",
+        content_type: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        name: Optional[str] = None,
+    ) -> StoredFile:
+        """
+        分块保存文件（不把整个文件读入内存）
+        
+        Args:
+            reader: 提供 async read(size) 的对象（如 UploadFile）
+            filename: 文件名
+            file_type: 文件类型 (upload/export/chart)
+            content_type: MIME 类型
+            max_bytes: 最大字节数，超过时抛出 UploadTooLarge（已写入部分会被丢弃）
+            name: 存储名（默认为 时间戳_文件名；内容寻址存储传入哈希名，重复写入即覆盖）
+        
+        Returns:
+            StoredFile（路径或 URL、大小、SHA-256）
+        """
+        chunk_size = max(64 * 1024, int(getattr(settings, "UPLOAD_CHUNK_SIZE_BYTES", 4 * 1024 * 1024) or 0))
+        digest = hashlib.sha256()
+        size = 0
+        
+        async def _chunks() -> AsyncIterator[bytes]:
+            nonlocal size
+            while True:
+                chunk = await reader.read(chunk_size)
+                if not chunk:
+                    return
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                digest.update(chunk)
+                yield chunk
+        
+        if name is None:
+            # 添加时间戳前缀避免重名
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            name = f"{timestamp}_{filename}"
+        
+        if self.storage_type == "azure":
+            await self._ensure_containers_exist()
+            container_name = self._get_container_name(file_type)
+            # 同时写入本地磁盘缓存：刚上传的文件随后的预览/确认解析不必再从 Azure 下载
+            cache_writer = blob_disk_cache.writer(container_name, name)
+            
+            async def _tee() -> AsyncIterator[bytes]:
+                async for chunk in _chunks():
+                    await cache_writer.feed(chunk)
+                    yield chunk
+            
+            try:
+                url = await self.blob_backend.upload_stream(container_name, name, _tee(), content_type)
+            except BaseException:
+                cache_writer.abort()
+                raise
+            await cache_writer.commit()
+        else:
+            url = await self._save_stream_to_local(_chunks(), name, file_type)
+        
+        return StoredFile(url=url, size=size, sha256=digest.hexdigest())
+    
+    async def _save_stream_to_local(self, chunks: AsyncIterator[bytes], name: str, file_type: str) -> str:
+        """分块写入本地临时文件，完成后改名（失败时删除临时文件）"""
+        file_path = Path(self._get_local_dir(file_type)) / name
+        tmp_path = file_path.with_name(file_path.name + ".partial")
+        
+        handle = await asyncio.to_thread(open, tmp_path, "wb")
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(handle.write, chunk)
+            await asyncio.to_thread(handle.close)
+            await asyncio.to_thread(tmp_path.replace, file_path)
+        except BaseException:
+            handle.close()
+            tmp_path.unlink(missing_ok=True)
+            raise
+        
+        # 返回相对路径
+        return str(file_path)
+    
     async def _save_to_azure(
         self, 
         file_content: bytes, 
@@ -124,24 +242,9 @@ class FileStorageService:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         blob_name = f"{timestamp}_{filename}"
         
-        blob_client = self.blob_service_client.get_blob_client(
-            container=container_name,
-            blob=blob_name
-        )
-        
-        # 上传文件
-        from azure.storage.blob import ContentSettings
-        
-        content_settings = ContentSettings(content_type=content_type) if content_type else None
-        
-        blob_client.upload_blob(
-            file_content,
-            overwrite=True,
-            content_settings=content_settings
-        )
-        
-        # 返回 Blob URL
-        return blob_client.url
+        await self._ensure_containers_exist()
+        await blob_disk_cache.invalidate(container_name, blob_name)
+        return await self.blob_backend.upload(container_name, blob_name, file_content, content_type)
     
     async def _save_to_local(
         self, 
@@ -182,19 +285,16 @@ class FileStorageService:
             return await self._read_from_local(file_path)
     
     async def _read_from_azure(self, blob_name: str, file_type: str) -> bytes:
-        """从 Azure Blob Storage 读取文件"""
+        """从 Azure Blob Storage 读取文件（本地磁盘缓存命中时不访问 Azure）"""
         container_name = self._get_container_name(file_type)
         
-        blob_client = self.blob_service_client.get_blob_client(
-            container=container_name,
-            blob=blob_name
-        )
+        cached = await blob_disk_cache.get(container_name, blob_name)
+        if cached is not None:
+            return cached
         
-        try:
-            downloader = blob_client.download_blob()
-            return downloader.readall()
-        except ResourceNotFoundError:
-            raise FileNotFoundError(f"文件不存在: {blob_name}")
+        data = await self.blob_backend.download(container_name, blob_name)
+        await blob_disk_cache.put(container_name, blob_name, data)
+        return data
     
     async def _read_from_local(self, file_path: str) -> bytes:
         """从本地文件系统读取文件"""
@@ -226,16 +326,8 @@ class FileStorageService:
         """从 Azure Blob Storage 删除文件"""
         container_name = self._get_container_name(file_type)
         
-        blob_client = self.blob_service_client.get_blob_client(
-            container=container_name,
-            blob=blob_name
-        )
-        
-        try:
-            blob_client.delete_blob()
-            return True
-        except ResourceNotFoundError:
-            return False
+        await blob_disk_cache.invalidate(container_name, blob_name)
+        return await self.blob_backend.delete(container_name, blob_name)
     
     async def _delete_from_local(self, file_path: str) -> bool:
         """从本地文件系统删除文件"""
@@ -266,13 +358,7 @@ class FileStorageService:
         """列出 Azure Blob Storage 中的文件"""
         container_name = self._get_container_name(file_type)
         
-        container_client = self.blob_service_client.get_container_client(container_name)
-        
-        blob_list = []
-        for blob in container_client.list_blobs(name_starts_with=prefix):
-            blob_list.append(blob.name)
-        
-        return blob_list
+        return await self.blob_backend.list(container_name, prefix)
     
     async def _list_local_files(self, file_type: str, prefix: str) -> List[str]:
         """列出本地文件系统中的文件"""
@@ -312,6 +398,12 @@ class FileStorageService:
         container_name = self._get_container_name(file_type)
         blob_name = Path(file_path).name
         
+        if self.blob_backend.name == "fake":
+            # 本地 fake 后端没有 SAS，直接返回文件 URI
+            return (Path(self.blob_backend.root) / container_name / blob_name).as_uri()
+        
+        from azure.storage.blob import generate_blob_sas, BlobSasPermissions
+        
         # 生成 SAS token
         sas_token = generate_blob_sas(
             account_name=settings.AZURE_STORAGE_ACCOUNT_NAME,
@@ -324,6 +416,12 @@ class FileStorageService:
         
         blob_url = f"{settings.AZURE_STORAGE_BLOB_ENDPOINT}{container_name}/{blob_name}?{sas_token}"
         return blob_url
+    
+    def stats(self) -> Dict[str, Any]:
+        """运行时统计（GET /api/admin/runtime）"""
+        if self._blob_backend is None:
+            return {"storage_type": self.storage_type}
+        return {"storage_type": self.storage_type, **self._blob_backend.stats()}
 
 
 # 全局实例
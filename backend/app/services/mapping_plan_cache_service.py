@@ -0,0 +1,217 @@
+"""Mapping-plan cache keyed by sheet structure fingerprint.
+
+Schools upload the same template week after week; the structure (sheet names, header row,
+column labels, column count) stays the same while the student rows change. We fingerprint
+that structure from the IR and reuse a previously *successful* mapping instead of calling
+the (high reasoning effort) parsing model again.
+
+Lookup order: the user's own entry first, then a global entry. Only xlsx is cached:
+the docx/pptx IR carries counts only, which is not a meaningful structure fingerprint.
+
+When a user overrides the mapping in /files/parse/confirm, that user's entry for the
+fingerprint is invalidated and the corrected mapping becomes their own entry (which
+lookup prefers over the global one). The shared global entry is never touched by one
+user's override; only ``invalidate(user_id=None)`` (admin maintenance) drops it.
+
+All methods open their own session and are synchronous: call them from async code
+through ``asyncio.to_thread``.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Optional
+
+import hashlib
+import json
+import logging
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.time import utcnow
+from app.models.mapping_plan_cache import MappingPlanCacheEntry
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_FILE_TYPES = {"xlsx"}
+
+
+class MappingPlanCache:
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(getattr(settings, "MAPPING_CACHE_ENABLED", True))
+
+    @property
+    def min_confidence(self) -> float:
+        return float(getattr(settings, "MAPPING_CACHE_MIN_CONFIDENCE", 0.8) or 0.0)
+
+    @staticmethod
+    def fingerprint(file_type: str, ir: dict[str, Any]) -> Optional[str]:
+        if file_type not in SUPPORTED_FILE_TYPES or not isinstance(ir, dict):
+            return None
+
+        column_stats = ir.get("column_stats") if isinstance(ir.get("column_stats"), list) else []
+        structure = {
+            "file_type": file_type,
+            "sheet_names": [str(x) for x in (ir.get("sheet_names") or [])],
+            "header_row": ir.get("suggested_header_row"),
+            "header_row_candidates": sorted(
+                int(c.get("row_index"))
+                for c in (ir.get("header_row_candidates") or [])
+                if isinstance(c, dict) and c.get("row_index") is not None
+            ),
+            "column_count": len(column_stats),
+            "column_labels": [str(c.get("label") or "") for c in column_stats if isinstance(c, dict)],
+        }
+        material = json.dumps(structure, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def lookup(self, *, fingerprint: Optional[str], user_id: Optional[int]) -> Optional[tuple[dict[str, Any], float]]:
+        if not self.enabled or not fingerprint:
+            return None
+
+        db = SessionLocal()
+        try:
+            base = db.query(MappingPlanCacheEntry).filter(
+                MappingPlanCacheEntry.fingerprint == fingerprint,
+                MappingPlanCacheEntry.invalidated_at.is_(None),
+                MappingPlanCacheEntry.confidence >= self.min_confidence,
+            )
+
+            entry = None
+            if user_id is not None:
+                entry = (
+                    base.filter(MappingPlanCacheEntry.user_id == user_id)
+                    .order_by(MappingPlanCacheEntry.id.desc())
+                    .first()
+                )
+            if entry is None:
+                entry = (
+                    base.filter(MappingPlanCacheEntry.user_id.is_(None))
+                    .order_by(MappingPlanCacheEntry.id.desc())
+                    .first()
+                )
+            if entry is None:
+                self.misses += 1
+                return None
+
+            mapping = json.loads(entry.mapping_json)
+            if not isinstance(mapping, dict) or not mapping:
+                self.misses += 1
+                return None
+
+            entry.hit_count = int(entry.hit_count or 0) + 1
+            entry.last_used_at = utcnow()
+            confidence = float(entry.confidence or 0.0)
+            db.commit()
+            self.hits += 1
+            return mapping, confidence
+        except Exception:
+            db.rollback()
+            self.misses += 1
+            logger.warning("mapping plan cache lookup failed", exc_info=True)
+            return None
+        finally:
+            db.close()
+
+    def remember(
+        self,
+        *,
+        fingerprint: Optional[str],
+        user_id: Optional[int],
+        file_type: str,
+        mapping: dict[str, Any],
+        confidence: float,
+        source: str = "ai",
+    ) -> None:
+        """Store a mapping that produced a successful parse.
+
+        AI mappings are stored for the user and globally; user overrides only for the user.
+        """
+        if not self.enabled or not fingerprint or not mapping:
+            return
+        if float(confidence or 0.0) < self.min_confidence:
+            return
+
+        owners: list[Optional[int]] = [user_id]
+        if source == "ai":
+            owners.append(None)
+
+        db = SessionLocal()
+        try:
+            mapping_json = json.dumps(mapping, ensure_ascii=False, sort_keys=True)
+            for owner in owners:
+                q = db.query(MappingPlanCacheEntry).filter(
+                    MappingPlanCacheEntry.fingerprint == fingerprint,
+                    MappingPlanCacheEntry.invalidated_at.is_(None),
+                )
+                q = q.filter(MappingPlanCacheEntry.user_id == owner) if owner is not None else q.filter(
+                    MappingPlanCacheEntry.user_id.is_(None)
+                )
+                entry = q.order_by(MappingPlanCacheEntry.id.desc()).first()
+
+                # Never let an AI guess replace the user's own correction.
+                if entry is not None and entry.source == "user" and source != "user":
+                    continue
+
+                if entry is None:
+                    entry = MappingPlanCacheEntry(fingerprint=fingerprint, user_id=owner, hit_count=0)
+                    db.add(entry)
+                entry.file_type = file_type
+                entry.mapping_json = mapping_json
+                entry.confidence = float(confidence)
+                entry.source = source
+            db.commit()
+            self.stores += 1
+        except Exception:
+            db.rollback()
+            logger.warning("mapping plan cache store failed", exc_info=True)
+        finally:
+            db.close()
+
+    def invalidate(self, *, fingerprint: Optional[str], user_id: Optional[int]) -> int:
+        """Invalidate the user's own entries for this fingerprint (the global one if user_id is None)."""
+        if not fingerprint:
+            return 0
+
+        db = SessionLocal()
+        try:
+            q = db.query(MappingPlanCacheEntry).filter(
+                MappingPlanCacheEntry.fingerprint == fingerprint,
+                MappingPlanCacheEntry.invalidated_at.is_(None),
+            )
+            if user_id is not None:
+                q = q.filter(MappingPlanCacheEntry.user_id == user_id)
+            else:
+                q = q.filter(MappingPlanCacheEntry.user_id.is_(None))
+            count = q.update({MappingPlanCacheEntry.invalidated_at: utcnow()}, synchronize_session=False)
+            db.commit()
+            self.invalidations += int(count or 0)
+            return int(count or 0)
+        except Exception:
+            db.rollback()
+            logger.warning("mapping plan cache invalidation failed", exc_info=True)
+            return 0
+        finally:
+            db.close()
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "min_confidence": self.min_confidence,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "stores": self.stores,
+            "invalidations": self.invalidations,
+        }
+
+
+# 全局实例
+mapping_plan_cache = MappingPlanCache()
@@ -0,0 +1,100 @@
+"""Cache of parse results keyed by file content, mapping and parser version.
+
+``/files/parse/confirm`` used to download the file again and re-run ``parse_full`` even when
+``/upload`` had parsed the same bytes with the same mapping minutes earlier; ``/files/parse/
+preview`` likewise re-downloaded and re-extracted the IR on every call. Entries are keyed
+by sha256 over (kind, file content SHA-256, file suffix, canonical mapping JSON,
+PARSER_VERSION), so a hit needs neither storage nor the parser:
+
+- ``full``: the ``StudentScore`` dumps for (content, mapping);
+- ``preview``: file type / IR / preview samples for the content.
+
+Payloads are stored with ``dumps_payload`` (compressed JSON) in the
+``parse_result_cache_entries`` table (``DBCache``); LRU eviction once
+PARSE_CACHE_MAX_ENTRIES is exceeded. Bump PARSER_VERSION when parser output changes.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Optional
+
+import hashlib
+import json
+
+from app.core.compression import dumps_payload, loads_payload
+from app.models.parse_result_cache import ParseResultCacheEntry
+from app.services.db_cache import DBCache
+from app.services.universal_parsing_service import PARSER_VERSION, ParsePreview
+
+
+class ParseResultCache(DBCache):
+    entry_model = ParseResultCacheEntry
+    name = "parse result cache"
+    enabled_setting = "PARSE_CACHE_ENABLED"
+    max_entries_setting = "PARSE_CACHE_MAX_ENTRIES"
+    default_max_entries = 5000
+    EVICT_EVERY_N_PUTS = 50
+
+    @staticmethod
+    def make_key(kind: str, content_sha256: str, filename: str, mapping: Optional[dict[str, Any]] = None) -> str:
+        # The parser is chosen by suffix, so the same bytes under another extension differ.
+        material = json.dumps(
+            {
+                "kind": kind,
+                "content": content_sha256,
+                "suffix": Path(filename or "").suffix.lower(),
+                "mapping": mapping,
+                "parser": PARSER_VERSION,
+            },
+            ensure_ascii=False,
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str,
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get_students(
+        self, content_sha256: str, filename: str, mapping: dict[str, Any]
+    ) -> Optional[list[dict[str, Any]]]:
+        """Cached ``StudentScore.model_dump()`` list for this content + mapping."""
+        return self._get(self.make_key("full", content_sha256, filename, mapping), self._load)
+
+    def put_students(
+        self, content_sha256: str, filename: str, mapping: dict[str, Any], students: list[dict[str, Any]]
+    ) -> None:
+        if students:
+            key = self.make_key("full", content_sha256, filename, mapping)
+            self._store(key, "full", content_sha256, students, len(students))
+
+    def get_preview(self, content_sha256: str, filename: str) -> Optional[ParsePreview]:
+        data = self._get(self.make_key("preview", content_sha256, filename), self._load)
+        if data is None:
+            return None
+        return ParsePreview(file_type=data["file_type"], ir=data["ir"], preview=data["preview"])
+
+    def put_preview(self, content_sha256: str, filename: str, preview: ParsePreview) -> None:
+        payload = {"file_type": preview.file_type, "ir": preview.ir, "preview": preview.preview}
+        self._store(self.make_key("preview", content_sha256, filename), "preview", content_sha256, payload, 0)
+
+    @staticmethod
+    def _load(entry: ParseResultCacheEntry) -> Any:
+        return loads_payload(entry.payload)
+
+    def _store(self, key: str, kind: str, content_sha256: str, value: Any, student_count: int) -> None:
+        if not self.enabled:
+            return
+        payload = dumps_payload(value)
+
+        def fill(entry: ParseResultCacheEntry) -> None:
+            entry.kind = kind
+            entry.content_sha256 = content_sha256
+            entry.payload = payload
+            entry.payload_bytes = len(payload)
+            entry.student_count = student_count
+
+        self._put(key, fill)
+
+
+# 全局实例
+parse_result_cache = ParseResultCache()
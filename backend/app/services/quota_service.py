@@ -0,0 +1,99 @@
+"""Quota reservation for AI analysis: reserve up front, refund what was not delivered.
+
+The analysis path used to check ``quota_balance`` in Python, run the batch for minutes and
+then do ``user.quota_balance -= cost`` on a stale ORM object, so two concurrent analyses
+of the same user could both pass the check and overspend. Now:
+
+- ``reserve`` is one conditional ``UPDATE users ... WHERE quota_balance >= :cost``,
+  committed together with the job row; zero rows updated means insufficient quota.
+  Active VIPs are not debited (only ``quota_used`` is counted), as before.
+- ``release`` gives units back (failed students, failed job) with another relative UPDATE.
+- A second job for the same file is rejected by the one-active-job-per-file unique index
+  when the job row is inserted; its reservation is rolled back with it, so a double
+  submit is charged once.
+
+No row is read-modify-written in Python and nothing is held while the model runs.
+Both functions leave committing to the caller (and the caller drops the user cache entry
+after commit).
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.core.security import is_vip_active
+from app.models.user import QuotaTransaction, User
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, required: int, balance: int) -> None:
+        super().__init__(f"配额不足。需要 {required} 配额，当前余额 {balance}")
+        self.required = required
+        self.balance = balance
+
+
+def reserve(db: Session, *, user: User, units: int, description: str, force: bool = False) -> int:
+    """Reserve ``units`` of quota; returns the amount held from the balance (0 for VIP).
+
+    ``force`` skips the balance condition (settling jobs created before reservations).
+    """
+    if units <= 0:
+        return 0
+
+    held = 0 if is_vip_active(user) else units
+    stmt = update(User).where(User.id == user.id)
+    if held and not force:
+        stmt = stmt.where(User.quota_balance >= held)
+    row = db.execute(
+        stmt.values(quota_balance=User.quota_balance - held, quota_used=User.quota_used + units)
+        .returning(User.quota_balance)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
+        balance = db.execute(select(User.quota_balance).where(User.id == user.id)).scalar()
+        raise QuotaExceeded(units, int(balance or 0))
+
+    db.add(
+        QuotaTransaction(
+            user_id=user.id,
+            transaction_type="analysis_cost",
+            amount=-units,
+            balance_after=int(row.quota_balance),
+            description=description,
+        )
+    )
+    return held
+
+
+def release(db: Session, *, user_id: int, units: int, held: int, description: str) -> Optional[int]:
+    """Give back ``units`` of a reservation that held ``held`` from the balance.
+
+    Returns the balance afterwards, or None if nothing was released.
+    """
+    if units <= 0:
+        return None
+
+    refund = min(units, held)
+    row = db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(quota_balance=User.quota_balance + refund, quota_used=User.quota_used - units)
+        .returning(User.quota_balance)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
+        return None
+
+    db.add(
+        QuotaTransaction(
+            user_id=user_id,
+            transaction_type="refund",
+            amount=units,
+            balance_after=int(row.quota_balance),
+            description=description,
+        )
+    )
+    return int(row.quota_balance)
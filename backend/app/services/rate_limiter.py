@@ -0,0 +1,209 @@
+"""Process-wide token-bucket rate limiting for Azure OpenAI deployments.
+
+Azure OpenAI enforces requests-per-minute (RPM) and tokens-per-minute (TPM) quotas per
+deployment. We budget both locally, keyed by (endpoint role, model), *before* a request
+is dispatched, so bursts queue in-process instead of bouncing off 429s and burning the
+retry/backoff budget.
+
+- RPM bucket: 1 unit per request.
+- TPM bucket: estimated prompt tokens + expected output tokens per request; reconciled
+  with the real ``usage`` once the response arrives.
+- A limit of 0 disables that bucket (default), so behavior is unchanged unless configured.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Optional
+
+import asyncio
+import json
+import logging
+import re
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+
+def estimate_text_tokens(text: str) -> int:
+    """Cheap token estimate: ~1 token per CJK char, ~4 chars per token otherwise."""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    other = len(text) - cjk
+    return cjk + (other + 3) // 4
+
+
+def estimate_request_tokens(payload: dict[str, Any]) -> int:
+    prompt_tokens = 0
+    for item in payload.get("input") or []:
+        content = item.get("content") if isinstance(item, dict) else None
+        if isinstance(content, str):
+            prompt_tokens += estimate_text_tokens(content) + 4
+        elif content is not None:
+            prompt_tokens += estimate_text_tokens(json.dumps(content, ensure_ascii=False)) + 4
+
+    expected_output = int(getattr(settings, "AOAI_ESTIMATED_OUTPUT_TOKENS", 1000) or 0)
+    return max(1, prompt_tokens + expected_output)
+
+
+class TokenBucket:
+    def __init__(self, *, per_minute: int) -> None:
+        self.capacity = float(max(1, int(per_minute)))
+        self.refill_per_second = self.capacity / 60.0
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_second)
+            self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        self._refill()
+        # Never ask for more than a full bucket, otherwise a large request would wait forever.
+        amount = min(float(amount), self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_per_second
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(float(amount), self.capacity)
+
+    def adjust(self, delta: float) -> None:
+        """Give back (positive) or charge (negative) tokens; the bucket may go into debt."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + float(delta))
+
+
+class DeploymentRateLimiter:
+    def __init__(self, *, key: str, rpm: int, tpm: int) -> None:
+        self.key = key
+        self.rpm = int(rpm or 0)
+        self.tpm = int(tpm or 0)
+        self._requests = TokenBucket(per_minute=self.rpm) if self.rpm > 0 else None
+        self._tokens = TokenBucket(per_minute=self.tpm) if self.tpm > 0 else None
+
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self._waiting = 0
+        self._acquired = 0
+        self._waited_total_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self._requests is not None or self._tokens is not None
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    async def acquire(self, estimated_tokens: int) -> None:
+        if not self.enabled:
+            return
+
+        self._waiting += 1
+        started = time.monotonic()
+        try:
+            # The lock makes callers queue FIFO; only the head of the queue sleeps on the buckets.
+            async with self._get_lock():
+                while True:
+                    wait = 0.0
+                    if self._requests is not None:
+                        wait = max(wait, self._requests.wait_time(1))
+                    if self._tokens is not None:
+                        wait = max(wait, self._tokens.wait_time(estimated_tokens))
+                    if wait <= 0:
+                        break
+                    await asyncio.sleep(min(wait, 5.0))
+
+                if self._requests is not None:
+                    self._requests.consume(1)
+                if self._tokens is not None:
+                    self._tokens.consume(estimated_tokens)
+        finally:
+            self._waiting -= 1
+
+        self._acquired += 1
+        self._waited_total_seconds += time.monotonic() - started
+
+    def settle(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Reconcile the TPM bucket once the real usage is known."""
+        if self._tokens is None or actual_tokens <= 0:
+            return
+        self._tokens.adjust(float(estimated_tokens) - float(actual_tokens))
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "requests_available": round(self._requests.tokens, 2) if self._requests is not None else None,
+            "tokens_available": round(self._tokens.tokens, 2) if self._tokens is not None else None,
+            "waiting": self._waiting,
+            "acquired": self._acquired,
+            "waited_total_seconds": round(self._waited_total_seconds, 3),
+        }
+
+
+def _model_overrides() -> dict[str, dict[str, Any]]:
+    raw = getattr(settings, "AOAI_RATE_LIMITS_JSON", None)
+    if not raw or not str(raw).strip():
+        return {}
+    try:
+        data = json.loads(raw)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        logger.warning("AOAI_RATE_LIMITS_JSON is not valid JSON; ignoring per-model overrides.")
+        return {}
+
+
+def _limits_for(endpoint: str, model: str) -> tuple[int, int]:
+    rpm = int(getattr(settings, "AOAI_RPM_LIMIT", 0) or 0)
+    tpm = int(getattr(settings, "AOAI_TPM_LIMIT", 0) or 0)
+
+    if endpoint == "fallback":
+        v = getattr(settings, "AOAI_RPM_LIMIT_2", None)
+        if v is not None:
+            rpm = int(v)
+        v = getattr(settings, "AOAI_TPM_LIMIT_2", None)
+        if v is not None:
+            tpm = int(v)
+
+    overrides = _model_overrides()
+    # "<endpoint>:<model>" wins over "<model>".
+    for key in (model, f"{endpoint}:{model}"):
+        cfg = overrides.get(key)
+        if isinstance(cfg, dict):
+            if cfg.get("rpm") is not None:
+                rpm = int(cfg["rpm"])
+            if cfg.get("tpm") is not None:
+                tpm = int(cfg["tpm"])
+
+    return rpm, tpm
+
+
+_limiters: dict[tuple[str, str], DeploymentRateLimiter] = {}
+
+
+def get_rate_limiter(endpoint: str, model: str) -> DeploymentRateLimiter:
+    key = (endpoint, model or "")
+    limiter = _limiters.get(key)
+    if limiter is None:
+        rpm, tpm = _limits_for(endpoint, model or "")
+        limiter = DeploymentRateLimiter(key=f"{endpoint}:{model}", rpm=rpm, tpm=tpm)
+        _limiters[key] = limiter
+    return limiter
+
+
+def rate_limit_stats() -> dict[str, Any]:
+    return {limiter.key: limiter.stats() for limiter in _limiters.values() if limiter.enabled}
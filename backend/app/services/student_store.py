@@ -0,0 +1,236 @@
+"""Per-row storage of parsed students (``students`` / ``score_items``).
+
+Replaces the JSON blob in ``ScoreFile.analysis_result``: reads can be paginated and
+filtered in SQL, and the analysis job writes one row per student instead of rewriting the
+whole file. Files written before the tables existed are backfilled by migration
+009_add_student_tables; ``ensure_backfilled`` covers databases managed by ``create_all``
+only (the blob is cleared once its rows exist).
+
+Functions take the caller's Session and leave committing to it, except
+``ensure_backfilled`` (a one-off per legacy file).
+"""
+
+from __future__ import annotations
+
+from typing import Any, Collection, Dict, Iterable, List, Optional, Sequence
+
+import logging
+
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.core import fast_json
+from app.core.compression import loads_payload
+from app.models.score import StudentScore
+from app.models.student_record import ScoreItemRecord, StudentRecord
+from app.models.user import ScoreFile
+
+logger = logging.getLogger(__name__)
+
+# StudentScore fields that can be projected; student_name is always returned.
+STUDENT_FIELDS = ("student_name", "scores", "total_score", "analysis", "suggestions")
+
+
+def _dump(student: Any) -> Dict[str, Any]:
+    if isinstance(student, StudentScore):
+        return student.model_dump()
+    return dict(student or {})
+
+
+def _load_suggestions(raw: Optional[str]) -> Optional[List[str]]:
+    if raw is None:
+        return None
+    try:
+        value = fast_json.loads(raw)
+    except Exception:
+        return None
+    return value if isinstance(value, list) else None
+
+
+def _bump_version(db: Session, file_id: int) -> None:
+    db.execute(
+        update(ScoreFile)
+        .where(ScoreFile.id == file_id)
+        .values(data_version=ScoreFile.data_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def delete_students(db: Session, file_id: int) -> None:
+    db.execute(delete(ScoreItemRecord).where(ScoreItemRecord.score_file_id == file_id))
+    db.execute(delete(StudentRecord).where(StudentRecord.score_file_id == file_id))
+    _bump_version(db, file_id)
+
+
+def replace_students(db: Session, file_id: int, students: Sequence[Any]) -> None:
+    """Store the parsed students of a file in source order (StudentScore or its dict form)."""
+    delete_students(db, file_id)
+    if not students:
+        return
+
+    dumped = [_dump(s) for s in students]
+    records = [
+        StudentRecord(
+            score_file_id=file_id,
+            position=position,
+            student_name=str(data.get("student_name") or "")[:255],
+            total_score=float(data.get("total_score") or 0.0),
+            analysis=data.get("analysis"),
+            suggestions=fast_json.dumps_str(data["suggestions"]) if data.get("suggestions") is not None else None,
+        )
+        for position, data in enumerate(dumped)
+    ]
+    db.add_all(records)
+    db.flush()
+
+    items = [
+        {
+            "student_id": record.id,
+            "score_file_id": file_id,
+            "position": position,
+            "question_name": str(item.get("question_name") or ""),
+            "deduction": float(item.get("deduction") or 0.0),
+            "category": item.get("category"),
+        }
+        for record, data in zip(records, dumped)
+        for position, item in enumerate(data.get("scores") or [])
+    ]
+    if items:
+        db.execute(insert(ScoreItemRecord), items)
+
+
+def _name_filter(stmt, name: Optional[str]):
+    if name:
+        stmt = stmt.where(StudentRecord.student_name.contains(name, autoescape=True))
+    return stmt
+
+
+def count_students(db: Session, file_id: int, *, name: Optional[str] = None) -> int:
+    stmt = _name_filter(select(func.count(StudentRecord.id)).where(StudentRecord.score_file_id == file_id), name)
+    return int(db.execute(stmt).scalar() or 0)
+
+
+def load_students(
+    db: Session,
+    file_id: int,
+    *,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    name: Optional[str] = None,
+    fields: Optional[Collection[str]] = None,
+) -> List[Dict[str, Any]]:
+    """Students of a file as StudentScore-shaped dicts, in source order.
+
+    ``fields`` limits the returned keys (and the columns / score_items read) to a subset of
+    STUDENT_FIELDS; None returns everything.
+    """
+    wanted = [f for f in STUDENT_FIELDS if fields is None or f in fields or f == "student_name"]
+    columns = [getattr(StudentRecord, f) for f in wanted if f != "scores"]
+    stmt = _name_filter(
+        select(StudentRecord.id, *columns)
+        .where(StudentRecord.score_file_id == file_id)
+        .order_by(StudentRecord.position),
+        name,
+    )
+    if offset:
+        stmt = stmt.offset(offset)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    rows = db.execute(stmt).all()
+    if not rows:
+        return []
+
+    def _row(r) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        for f in wanted:
+            if f == "scores":
+                data[f] = items_by_student.get(r.id, [])
+            elif f == "suggestions":
+                data[f] = _load_suggestions(r.suggestions)
+            else:
+                data[f] = getattr(r, f)
+        return data
+
+    items_by_student: Dict[int, List[Dict[str, Any]]] = {}
+    if "scores" not in wanted:
+        return [_row(r) for r in rows]
+
+    items_stmt = select(
+        ScoreItemRecord.student_id,
+        ScoreItemRecord.question_name,
+        ScoreItemRecord.deduction,
+        ScoreItemRecord.category,
+    ).order_by(ScoreItemRecord.student_id, ScoreItemRecord.position)
+    if offset or limit is not None or name:
+        items_stmt = items_stmt.where(ScoreItemRecord.student_id.in_([r.id for r in rows]))
+    else:
+        items_stmt = items_stmt.where(ScoreItemRecord.score_file_id == file_id)
+
+    for item in db.execute(items_stmt):
+        items_by_student.setdefault(item.student_id, []).append(
+            {"question_name": item.question_name, "deduction": item.deduction, "category": item.category or ""}
+        )
+
+    return [_row(r) for r in rows]
+
+
+def version_token(db: Session, file_id: int) -> str:
+    """Changes on every write to the file's rows (``ScoreFile.data_version`` is bumped by each).
+
+    Timestamps are not enough: ``updated_at`` has 1-second resolution on SQLite, so two
+    writes within the same second would keep serving the first version as 304.
+    """
+    version = db.execute(select(ScoreFile.data_version).where(ScoreFile.id == file_id)).scalar()
+    return str(version or 0)
+
+
+def load_scores(db: Session, file_id: int) -> List[StudentScore]:
+    return [StudentScore(**s) for s in load_students(db, file_id)]
+
+
+def save_analysis(db: Session, file_id: int, scores: Iterable[tuple[int, StudentScore]]) -> None:
+    """Write analysis/suggestions for (position, student) pairs, one row each."""
+    params = [
+        {
+            "b_file_id": file_id,
+            "b_position": position,
+            "b_analysis": score.analysis,
+            "b_suggestions": fast_json.dumps_str(score.suggestions) if score.suggestions is not None else None,
+        }
+        for position, score in scores
+    ]
+    if not params:
+        return
+    stmt = (
+        update(StudentRecord.__table__)
+        .where(
+            StudentRecord.__table__.c.score_file_id == bindparam("b_file_id"),
+            StudentRecord.__table__.c.position == bindparam("b_position"),
+        )
+        .values(
+            analysis=bindparam("b_analysis"),
+            suggestions=bindparam("b_suggestions"),
+            updated_at=func.now(),
+        )
+    )
+    db.execute(stmt, params)
+    _bump_version(db, file_id)
+
+
+def ensure_backfilled(db: Session, file_record: ScoreFile) -> None:
+    """Move a legacy ``analysis_result`` blob into rows (no-op once the blob is cleared)."""
+    if not file_record.analysis_result:
+        return
+    try:
+        if count_students(db, file_record.id) == 0:
+            try:
+                students = loads_payload(file_record.analysis_result, []) or []
+            except Exception:
+                logger.warning("file %s: unreadable analysis_result blob", file_record.id)
+                students = []
+            replace_students(db, file_record.id, students)
+        file_record.analysis_result = None
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
@@ -1,28 +1,38 @@
 from __future__ import annotations
 
+import asyncio
+import io
 import json
 import math
 import re
-import tempfile
 import logging
 from dataclasses import dataclass
 from datetime import datetime
+from itertools import chain, islice
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import httpx
 
+import numpy as np
 import pandas as pd
+from pydantic import TypeAdapter
 from docx import Document
 from pptx import Presentation
 
 from app.core.config import settings
 from app.models.score import ScoreItem, StudentScore
 from app.services.azure_openai_responses_client import AzureOpenAIResponsesClient
+from app.services.excel_workbook import DecodedSheets, ParsedWorkbook, rows_to_frame
+from app.services.mapping_plan_cache_service import mapping_plan_cache
 
 
 logger = logging.getLogger(__name__)
 
+# Part of the parse result cache key: bump when parsing the same bytes with the same
+# mapping can produce different output.
+PARSER_VERSION = "1"
+
 
 @dataclass(frozen=True)
 class ParsePreview:
@@ -39,6 +49,88 @@ class MappingResult:
     recommendations: list[str]
     usage: dict[str, int]
     raw_text: str
+    # True when the mapping came from the mapping-plan cache (no model call).
+    cached: bool = False
+
+
+SUPPORTED_SUFFIXES = (".xlsx", ".docx", ".pptx")
+
+
+class ParseSource:
+    """In-memory view of one uploaded file for a single preview or full parse.
+
+    Parsers read straight from a ``BytesIO`` over the upload (no temp file). Preview and
+    full parse are separate executor tasks (the mapping inferred from the preview sits
+    between them), so each opens its own handle; ``close`` releases it. A full parse
+    given the preview's ``decoded`` sheets starts from those instead of decoding again.
+    """
+
+    def __init__(
+        self,
+        file_bytes: bytes | bytearray | memoryview,
+        filename: str,
+        *,
+        streaming: Optional[bool] = None,
+        decoded: Optional[DecodedSheets] = None,
+    ) -> None:
+        self.filename = filename
+        self.suffix = Path(filename or "").suffix.lower()
+        self._data = memoryview(file_bytes)
+        # None: decide by EXCEL_STREAMING_THRESHOLD_BYTES.
+        self._streaming = streaming
+        self._decoded = decoded
+        self._excel: Optional[ParsedWorkbook] = None
+        self._document: Any = None
+        self._presentation: Any = None
+
+    @property
+    def file_type(self) -> str:
+        return self.suffix.lstrip(".")
+
+    def stream(self) -> io.BytesIO:
+        # BytesIO copies the buffer, but never touches disk.
+        return io.BytesIO(self._data)
+
+    @property
+    def size(self) -> int:
+        return self._data.nbytes
+
+    def excel(self) -> ParsedWorkbook:
+        if self._excel is None and self._decoded is not None:
+            # Grids only exist for workbooks the preview read without streaming.
+            self._excel = ParsedWorkbook(self.stream(), decoded=self._decoded)
+        if self._excel is None:
+            streaming = self._streaming
+            if streaming is None:
+                threshold = int(getattr(settings, "EXCEL_STREAMING_THRESHOLD_BYTES", 0) or 0)
+                streaming = threshold > 0 and self.size >= threshold
+            if streaming and self._streaming is None:
+                logger.info("xlsx %s is %d bytes; using streaming read-only parse", self.filename, self.size)
+            self._excel = ParsedWorkbook(self.stream(), streaming=streaming)
+        return self._excel
+
+    def document(self) -> Any:
+        if self._document is None:
+            self._document = Document(self.stream())
+        return self._document
+
+    def presentation(self) -> Any:
+        if self._presentation is None:
+            self._presentation = Presentation(self.stream())
+        return self._presentation
+
+    def close(self) -> None:
+        if self._excel is not None:
+            self._excel.close()
+        self._excel = None
+        self._document = None
+        self._presentation = None
+
+    def __enter__(self) -> "ParseSource":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
 
 
 def _resolve_responses_url() -> str:
@@ -120,32 +212,37 @@ class UniversalParsingService:
         raise ValueError("PARSING_MODEL (or ANALYSIS_MODEL / AZURE_OPENAI_DEPLOYMENT_NAME) must be set")
 
     @staticmethod
-    def extract_preview(*, file_bytes: bytes, filename: str) -> ParsePreview:
-        suffix = Path(filename).suffix.lower()
-        if suffix not in (".xlsx", ".docx", ".pptx"):
-            raise ValueError("Unsupported file type")
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tf:
-            tf.write(file_bytes)
-            temp_path = tf.name
-
-        try:
-            if suffix == ".xlsx":
-                ir, preview = _extract_excel_ir_and_preview(temp_path)
-                return ParsePreview(file_type="xlsx", ir=ir, preview=preview)
-            if suffix == ".docx":
-                ir, preview = _extract_word_ir_and_preview(temp_path)
-                return ParsePreview(file_type="docx", ir=ir, preview=preview)
-            ir, preview = _extract_ppt_ir_and_preview(temp_path)
-            return ParsePreview(file_type="pptx", ir=ir, preview=preview)
-        finally:
-            try:
-                Path(temp_path).unlink(missing_ok=True)
-            except Exception:
-                pass
+    def extract_preview(*, file_bytes: bytes, filename: str, streaming: Optional[bool] = None) -> ParsePreview:
+        with ParseSource(file_bytes, filename, streaming=streaming) as src:
+            return _extract_preview(src)
 
     @staticmethod
-    async def infer_mapping(*, file_type: str, ir: dict[str, Any], preview: dict[str, Any]) -> MappingResult:
+    async def infer_mapping(
+        *,
+        file_type: str,
+        ir: dict[str, Any],
+        preview: dict[str, Any],
+        user_id: Optional[int] = None,
+    ) -> MappingResult:
+        # Same template as a previously successful parse => reuse its mapping, skip the model.
+        cached = await asyncio.to_thread(
+            mapping_plan_cache.lookup,
+            fingerprint=mapping_plan_cache.fingerprint(file_type, ir),
+            user_id=user_id,
+        )
+        if cached is not None:
+            cached_mapping, cached_confidence = cached
+            logger.info("Mapping plan cache hit (file_type=%s, user_id=%s)", file_type, user_id)
+            return MappingResult(
+                mapping=cached_mapping,
+                confidence=cached_confidence,
+                errors=[],
+                recommendations=[],
+                usage={"prompt_tokens": 0, "completion_tokens": 0},
+                raw_text="",
+                cached=True,
+            )
+
         if not settings.AZURE_OPENAI_API_KEY:
             raise ValueError("AZURE_OPENAI_API_KEY must be set")
         parsing_model = UniversalParsingService._resolve_parsing_model()
@@ -266,35 +363,78 @@ class UniversalParsingService:
         )
 
     @staticmethod
-    def parse_full(*, file_bytes: bytes, filename: str, mapping: dict[str, Any]) -> List[StudentScore]:
-        suffix = Path(filename).suffix.lower()
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tf:
-            tf.write(file_bytes)
-            temp_path = tf.name
-
-        try:
-            if suffix == ".xlsx":
-                return _parse_excel_full(temp_path, mapping)
-            if suffix == ".docx":
-                return _parse_word_full(temp_path, mapping)
-            if suffix == ".pptx":
-                return _parse_ppt_full(temp_path, mapping)
+    def parse_full(
+        *,
+        file_bytes: bytes,
+        filename: str,
+        mapping: dict[str, Any],
+        decoded: Optional[DecodedSheets] = None,
+    ) -> List[StudentScore]:
+        with ParseSource(file_bytes, filename, decoded=decoded) as src:
+            if src.suffix == ".xlsx":
+                return _parse_excel_full(src.excel(), mapping)
+            if src.suffix == ".docx":
+                return _parse_word_full(src.document(), mapping)
+            if src.suffix == ".pptx":
+                return _parse_ppt_full(src.presentation(), mapping)
             raise ValueError("Unsupported file type")
-        finally:
-            try:
-                Path(temp_path).unlink(missing_ok=True)
-            except Exception:
-                pass
 
 
-def _extract_excel_ir_and_preview(file_path: str) -> Tuple[dict[str, Any], dict[str, Any]]:
-    # Read a limited amount for IR/preview to keep memory bounded.
-    sheets = pd.read_excel(file_path, sheet_name=None, header=None, nrows=200)
-    sheet_names = list(sheets.keys())
+def _extract_preview(src: ParseSource) -> ParsePreview:
+    if src.suffix not in SUPPORTED_SUFFIXES:
+        raise ValueError("Unsupported file type")
+    if src.suffix == ".xlsx":
+        ir, preview = _extract_excel_ir_and_preview(src.excel())
+        return ParsePreview(file_type="xlsx", ir=ir, preview=preview)
+    if src.suffix == ".docx":
+        ir, preview = _extract_word_ir_and_preview(src.document())
+        return ParsePreview(file_type="docx", ir=ir, preview=preview)
+    ir, preview = _extract_ppt_ir_and_preview(src.presentation())
+    return ParsePreview(file_type="pptx", ir=ir, preview=preview)
+
+
+def extract_preview_task(file_bytes: bytes, filename: str) -> ParsePreview:
+    """Standalone preview for the CPU executor (may run in a worker process).
 
-    # Default to first sheet for preview
+    The workbook is opened in streaming mode, so only the sampled rows are decoded; used
+    where no full parse of the same bytes follows.
+    """
+    return UniversalParsingService.extract_preview(file_bytes=file_bytes, filename=filename, streaming=True)
+
+
+def extract_preview_for_parse_task(file_bytes: bytes, filename: str) -> Tuple[ParsePreview, Optional[DecodedSheets]]:
+    """Preview whose decoded sheets are handed on to ``parse_full_task`` (``/upload``).
+
+    Below EXCEL_STREAMING_THRESHOLD_BYTES the previewed sheet is decoded completely and its
+    grid is returned with the preview, so the full parse does not decode the workbook a
+    second time. Larger workbooks stream: the preview reads only its sampled rows and the
+    full parse streams the chosen sheet once.
+    """
+    with ParseSource(file_bytes, filename) as src:
+        preview = _extract_preview(src)
+        decoded = None
+        if preview.file_type == "xlsx" and not src.excel().streaming:
+            decoded = src.excel().decoded()
+        return preview, decoded
+
+
+def parse_full_task(
+    file_bytes: bytes, filename: str, mapping: dict[str, Any], decoded: Optional[DecodedSheets] = None
+) -> List[StudentScore]:
+    """Standalone full parse for the CPU executor (may run in a worker process)."""
+    return UniversalParsingService.parse_full(
+        file_bytes=file_bytes, filename=filename, mapping=mapping, decoded=decoded
+    )
+
+
+def _extract_excel_ir_and_preview(wb: ParsedWorkbook) -> Tuple[dict[str, Any], dict[str, Any]]:
+    sheet_names = list(wb.sheet_names)
+
+    # Default to first sheet for preview; only that sheet is decoded here, and its grid is
+    # handed to _parse_excel_full (see extract_preview_for_parse_task) when the mapping
+    # picks the same sheet.
     first_name = sheet_names[0] if sheet_names else None
-    first_df = sheets[first_name] if first_name else pd.DataFrame()
+    first_df = wb.frame(first_name, header=None, nrows=200) if first_name else pd.DataFrame()
 
     # Limit for IR/preview
     sample_df = first_df.iloc[:40, :40].copy() if not first_df.empty else first_df
@@ -404,9 +544,7 @@ def _extract_excel_ir_and_preview(file_path: str) -> Tuple[dict[str, Any], dict[
     return ir, preview
 
 
-def _extract_word_ir_and_preview(file_path: str) -> Tuple[dict[str, Any], dict[str, Any]]:
-    doc = Document(file_path)
-
+def _extract_word_ir_and_preview(doc: Any) -> Tuple[dict[str, Any], dict[str, Any]]:
     paras = [p.text.strip() for p in doc.paragraphs if p.text and p.text.strip()]
     paras_sample = paras[:40]
 
@@ -430,9 +568,7 @@ def _extract_word_ir_and_preview(file_path: str) -> Tuple[dict[str, Any], dict[s
     return ir, preview
 
 
-def _extract_ppt_ir_and_preview(file_path: str) -> Tuple[dict[str, Any], dict[str, Any]]:
-    prs = Presentation(file_path)
-
+def _extract_ppt_ir_and_preview(prs: Any) -> Tuple[dict[str, Any], dict[str, Any]]:
     slide_previews: list[dict[str, Any]] = []
     for i, slide in enumerate(prs.slides[:10]):
         texts: list[str] = []
@@ -518,13 +654,36 @@ def _auto_detect_total_score_column(df: pd.DataFrame) -> Optional[str]:
     return None
 
 
-def _parse_excel_full(file_path: str, mapping: dict[str, Any]) -> List[StudentScore]:
+@dataclass(frozen=True)
+class _ExcelColumnPlan:
+    student_col: Any
+    total_col: Any
+    item_cols: list[Any]
+    mode: str
+    default_deduction: float
+
+
+def _parse_excel_full(wb: ParsedWorkbook, mapping: dict[str, Any]) -> List[StudentScore]:
     excel_cfg = mapping.get("excel") if isinstance(mapping.get("excel"), dict) else {}
     sheet = excel_cfg.get("sheet")
     header_row = int(excel_cfg.get("header_row", 0))
 
-    df = pd.read_excel(file_path, sheet_name=sheet or 0, header=header_row)
+    if wb.streaming:
+        return list(_iter_excel_scores_streaming(wb, sheet or 0, header_row, mapping))
+
+    df = wb.frame(sheet or 0, header=header_row)
+    plan = _resolve_excel_plan(df, mapping)
+    return _extract_excel_scores(
+        df,
+        student_col_name=plan.student_col,
+        total_col_name=plan.total_col,
+        item_cols=plan.item_cols,
+        mode=plan.mode,
+        default_deduction=plan.default_deduction,
+    )
+
 
+def _resolve_excel_plan(df: pd.DataFrame, mapping: dict[str, Any]) -> _ExcelColumnPlan:
     common = mapping.get("common") if isinstance(mapping.get("common"), dict) else mapping
 
     student_name_cfg = common.get("student_name") if isinstance(common.get("student_name"), dict) else {}
@@ -578,64 +737,218 @@ def _parse_excel_full(file_path: str, mapping: dict[str, Any]) -> List[StudentSc
         c for c in resolved_item_cols if c != student_col_name and (total_col_name is None or c != total_col_name)
     ]
 
-    scores: list[StudentScore] = []
+    return _ExcelColumnPlan(
+        student_col=student_col_name,
+        total_col=total_col_name,
+        item_cols=resolved_item_cols,
+        mode=mode,
+        default_deduction=default_deduction,
+    )
+
+
+# Rows used to resolve column labels / auto-detect the total column in streaming mode.
+STREAMING_SAMPLE_ROWS = 200
+
+# pandas' default na_values: such text cells are NaN in the DataFrame path.
+_NA_STRINGS = frozenset(
+    {
+        "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+        "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+    }
+)
+
+
+def _iter_excel_scores_streaming(
+    wb: ParsedWorkbook,
+    sheet: Any,
+    header_row: int,
+    mapping: dict[str, Any],
+) -> Iterator[StudentScore]:
+    """Yield one StudentScore per row straight off openpyxl's read-only reader.
+
+    Memory stays flat regardless of sheet size: only a bounded sample is turned into a
+    DataFrame (to resolve the mapping's columns exactly like the DataFrame path); every
+    other row is read, converted and dropped. Cells are typed individually, so there is
+    no column-wide dtype inference (e.g. a text "0" stays text).
+    """
+    rows = wb.iter_rows(sheet)
+    head = list(islice(rows, header_row + 1 + STREAMING_SAMPLE_ROWS))
+    sample = rows_to_frame(head, header=header_row)
+    plan = _resolve_excel_plan(sample, mapping)
+
+    positions = {c: i for i, c in enumerate(sample.columns)}
+    name_idx = positions[plan.student_col]
+    total_idx = positions.get(plan.total_col) if plan.total_col else None
+    item_idx = [positions[c] for c in plan.item_cols]
+    question_names = [str(c) for c in plan.item_cols]
+    categories = [_guess_category(q) for q in question_names]
+    marker = plan.mode == "marker"
+
+    def cell(cells: list[Any], i: int) -> Any:
+        v = cells[i] if i < len(cells) else None
+        if isinstance(v, str) and v in _NA_STRINGS:
+            return None
+        return v
 
-    for _, row in df.iterrows():
-        student_name = str(row.get(student_col_name, "")).strip()
+    for cells in chain(head[header_row + 1 :], rows):
+        raw_name = cell(cells, name_idx)
+        student_name = "" if raw_name is None else str(raw_name).strip()
         if not student_name or student_name.lower() == "nan":
             continue
 
-        # Total score may be missing/NA; if so, compute from deductions later.
-        total_score = 100.0
-        if total_col_name:
-            total_score = _safe_float(row.get(total_col_name), default=float("nan"))
-
-        items: list[ScoreItem] = []
-        for c in resolved_item_cols:
-            val = row.get(c)
-            if mode == "marker":
-                if val is None:
-                    continue
-                try:
-                    if pd.isna(val):
-                        continue
-                except Exception:
-                    pass
-                if str(val).strip() == "" or val == 0:
+        items: list[dict[str, Any]] = []
+        for j, idx in enumerate(item_idx):
+            val = cell(cells, idx)
+            if marker:
+                if not _is_marked(val):
                     continue
-                items.append(
-                    ScoreItem(
-                        question_name=str(c),
-                        deduction=float(default_deduction),
-                        category=_guess_category(str(c)),
-                    )
-                )
+                deduction = float(plan.default_deduction)
             else:
-                # explicit numeric values
                 dv = _safe_float(val, default=0.0)
                 if dv == 0.0:
                     continue
-                items.append(
-                    ScoreItem(
-                        question_name=str(c),
-                        deduction=float(abs(dv)),
-                        category=_guess_category(str(c)),
-                    )
-                )
+                deduction = float(abs(dv))
+            items.append({"question_name": question_names[j], "deduction": deduction, "category": categories[j]})
+
+        total_score = 100.0
+        if total_idx is not None:
+            total_score = _safe_float(cell(cells, total_idx), default=float("nan"))
+        if not math.isfinite(total_score):
+            full_score = 100.0
+            total_deduction = sum(i["deduction"] for i in items)
+            total_score = max(0.0, min(full_score, full_score - total_deduction))
+
+        yield StudentScore.model_validate({"student_name": student_name, "scores": items, "total_score": float(total_score)})
+
+
+_STUDENT_SCORES_ADAPTER = TypeAdapter(List[StudentScore])
+
+
+def _is_marked(v: Any) -> bool:
+    """Marker-mode rule for one cell: anything non-empty and non-zero marks a deduction."""
+    if v is None:
+        return False
+    try:
+        if pd.isna(v):
+            return False
+    except Exception:
+        pass
+    return not (str(v).strip() == "" or v == 0)
+
+
+def _is_plain_numeric(s: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(s.dtype) and not pd.api.types.is_complex_dtype(s.dtype)
+
+
+def _column_marker_mask(s: pd.Series) -> np.ndarray:
+    if _is_plain_numeric(s):
+        arr = s.to_numpy(dtype=float, na_value=np.nan)
+        return ~np.isnan(arr) & (arr != 0)
+    # Text/mixed column: NA check is vectorized, only non-empty cells are inspected one by one.
+    mask = s.notna().to_numpy(dtype=bool, copy=True)
+    idx = np.flatnonzero(mask)
+    if len(idx):
+        values = s.to_numpy(dtype=object)[idx]
+        mask[idx] = [_is_marked(v) for v in values]
+    return mask
+
+
+def _column_floats(s: pd.Series, default: float) -> np.ndarray:
+    """Vectorized ``_safe_float`` over a column."""
+    if _is_plain_numeric(s):
+        arr = s.to_numpy(dtype=float, na_value=np.nan)
+        return np.where(np.isfinite(arr), arr, default)
+    return np.fromiter((_safe_float(v, default=default) for v in s), dtype=float, count=len(s))
+
+
+def _column_names(df: pd.DataFrame, col: Any) -> list[str]:
+    s = df[col]
+    # iterrows() upcasts an all-numeric row to one dtype (an int64 ID column becomes
+    # "1001.0"); keep that behavior so names match the row-wise parser.
+    dtypes = list(df.dtypes)
+    if dtypes and all(
+        isinstance(t, np.dtype) and (np.issubdtype(t, np.integer) or np.issubdtype(t, np.floating)) for t in dtypes
+    ):
+        s = s.astype(np.result_type(*dtypes))
+    # Missing names (None/NaN) come out of iterrows() as NaN, i.e. "nan", and are skipped.
+    return ["nan" if v is None else str(v).strip() for v in s.tolist()]
+
+
+def _extract_excel_scores(
+    df: pd.DataFrame,
+    *,
+    student_col_name: Any,
+    total_col_name: Any,
+    item_cols: list[Any],
+    mode: str,
+    default_deduction: float,
+) -> List[StudentScore]:
+    """Column-wise extraction: masks/deductions/totals as arrays, objects built at the end."""
+    n_rows = len(df)
+    if n_rows == 0:
+        return []
+
+    names = _column_names(df, student_col_name)
+
+    if total_col_name:
+        totals = _column_floats(df[total_col_name], default=float("nan"))
+    else:
+        totals = np.full(n_rows, 100.0)
+
+    k = len(item_cols)
+    marks = np.zeros((n_rows, k), dtype=bool)
+    deductions = np.zeros((n_rows, k), dtype=float)
+    for j, c in enumerate(item_cols):
+        s = df[c]
+        if mode == "marker":
+            marks[:, j] = _column_marker_mask(s)
+            deductions[:, j] = float(default_deduction)
+        else:
+            # explicit numeric values
+            values = _column_floats(s, default=0.0)
+            marks[:, j] = values != 0.0
+            deductions[:, j] = np.abs(values)
+
+    question_names = [str(c) for c in item_cols]
+    categories = [_guess_category(q) for q in question_names]
+    marker_items: Optional[list[dict[str, Any]]] = None
+    if mode == "marker":
+        marker_items = [
+            {"question_name": q, "deduction": float(default_deduction), "category": cat}
+            for q, cat in zip(question_names, categories)
+        ]
+
+    # Plain dicts per student, validated in one TypeAdapter call at the end.
+    rows: list[dict[str, Any]] = []
+    for r in range(n_rows):
+        student_name = names[r]
+        if not student_name or student_name.lower() == "nan":
+            continue
+
+        marked = np.flatnonzero(marks[r]).tolist()
+        if marker_items is not None:
+            # Same deduction for every row of a column: share the per-column item dict.
+            items = [marker_items[j] for j in marked]
+        else:
+            row_deductions = deductions[r]
+            items = [
+                {"question_name": question_names[j], "deduction": float(row_deductions[j]), "category": categories[j]}
+                for j in marked
+            ]
 
         # If total score is missing/NA, compute it from deductions.
-        if not math.isfinite(float(total_score)):
+        total_score = float(totals[r])
+        if not math.isfinite(total_score):
             full_score = 100.0
-            total_deduction = sum(float(i.deduction or 0.0) for i in items)
+            total_deduction = sum(i["deduction"] for i in items)
             total_score = max(0.0, min(full_score, full_score - total_deduction))
 
-        scores.append(StudentScore(student_name=student_name, scores=items, total_score=float(total_score)))
+        rows.append({"student_name": student_name, "scores": items, "total_score": float(total_score)})
 
-    return scores
+    return _STUDENT_SCORES_ADAPTER.validate_python(rows)
 
 
-def _parse_word_full(file_path: str, mapping: dict[str, Any]) -> List[StudentScore]:
-    doc = Document(file_path)
+def _parse_word_full(doc: Any, mapping: dict[str, Any]) -> List[StudentScore]:
     lines = [p.text.strip() for p in doc.paragraphs if p.text and p.text.strip()]
 
     common = mapping.get("common") if isinstance(mapping.get("common"), dict) else mapping
@@ -682,9 +995,7 @@ def _parse_word_full(file_path: str, mapping: dict[str, Any]) -> List[StudentSco
     return students
 
 
-def _parse_ppt_full(file_path: str, mapping: dict[str, Any]) -> List[StudentScore]:
-    prs = Presentation(file_path)
-
+def _parse_ppt_full(prs: Any, mapping: dict[str, Any]) -> List[StudentScore]:
     common = mapping.get("common") if isinstance(mapping.get("common"), dict) else mapping
     items_cfg = common.get("items") if isinstance(common.get("items"), dict) else {}
     pattern = items_cfg.get("line_pattern") or r"^(.+?)[:：]\s*(\d+(?:\.\d+)?)$"
@@ -0,0 +1,245 @@
+"""Content-addressed upload store: identical file bytes are stored once.
+
+Teachers re-upload the same workbook again and again, and every upload used to write a new
+timestamped copy. Now the upload is hashed first (one pass over Starlette's spooled
+temp file, which also enforces MAX_UPLOAD_SIZE_BYTES), then:
+
+- known SHA-256: ``ref_count`` is incremented and the storage write is skipped;
+- new content: it is streamed to storage as ``<sha256>-<random><suffix>`` first, and only
+  then is the ``upload_blobs`` row inserted, with no await until the caller commits; the
+  loser of a concurrent first upload references the winner's object and deletes its own.
+
+No database write is pending while an object is streamed or deleted: on SQLite even a
+zero-row UPDATE takes the database write lock, and on PostgreSQL a row lock held across
+storage I/O would stall every upload of the same content on the worker.
+
+``ScoreFile.content_sha256`` holds the reference. The increment is committed by the caller
+together with the ScoreFile row. ``release`` runs after the ScoreFile is deleted. It
+decrements the count and commits; the last reference leaves the row at ``ref_count`` 0
+while the object is deleted, then removes the row. A re-upload in that window writes a new
+object (every write has its own name) and takes the row over.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Protocol
+
+import asyncio
+import hashlib
+import logging
+import uuid
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.time import utcnow
+from app.models.upload_blob import UploadBlob
+from app.services.file_storage_service import UploadTooLarge, file_storage
+
+logger = logging.getLogger(__name__)
+
+
+class SeekableReader(Protocol):
+    async def read(self, size: int = -1) -> bytes: ...
+
+    async def seek(self, offset: int) -> None: ...
+
+
+@dataclass
+class StoredUpload:
+    url: str
+    size: int
+    sha256: str
+    deduplicated: bool
+
+
+class UploadStore:
+    def __init__(self) -> None:
+        self.uploads = 0
+        self.dedup_hits = 0
+        self.bytes_deduplicated = 0
+        self.releases = 0
+        self.objects_deleted = 0
+        self._cleanup_tasks: set[asyncio.Task] = set()
+
+    @staticmethod
+    def _chunk_size() -> int:
+        return max(64 * 1024, int(getattr(settings, "UPLOAD_CHUNK_SIZE_BYTES", 4 * 1024 * 1024) or 0))
+
+    async def _digest(self, reader: SeekableReader, max_bytes: Optional[int]) -> tuple[str, int]:
+        digest = hashlib.sha256()
+        size = 0
+        chunk_size = self._chunk_size()
+        while True:
+            chunk = await reader.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if max_bytes and size > max_bytes:
+                raise UploadTooLarge(max_bytes)
+            digest.update(chunk)
+        await reader.seek(0)
+        return digest.hexdigest(), size
+
+    async def save(
+        self,
+        db: Session,
+        reader: SeekableReader,
+        *,
+        filename: str,
+        content_type: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+    ) -> StoredUpload:
+        """Store the upload (or reference the existing copy); the caller commits.
+
+        Call before adding anything else to ``db``: no write is issued while the upload is
+        being streamed, and a lost race rolls the session back before writing the object.
+        """
+        sha256, size = await self._digest(reader, max_bytes)
+        self.uploads += 1
+
+        # Plain read first: a zero-row UPDATE would already take SQLite's write lock.
+        ref_count = db.execute(select(UploadBlob.ref_count).where(UploadBlob.sha256 == sha256)).scalar()
+        if ref_count is not None and ref_count > 0:
+            url = self._take_reference(db, sha256)
+            if url is not None:
+                self.dedup_hits += 1
+                self.bytes_deduplicated += size
+                return StoredUpload(url=url, size=size, sha256=sha256, deduplicated=True)
+            # Released in between: drop the (empty) write before streaming the object.
+            db.rollback()
+
+        # Every write gets its own object name, so a release still deleting an earlier
+        # object for this hash can never remove the one written here.
+        name = f"{sha256}-{uuid.uuid4().hex[:12]}{Path(filename or '').suffix.lower()}"
+        stored = await file_storage.save_stream(
+            reader, filename, file_type="upload", content_type=content_type, max_bytes=max_bytes, name=name
+        )
+        if stored.sha256 != sha256:
+            await self._delete_object(name if file_storage.storage_type == "azure" else stored.url, sha256)
+            raise RuntimeError("上传内容在保存过程中发生变化")
+
+        # From here to the caller's commit there is no await.
+        storage_key = name if file_storage.storage_type == "azure" else stored.url
+        url = self._attach(db, sha256, size, storage_key, stored.url)
+        if url != stored.url:
+            # Same bytes stored concurrently by another upload: reference that copy instead.
+            self._discard(storage_key, sha256)
+            return StoredUpload(url=url, size=size, sha256=sha256, deduplicated=True)
+        return StoredUpload(url=stored.url, size=size, sha256=sha256, deduplicated=False)
+
+    @staticmethod
+    def _take_reference(db: Session, sha256: str) -> Optional[str]:
+        return db.execute(
+            update(UploadBlob)
+            .where(UploadBlob.sha256 == sha256, UploadBlob.ref_count > 0)
+            .values(ref_count=UploadBlob.ref_count + 1, last_referenced_at=utcnow())
+            .returning(UploadBlob.file_url)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+
+    def _attach(self, db: Session, sha256: str, size: int, storage_key: str, file_url: str) -> str:
+        """Record the freshly written object; returns the URL the new reference points to."""
+        # A row left at ref_count <= 0 by a release in progress: take it over with our object.
+        revived = db.execute(
+            update(UploadBlob)
+            .where(UploadBlob.sha256 == sha256, UploadBlob.ref_count <= 0)
+            .values(
+                ref_count=1, size=size, storage_key=storage_key, file_url=file_url, last_referenced_at=utcnow()
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if revived.rowcount:
+            return file_url
+
+        url = self._take_reference(db, sha256)
+        if url is not None:
+            return url
+        try:
+            with db.begin_nested():
+                db.add(
+                    UploadBlob(
+                        sha256=sha256,
+                        size=size,
+                        storage_key=storage_key,
+                        file_url=file_url,
+                        ref_count=1,
+                        last_referenced_at=utcnow(),
+                    )
+                )
+        except IntegrityError:
+            # Inserted concurrently by an upload of the same bytes.
+            url = self._take_reference(db, sha256)
+            if url is None:
+                raise
+            return url
+        return file_url
+
+    def _discard(self, storage_key: str, sha256: str) -> None:
+        """Delete an unreferenced object in the background (the caller's transaction is open)."""
+        task = asyncio.create_task(self._delete_object(storage_key, sha256))
+        self._cleanup_tasks.add(task)
+        task.add_done_callback(self._cleanup_tasks.discard)
+
+    async def _delete_object(self, storage_key: str, sha256: str) -> None:
+        try:
+            await file_storage.delete_file(storage_key, file_type="upload")
+            self.objects_deleted += 1
+        except Exception as e:
+            logger.warning("删除上传文件失败 sha256=%s key=%s err=%s", sha256, storage_key, e)
+
+    async def release(self, db: Session, sha256: str) -> None:
+        """Drop one reference (after the ScoreFile row is gone); commits.
+
+        The last reference leaves the row at ref_count 0 and commits before the object is
+        deleted, so no row lock is held across storage I/O. A re-upload meanwhile sees the
+        zero count, writes a new object and takes the row over; the row is only removed if
+        it still points at the deleted object.
+        """
+        try:
+            row = db.execute(
+                update(UploadBlob)
+                .where(UploadBlob.sha256 == sha256)
+                .values(ref_count=UploadBlob.ref_count - 1)
+                .returning(UploadBlob.ref_count, UploadBlob.storage_key)
+                .execution_options(synchronize_session=False)
+            ).first()
+            db.commit()
+            self.releases += 1
+        except Exception:
+            db.rollback()
+            logger.warning("释放上传文件引用失败 sha256=%s", sha256, exc_info=True)
+            return
+        if row is None or row.ref_count > 0:
+            return
+
+        await self._delete_object(row.storage_key, sha256)
+        try:
+            db.execute(
+                delete(UploadBlob).where(
+                    UploadBlob.sha256 == sha256,
+                    UploadBlob.ref_count <= 0,
+                    UploadBlob.storage_key == row.storage_key,
+                )
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.warning("清理上传文件记录失败 sha256=%s", sha256, exc_info=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "uploads": self.uploads,
+            "dedup_hits": self.dedup_hits,
+            "bytes_deduplicated": self.bytes_deduplicated,
+            "releases": self.releases,
+            "objects_deleted": self.objects_deleted,
+        }
+
+
+# 全局实例
+upload_store = UploadStore()
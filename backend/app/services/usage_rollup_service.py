@@ -0,0 +1,394 @@
+"""Hourly / daily rollups of ``analysis_logs`` for the admin dashboards.
+
+``/admin/stats``, ``/admin/users`` and ``/admin/quota/usage`` used to run SUM/COUNT over
+``analysis_logs`` for the requested range on every page load. Per-user totals of every
+closed hour (and of every closed day, summed from the hours) are now kept in
+``usage_rollups``:
+
+- A periodic compactor rolls up the hours that closed since its last run (hours older than
+  USAGE_ROLLUP_SETTLE_SECONDS), chunk by chunk. Each chunk is claimed first by advancing
+  the watermark ``usage_rollup_state.closed_until`` with a conditional UPDATE, so with
+  several workers each chunk is written once.
+- A log that finishes after its hour was rolled up (long analysis jobs) is applied to the
+  rollup rows incrementally by ``record_finished`` in the same transaction. It reads the
+  watermark ``FOR UPDATE``: the claim's row lock (a write lock on SQLite) serializes it
+  with the compactor, so a finishing log is either committed before the compactor reads
+  the logs or sees the advanced watermark and applies its delta.
+- Reads split a range into raw logs for the partial edge hours and for the open tail after
+  the watermark, hour buckets for partial days and day buckets for the rest.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, fields
+from datetime import datetime, timedelta, timezone
+from typing import Any, Collection, Dict, List, Optional, Tuple
+
+import asyncio
+import logging
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.time import ensure_utc_aware, utcnow
+from app.models.usage_rollup import UsageRollup, UsageRollupState
+from app.models.user import AnalysisLog
+
+logger = logging.getLogger(__name__)
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+STATE_NAME = "analysis_logs"
+# Hours rolled up per transaction while catching up
+_CHUNK = timedelta(days=7)
+
+
+@dataclass
+class UsageTotals:
+    task_count: int = 0
+    success_count: int = 0
+    failed_count: int = 0
+    quota_cost: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    def add(self, other: "UsageTotals") -> None:
+        for name in METRICS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+
+METRICS = tuple(f.name for f in fields(UsageTotals))
+
+# (source, lower bound, upper bound, upper bound inclusive); None means unbounded
+Segment = Tuple[str, Optional[datetime], Optional[datetime], bool]
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    return ensure_utc_aware(value).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _floor(value: datetime, step: timedelta) -> datetime:
+    value = value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0) if step == DAY else value
+
+
+def _ceil(value: datetime, step: timedelta) -> datetime:
+    floored = _floor(value, step)
+    return floored if floored == value else floored + step
+
+
+def plan_segments(
+    start: Optional[datetime],
+    end: Optional[datetime],
+    closed_until: Optional[datetime],
+    *,
+    end_inclusive: bool = True,
+) -> List[Segment]:
+    """Split [start, end] into raw / hour / day segments (all naive UTC)."""
+    segments: List[Segment] = []
+    tail_start = start
+    rolled_end = closed_until if end is None or closed_until is None else min(end, closed_until)
+    if rolled_end is not None:
+        h0 = _ceil(start, HOUR) if start is not None else None
+        h1 = _floor(rolled_end, HOUR)
+        if h0 is None or h0 < h1:
+            if start is not None and start < h0:
+                segments.append(("raw", start, h0, False))
+            d0 = _ceil(h0, DAY) if h0 is not None else None
+            d1 = _floor(h1, DAY)
+            if d0 is None or d0 < d1:
+                if h0 is not None and h0 < d0:
+                    segments.append(("hour", h0, d0, False))
+                segments.append(("day", d0, d1, False))
+                if d1 < h1:
+                    segments.append(("hour", d1, h1, False))
+            else:
+                segments.append(("hour", h0, h1, False))
+            tail_start = h1
+
+    if tail_start is None or end is None or tail_start < end or (end_inclusive and tail_start == end):
+        segments.append(("raw", tail_start, end, end_inclusive))
+    return segments
+
+
+def _totals(row: Any) -> UsageTotals:
+    return UsageTotals(*(int(v or 0) for v in row[1:]))
+
+
+def _raw_usage(
+    db: Session, lo: Optional[datetime], hi: Optional[datetime], hi_inclusive: bool, user_ids: Optional[Collection[int]]
+) -> Dict[int, UsageTotals]:
+    success = AnalysisLog.status == "success"
+    stmt = select(
+        AnalysisLog.user_id,
+        func.count(AnalysisLog.id),
+        func.sum(case((success, 1), else_=0)),
+        func.sum(case((AnalysisLog.status == "failed", 1), else_=0)),
+        func.sum(case((success, AnalysisLog.quota_cost), else_=0)),
+        func.sum(case((success, func.coalesce(AnalysisLog.prompt_tokens, 0)), else_=0)),
+        func.sum(case((success, func.coalesce(AnalysisLog.completion_tokens, 0)), else_=0)),
+    ).group_by(AnalysisLog.user_id)
+    if lo is not None:
+        stmt = stmt.where(AnalysisLog.created_at >= lo)
+    if hi is not None:
+        stmt = stmt.where(AnalysisLog.created_at <= hi if hi_inclusive else AnalysisLog.created_at < hi)
+    if user_ids is not None:
+        stmt = stmt.where(AnalysisLog.user_id.in_(list(user_ids)))
+    return {row[0]: _totals(row) for row in db.execute(stmt)}
+
+
+def _rollup_usage(
+    db: Session, granularity: str, lo: Optional[datetime], hi: Optional[datetime], user_ids: Optional[Collection[int]]
+) -> Dict[int, UsageTotals]:
+    stmt = (
+        select(UsageRollup.user_id, *[func.sum(getattr(UsageRollup, m)) for m in METRICS])
+        .where(UsageRollup.granularity == granularity)
+        .group_by(UsageRollup.user_id)
+    )
+    if lo is not None:
+        stmt = stmt.where(UsageRollup.bucket_start >= lo)
+    if hi is not None:
+        stmt = stmt.where(UsageRollup.bucket_start < hi)
+    if user_ids is not None:
+        stmt = stmt.where(UsageRollup.user_id.in_(list(user_ids)))
+    return {row[0]: _totals(row) for row in db.execute(stmt)}
+
+
+class UsageRollupService:
+    def __init__(self) -> None:
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.errors = 0
+        self.hour_rows_written = 0
+        self.late_updates = 0
+        self.closed_until: Optional[datetime] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(getattr(settings, "USAGE_ROLLUP_ENABLED", True))
+
+    @staticmethod
+    def _setting(name: str, default: float) -> float:
+        return float(getattr(settings, name, default) or default)
+
+    # ---- reads -------------------------------------------------------------
+
+    def watermark(self, db: Session) -> Optional[datetime]:
+        if not self.enabled:
+            return None
+        return db.execute(
+            select(UsageRollupState.closed_until).where(UsageRollupState.name == STATE_NAME)
+        ).scalar()
+
+    def usage_by_user(
+        self,
+        db: Session,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        *,
+        end_inclusive: bool = True,
+        user_ids: Optional[Collection[int]] = None,
+    ) -> Dict[int, UsageTotals]:
+        """Per-user AnalysisLog totals for logs created in [start, end] (None = unbounded)."""
+        if user_ids is not None and not user_ids:
+            return {}
+        result: Dict[int, UsageTotals] = {}
+        segments = plan_segments(_naive_utc(start), _naive_utc(end), self.watermark(db), end_inclusive=end_inclusive)
+        for source, lo, hi, hi_inclusive in segments:
+            if source == "raw":
+                part = _raw_usage(db, lo, hi, hi_inclusive, user_ids)
+            else:
+                part = _rollup_usage(db, source, lo, hi, user_ids)
+            for user_id, totals in part.items():
+                result.setdefault(user_id, UsageTotals()).add(totals)
+        return result
+
+    def usage_totals(self, db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None) -> UsageTotals:
+        total = UsageTotals()
+        for totals in self.usage_by_user(db, start, end).values():
+            total.add(totals)
+        return total
+
+    # ---- incremental updates ------------------------------------------------
+
+    def record_finished(self, db: Session, log: AnalysisLog) -> None:
+        """Apply a log that left ``processing`` after its hour was rolled up (caller commits)."""
+        if not self.enabled:
+            return
+        created = _naive_utc(log.created_at)
+        # Write the log's final status first (the session does not autoflush): SQLite ignores
+        # FOR UPDATE, there the flush is what takes the write lock before the watermark is read.
+        db.flush()
+        # Locked until the caller commits; waits for a compactor holding the chunk claim.
+        closed_until = db.execute(
+            select(UsageRollupState.closed_until).where(UsageRollupState.name == STATE_NAME).with_for_update()
+        ).scalar()
+        if created is None or closed_until is None or created >= closed_until:
+            return
+        success = log.status == "success"
+        deltas = {
+            "success_count": UsageRollup.success_count + (1 if success else 0),
+            "failed_count": UsageRollup.failed_count + (1 if log.status == "failed" else 0),
+            "quota_cost": UsageRollup.quota_cost + (int(log.quota_cost or 0) if success else 0),
+            "prompt_tokens": UsageRollup.prompt_tokens + (int(log.prompt_tokens or 0) if success else 0),
+            "completion_tokens": UsageRollup.completion_tokens + (int(log.completion_tokens or 0) if success else 0),
+        }
+        for granularity, step in (("hour", HOUR), ("day", DAY)):
+            db.execute(
+                update(UsageRollup)
+                .where(
+                    UsageRollup.granularity == granularity,
+                    UsageRollup.bucket_start == _floor(created, step),
+                    UsageRollup.user_id == log.user_id,
+                )
+                .values(**deltas)
+                .execution_options(synchronize_session=False)
+            )
+        self.late_updates += 1
+
+    # ---- compaction ---------------------------------------------------------
+
+    def compact(self) -> int:
+        """Roll up every hour closed since the last run; returns the hour rows written."""
+        if not self.enabled:
+            return 0
+        settle = timedelta(seconds=self._setting("USAGE_ROLLUP_SETTLE_SECONDS", 900.0))
+        target = _floor(_naive_utc(utcnow()) - settle, HOUR)
+        written = 0
+        db = SessionLocal()
+        try:
+            current = self.watermark(db)
+            if current is None:
+                first = db.execute(select(func.min(AnalysisLog.created_at))).scalar()
+                current = _floor(_naive_utc(first), HOUR) if first is not None else target
+                db.add(UsageRollupState(name=STATE_NAME, closed_until=current))
+                try:
+                    db.commit()
+                except IntegrityError:
+                    db.rollback()
+                    current = self.watermark(db)
+
+            while current < target:
+                chunk_end = min(current + _CHUNK, target)
+                rows = self._compact_range(db, current, chunk_end)
+                if rows is None:
+                    break  # another worker advanced the watermark
+                written += rows
+                current = chunk_end
+            self.closed_until = current
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        self.runs += 1
+        self.hour_rows_written += written
+        return written
+
+    @staticmethod
+    def _compact_range(db: Session, lo: datetime, hi: datetime) -> Optional[int]:
+        # Claim the chunk before reading any log: the row lock is held until commit, so
+        # record_finished for a log in [lo, hi) runs either entirely before or after us.
+        advanced = db.execute(
+            update(UsageRollupState)
+            .where(UsageRollupState.name == STATE_NAME, UsageRollupState.closed_until == lo)
+            .values(closed_until=hi)
+            .execution_options(synchronize_session=False)
+        )
+        if not advanced.rowcount:
+            db.rollback()
+            return None
+
+        buckets: Dict[Tuple[datetime, int], UsageTotals] = {}
+        stmt = select(
+            AnalysisLog.user_id,
+            AnalysisLog.created_at,
+            AnalysisLog.status,
+            AnalysisLog.quota_cost,
+            AnalysisLog.prompt_tokens,
+            AnalysisLog.completion_tokens,
+        ).where(AnalysisLog.created_at >= lo, AnalysisLog.created_at < hi)
+        for user_id, created_at, status, quota_cost, prompt_tokens, completion_tokens in db.execute(
+            stmt.execution_options(yield_per=5000)
+        ):
+            totals = buckets.setdefault((_floor(_naive_utc(created_at), HOUR), user_id), UsageTotals())
+            totals.task_count += 1
+            if status == "success":
+                totals.success_count += 1
+                totals.quota_cost += int(quota_cost or 0)
+                totals.prompt_tokens += int(prompt_tokens or 0)
+                totals.completion_tokens += int(completion_tokens or 0)
+            elif status == "failed":
+                totals.failed_count += 1
+
+        db.execute(
+            delete(UsageRollup).where(
+                UsageRollup.granularity == "hour", UsageRollup.bucket_start >= lo, UsageRollup.bucket_start < hi
+            )
+        )
+        if buckets:
+            db.execute(
+                insert(UsageRollup),
+                [
+                    {"granularity": "hour", "bucket_start": bucket, "user_id": user_id, **vars(totals)}
+                    for (bucket, user_id), totals in buckets.items()
+                ],
+            )
+
+        # Days completed by this chunk are summed from their hour rows.
+        day = _floor(lo, DAY)
+        while day + DAY <= hi:
+            db.execute(delete(UsageRollup).where(UsageRollup.granularity == "day", UsageRollup.bucket_start == day))
+            hours = _rollup_usage(db, "hour", day, day + DAY, None)
+            if hours:
+                db.execute(
+                    insert(UsageRollup),
+                    [
+                        {"granularity": "day", "bucket_start": day, "user_id": user_id, **vars(totals)}
+                        for user_id, totals in hours.items()
+                    ],
+                )
+            day += DAY
+
+        db.commit()
+        return len(buckets)
+
+    # ---- lifecycle ------------------------------------------------------------
+
+    def start(self) -> None:
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._loop(), name="usage-rollup-compactor")
+
+    async def shutdown(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.compact)
+            except Exception:
+                self.errors += 1
+                logger.warning("usage rollup compaction failed", exc_info=True)
+            await asyncio.sleep(self._setting("USAGE_ROLLUP_INTERVAL_SECONDS", 300.0))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "closed_until": self.closed_until.isoformat() if self.closed_until else None,
+            "runs": self.runs,
+            "errors": self.errors,
+            "hour_rows_written": self.hour_rows_written,
+            "late_updates": self.late_updates,
+        }
+
+
+# 全局实例
+usage_rollups = UsageRollupService()
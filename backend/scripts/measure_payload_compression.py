@@ -0,0 +1,126 @@
+"""Measure bytes saved by stored-payload compression and gzip responses.
+
+Builds typical workloads (a class grade book as xlsx, its parse-session IR/mapping, the
+per-student checkpoints and the file-detail / upload response bodies) and prints raw vs
+compressed sizes.
+
+Run:
+  python scripts/measure_payload_compression.py
+  python scripts/measure_payload_compression.py --students 300 --items 30
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import io
+import os
+import random
+import sys
+
+# Ensure `backend/` is on sys.path so `import app...` works when running this script directly.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import openpyxl
+
+from app.core import fast_json
+from app.core.compression import PAYLOAD_MARKER, encode_payload
+from app.models.score import ScoreItem, StudentScore
+from app.services.universal_parsing_service import UniversalParsingService
+
+# Clauses mixed per student so responses are not artificially repetitive.
+ANALYSIS_CLAUSES = [
+    "除法算理的运用不够灵活，根据余数和除数求被除数可以针对性练习",
+    "轴对称图形观察的细致性还要提高",
+    "长度单位的换算和比较不够熟练，假期要加强练习",
+    "英文表述的倍数关系不够熟练，建议多总结句型",
+    "归一问题读题不够透彻，建议在读题时做一些标记、画图来帮助分析",
+    "面积单位的感知还不够熟悉，平时要从生活中的例子出发加深理解",
+    "混合运算的变形不够熟练，建议用简单的提示词梳理思路",
+    "计算面积会忘记统一单位，要多总结做题方法",
+    "口算速度较快但准确率有待提高，每天坚持限时练习",
+    "应用题列式思路清晰，书写格式还需规范",
+]
+
+
+def build_workbook(students: int, items: int, seed: int = 7) -> bytes:
+    rnd = random.Random(seed)
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "期末成绩"
+    names = [f"{rnd.choice(['选择', '填空', '计算', '应用', '判断'])}题{i + 1}" for i in range(items)]
+    ws.append(["学号", "姓名", *names, "总分"])
+    for i in range(students):
+        marks = [rnd.choice([None, None, None, "√", 2, 1]) for _ in names]
+        ws.append([20240000 + i, f"学生{i:03d}", *marks, rnd.randint(60, 100)])
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def build_scores(students: int, items: int) -> list[StudentScore]:
+    rnd = random.Random(11)
+    return [
+        StudentScore(
+            student_name=f"学生{i:03d}",
+            scores=[
+                ScoreItem(question_name=f"计算题{j + 1}", deduction=float(rnd.choice([1, 2, 3])), category="计算题")
+                for j in range(rnd.randint(0, items // 2))
+            ],
+            total_score=float(rnd.randint(60, 100)),
+            analysis="从知识点方面，小朋友能够基本掌握，但是在以下方面还需要继续加强："
+            + "；".join(rnd.sample(ANALYSIS_CLAUSES, rnd.randint(3, 6)))
+            + f"。本次得分{rnd.randint(60, 100)}分，继续加油！",
+            suggestions=[],
+        )
+        for i in range(students)
+    ]
+
+
+def row(label: str, raw: int, packed: int) -> None:
+    saved = 1 - packed / raw if raw else 0.0
+    print(f"{label:<34}{raw:>12,}{packed:>12,}{saved:>9.1%}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=60)
+    parser.add_argument("--items", type=int, default=25)
+    args = parser.parse_args()
+
+    preview = UniversalParsingService.extract_preview(
+        file_bytes=build_workbook(args.students, args.items), filename="grades.xlsx"
+    )
+    scores = build_scores(args.students, args.items)
+    students_payload = [s.model_dump() for s in scores]
+
+    print(f"workload: {args.students} students x {args.items} item columns")
+    print(f"{'payload':<34}{'raw bytes':>12}{'stored/sent':>12}{'saved':>9}")
+
+    ir_text = fast_json.dumps_str(preview.ir)
+    row("parse session IR (stored)", len(ir_text.encode()), len(encode_payload(ir_text)))
+
+    checkpoint_raw = checkpoint_packed = 0
+    compressed_rows = 0
+    for s in scores:
+        text = s.model_dump_json()
+        packed = encode_payload(text)
+        compressed_rows += packed.startswith(PAYLOAD_MARKER)
+        checkpoint_raw += len(text.encode())
+        checkpoint_packed += len(packed.encode())
+    row(f"checkpoints ({compressed_rows}/{len(scores)} compressed)", checkpoint_raw, checkpoint_packed)
+
+    for label, body in (
+        ("upload response (gzip)", {"success": True, "data": students_payload}),
+        ("file detail, all fields (gzip)", {"success": True, "data": {"students": students_payload}}),
+        (
+            "file detail, names+totals (gzip)",
+            {"success": True, "data": {"students": [{"student_name": s.student_name, "total_score": s.total_score} for s in scores]}},
+        ),
+    ):
+        raw = fast_json.dumps(body)
+        row(label, len(raw), len(gzip.compress(raw, 6)))
+
+
+if __name__ == "__main__":
+    main()
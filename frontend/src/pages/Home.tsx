@@ -2,7 +2,7 @@ import React, { useState, useEffect, useRef } from 'react';
 import { Upload, Card, Input, Button, List, message, Tag, Empty, Spin } from 'antd';
 import { useTranslation } from 'react-i18next';
 import { StudentScore } from '../types/score';
-import { scoreApi } from '../services/apiClient';
+import { scoreApi, waitForAnalysisJob } from '../services/apiClient';
 import { useAuthStore } from '../store/authStore';
 import { useAppStore } from '../store/appStore';
 import { useScoreStore, FileGroup } from '../store/scoreStore';
@@ -213,7 +213,32 @@ const Home: React.FC = () => {
       }, 220);
 
       const response = await scoreApi.analyzeFile(newGroup.backendFileId!, oneShotText.trim());
-      const result = response.data;
+      let result = response.data;
+
+      // 202：后台任务，按学生完成情况推进进度并逐个渲染结果
+      if (response.status === 202 && result.job?.job_id) {
+        if (aiTimerRef.current) {
+          window.clearInterval(aiTimerRef.current);
+          aiTimerRef.current = null;
+        }
+        const partialScores: StudentScore[] = [...(newGroup.scores || [])];
+        result = await waitForAnalysisJob(result.job.job_id, (event) => {
+          const { job } = event;
+          if (job?.total) {
+            setAiProgress(Math.max(6, Math.min(99, Math.round(job.progress * 100))));
+          }
+          if (event.type === 'student' && event.student && event.index !== undefined) {
+            partialScores[event.index] = event.student;
+            const snapshot = [...partialScores];
+            setFileGroups(prev => prev.map(group =>
+              group.id === groupId ? { ...group, scores: snapshot } : group
+            ));
+          }
+        });
+        if (result.job?.status === 'failed') {
+          throw new Error(result.message || t('analysis.aiFailed'));
+        }
+      }
 
       if (!result.success || !result.data) {
         throw new Error(result.message || t('analysis.aiFailed'));
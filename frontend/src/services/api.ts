@@ -67,6 +67,21 @@ export interface FileDetailResponse {
         analyzed_at: string | null;
         students: StudentScore[];
     };
+    // 仅在传入 page 时返回
+    pagination?: {
+        page: number;
+        page_size: number;
+        total: number;
+        total_pages: number;
+    } | null;
+}
+
+export interface FileDetailQuery {
+    page?: number;
+    pageSize?: number;
+    name?: string;
+    // 字段投影：student_name,scores,total_score,analysis,suggestions
+    fields?: string[];
 }
 
 // 创建一个独立的 axios 实例用于历史记录，避免被长时间的上传请求阻塞
@@ -113,8 +128,15 @@ export const getHistoryFiles = async (page: number = 1, pageSize: number = 10):
     return response.data;
 };
 
-export const getFileDetail = async (fileId: number): Promise<FileDetailResponse> => {
-    const response = await historyApiClient.get<FileDetailResponse>(`/api/files/${fileId}`);
+export const getFileDetail = async (fileId: number, query: FileDetailQuery = {}): Promise<FileDetailResponse> => {
+    const response = await historyApiClient.get<FileDetailResponse>(`/api/files/${fileId}`, {
+        params: {
+            page: query.page,
+            page_size: query.page !== undefined ? query.pageSize : undefined,
+            name: query.name || undefined,
+            fields: query.fields?.length ? query.fields.join(',') : undefined,
+        },
+    });
     return response.data;
 };
 
@@ -166,8 +166,13 @@ export const scoreApi = {
     });
   },
 
-  analyzeFile: (fileId: number, oneShotText?: string) =>
-    apiClient.post(`/api/files/${fileId}/analyze`, { one_shot_text: oneShotText || '' }),
+  // 200：已分析过（直接返回结果）；202：已创建后台任务（返回 job）
+  // resume=true：已分析文件只补跑分析失败的学生
+  analyzeFile: (fileId: number, oneShotText?: string, resume = false) =>
+    apiClient.post(`/api/files/${fileId}/analyze`, { one_shot_text: oneShotText || '', resume }),
+
+  getAnalysisJob: (jobId: string) =>
+    apiClient.get(`/api/analysis-jobs/${jobId}`),
 
   parsePreview: (fileId: number) =>
     apiClient.post('/api/files/parse/preview', { file_id: fileId }),
@@ -193,4 +198,93 @@ export const scoreApi = {
     apiClient.get(`/api/charts/${chartType}`),
 };
 
+export interface AnalysisJobEvent {
+  type: 'started' | 'student' | 'progress' | 'done';
+  job: {
+    job_id: string;
+    status: 'queued' | 'running' | 'succeeded' | 'failed';
+    total: number;
+    completed: number;
+    failed: number;
+    progress: number;
+    resumed?: number;
+    error_message?: string | null;
+  };
+  index?: number;
+  resumed?: boolean;
+  student?: any;
+}
+
+// 读取分析任务的 SSE 进度流（EventSource 无法携带 Authorization 头，这里用 fetch 读取）
+export const streamAnalysisJob = async (
+  jobId: string,
+  onEvent: (event: AnalysisJobEvent) => void,
+  signal?: AbortSignal
+): Promise<AnalysisJobEvent | null> => {
+  const token = useAuthStore.getState().token;
+  const response = await fetch(`${getApiUrl()}/api/analysis-jobs/${jobId}/events`, {
+    headers: token ? { Authorization: `Bearer ${token}` } : {},
+    signal,
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`SSE ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let last: AnalysisJobEvent | null = null;
+
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let sep = buffer.indexOf('\n\n');
+    while (sep >= 0) {
+      const block = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      sep = buffer.indexOf('\n\n');
+
+      const data = block
+        .split('\n')
+        .filter((line) => line.startsWith('data:'))
+        .map((line) => line.slice(5).trim())
+        .join('\n');
+      if (!data) continue; // keepalive
+
+      last = JSON.parse(data) as AnalysisJobEvent;
+      onEvent(last);
+      if (last.type === 'done') {
+        reader.cancel().catch(() => undefined);
+        return last;
+      }
+    }
+  }
+  return last;
+};
+
+// 等待分析任务结束：优先 SSE，断开/不可用时回退轮询；返回 GET /analysis-jobs/{id} 的最终结果
+export const waitForAnalysisJob = async (
+  jobId: string,
+  onEvent: (event: AnalysisJobEvent) => void,
+  pollIntervalMs = 2000
+) => {
+  try {
+    await streamAnalysisJob(jobId, onEvent);
+  } catch {
+    // 回退到轮询
+  }
+
+  for (;;) {
+    const response = await scoreApi.getAnalysisJob(jobId);
+    const result = response.data;
+    onEvent({ type: 'progress', job: result.job });
+    if (result.job.status === 'succeeded' || result.job.status === 'failed') {
+      return result;
+    }
+    await new Promise((resolve) => window.setTimeout(resolve, pollIntervalMs));
+  }
+};
+
 export default apiClient;